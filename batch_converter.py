@@ -4,171 +4,609 @@
 批量转换JSON文件到Excel
 """
 
+# 最先导入：记录其他模块开始导入的时间（--profile-startup）
+import startup_profile
+
 import os
-import json
-import glob
-import pandas as pd
 from datetime import datetime
-import re
 import argparse
+import atexit
+import collections
+import functools
+
+import consolidate
+import engine
+import excel_writer
+import extract_cache
+import input_files
+import json_backend
+import metrics
+import output_formats
+import pipeline
+import splitting
+import watcher
+from columnar import ColumnarTable
+from extraction import AGGREGATE_MAX_KEYS, RUN_LENGTH_COLUMNS, extract_hospital_id
+from job_journal import DONE, FAILED, JobJournal, job_id
+from manifest import Manifest
+from row_filter import RowFilter
+
 
+# 监视模式下性能指标报告保留的最近文件数
+WATCH_METRICS_RECORDS = 1000
 
-def extract_hospital_id(filename):
-    """从文件名提取hospital_id"""
-    basename = os.path.basename(filename)
-    match = re.match(r'^(\d+)', basename)
-    return match.group(1) if match else None
+# 转换器版本，输出格式变化时递增，增量模式下会触发重新转换（与提取结果缓存共用）
+CONVERTER_VERSION = engine.CONVERTER_VERSION
+
+
+# 输出Excel的列顺序
+COLUMN_ORDER = engine.CLI_COLUMNS
 
 
 def extract_department_data(json_data, hospital_id):
     """从JSON数据中提取科室信息"""
-    rows = []
+    return list(engine.iter_rows(json_data, COLUMN_ORDER, hospital_id=hospital_id))
+
+
+def iter_department_rows(departments, hospital_id):
+    """逐条产出科室行数据，departments 可以是列表或流式迭代器"""
+    return engine.iter_rows({'departments': departments}, COLUMN_ORDER, hospital_id=hospital_id)
+
+
+def extract_columnar(departments, hospital_id):
+    """列式提取科室数据，直接追加到每列的数组中，不创建行字典
+
+    hospital_id、campus_id、symptom_text、diagnosis_text 按院区整段追加（游程编码）
+    """
+    return engine.extract_table({'departments': departments}, COLUMN_ORDER, hospital_id=hospital_id)
+
+
+def save_with_pandas(rows, output_file, width_sample=None):
+    """通过pandas DataFrame导出到Excel（旧的写入方式），返回写入的行数
+
+    rows 可以是行字典的可迭代对象或列式数据表（ColumnarTable）；
+    列宽在构建DataFrame的同时统计，width_sample 指定时只测量前若干行
+    """
+    # pandas导入较慢，只在使用该写入方式时导入
+    import pandas as pd
     
-    # 获取departments数组
-    departments = json_data.get('departments', [])
+    # 创建DataFrame
+    if isinstance(rows, ColumnarTable):
+        widths = excel_writer.measure_table(rows, COLUMN_ORDER, width_sample)
+        df = rows.to_dataframe(COLUMN_ORDER)
+    else:
+        widths = excel_writer.ColumnWidthTracker(COLUMN_ORDER, width_sample)
+        df = pd.DataFrame(widths.track_dicts(rows))
+        # 同一院区内重复的字段转换为分类列，每个不同的值只保存一次
+        for col in RUN_LENGTH_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype('category')
     
-    for dept in departments:
-        # 获取基本信息
-        symptom_text = dept.get('symptom_text', '')
-        diagnosis_text = dept.get('diagnosis_text', '')
-        
-        # 获取data数组（注意原始JSON中有个空字符串的key）
-        data_list = None
-        for key in ['data', '']:  # 检查'data'和空字符串key
-            if key in dept and isinstance(dept[key], list):
-                data_list = dept[key]
-                break
-        
-        if data_list:
-            # 遍历每个院区
-            for campus_data in data_list:
-                campus_id = campus_data.get('campus_id', '')
-                department_list = campus_data.get('department_list', [])
-                
-                # 遍历每个具体科室
-                for dept_item in department_list:
-                    # 检查是否有params结构（193_triage.json格式）
-                    if 'params' in dept_item:
-                        params = dept_item.get('params', {})
-                        row = {
-                            'hospital_id': hospital_id or '',
-                            'campus_id': campus_id,
-                            'department_title': dept_item.get('title', ''),
-                            'department_id': params.get('departId', ''),
-                            'area_id': params.get('areaId', ''),
-                            'area_name': params.get('areaName', ''),
-                            'position': '',  # 193格式中没有position
-                            'symptom_text': symptom_text,
-                            'diagnosis_text': diagnosis_text
-                        }
-                    else:
-                        # 原格式（63_triage.json格式）
-                        row = {
-                            'hospital_id': hospital_id or '',
-                            'campus_id': campus_id,
-                            'department_title': dept_item.get('title', ''),
-                            'department_id': dept_item.get('department_id', ''),
-                            'area_id': '',  # 63格式中没有area_id
-                            'area_name': '',  # 63格式中没有area_name
-                            'position': dept_item.get('position', ''),
-                            'symptom_text': symptom_text,
-                            'diagnosis_text': diagnosis_text
-                        }
-                    rows.append(row)
-    
-    return rows
-
-
-def process_json_file(json_file, output_dir):
-    """处理单个JSON文件"""
+    # 按照指定顺序排列列
+    df = df[COLUMN_ORDER]
+    
+    # 导出到Excel（先写入临时文件）
+    with output_formats.atomic_output(output_file) as tmp_path:
+        with pd.ExcelWriter(tmp_path, engine='openpyxl') as writer:
+            df.to_excel(writer, sheet_name='科室数据', index=False)
+            
+            # 调整列宽（最大宽度为50）
+            widths.apply(writer.sheets['科室数据'])
+    
+    return len(df)
+
+
+class PandasSink(engine.FileSink):
+    """通过pandas DataFrame写入Excel的输出目标"""
+
+    def write(self, rows, columns):
+        return save_with_pandas(rows, self.filename, self.width_sample)
+
+
+def incremental_output_path(json_file, output_dir, fmt='xlsx'):
+    """增量模式下使用固定的输出文件名（不带时间戳），重新转换时覆盖旧文件"""
+    name = input_files.output_name(json_file)
+    return os.path.join(output_dir, f"{name}_converted{output_formats.EXTENSIONS[fmt]}")
+
+
+def timestamped_output_path(json_file, output_dir, fmt='xlsx', timestamp=None):
+    """默认的输出文件名（带时间戳）"""
+    name = input_files.output_name(json_file)
+    timestamp = timestamp or datetime.now().strftime('%Y%m%d_%H%M%S')
+    return os.path.join(output_dir, f"{name}_converted_{timestamp}{output_formats.EXTENSIONS[fmt]}")
+
+
+def process_json_file(json_file, output_dir, stream=False, writer='stream', output_file=None,
+                      columnar=False, width_sample=None, fmt='xlsx', metrics=None, backend=None, split=None,
+                      cache=None, row_filter=None, aggregate=False):
+    """处理单个JSON文件
+
+    stream=True 时逐个科室流式解析，不在内存中构建完整的JSON对象树；
+    writer='stream' 时行数据直接流式写入Excel，'pandas' 时先构建DataFrame；
+    output_file 为空时在 output_dir 中生成带时间戳的文件名；
+    columnar=True 时按列提取数据，不创建行字典；
+    width_sample 指定时只根据前若干行估算列宽；
+    fmt 为输出格式（xlsx/csv/jsonl/parquet），列顺序均与 COLUMN_ORDER 一致；
+    metrics 为 metrics.FileMetrics 时记录读取、解析、提取和写入各阶段的指标；
+    backend 为JSON解析后端（auto/orjson/simdjson/stdlib），流式解析时不使用；
+    split 为 splitting.SplitLimit 时按行数或大小分割为多个工作表或文件；
+    cache 为 extract_cache.ExtractCache 时优先读取缓存的提取结果，未命中时提取后写入缓存；
+    row_filter 为 row_filter.RowFilter 时只输出符合条件的科室；
+    aggregate=True 时合并重复的科室（相同院区和科室ID），症状和诊断合并到一行中
+    """
     try:
         # 提取hospital_id
         hospital_id = extract_hospital_id(json_file)
         if not hospital_id:
-            print(f"⚠️  警告: 无法从文件名提取hospital_id: {json_file}")
+            print(f"⚠️  警告: 无法从文件名提取hospital_id: {json_file}", flush=True)
         
-        # 读取JSON文件
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # 读取JSON文件并提取数据
+        if columnar:
+            rows = engine.extract_table(json_file, COLUMN_ORDER, stream, hospital_id, metrics, backend, cache,
+                                        row_filter, aggregate)
+        else:
+            rows = engine.iter_rows(json_file, COLUMN_ORDER, stream, hospital_id, metrics=metrics,
+                                    backend=backend, cache=cache, row_filter=row_filter, aggregate=aggregate)
+        rows, has_rows = engine.peek(rows)
         
-        # 提取数据
-        rows = extract_department_data(data, hospital_id)
-        
-        if not rows:
-            print(f"⚠️  警告: {json_file} 中没有找到科室数据")
+        if not has_rows:
+            if row_filter:
+                print(f"⚠️  警告: {json_file} 中没有符合筛选条件的科室数据", flush=True)
+            else:
+                print(f"⚠️  警告: {json_file} 中没有找到科室数据", flush=True)
             return False
         
-        # 创建DataFrame
-        df = pd.DataFrame(rows)
-        
-        # 按照指定顺序排列列
-        column_order = ['hospital_id', 'campus_id', 'department_title', 'department_id', 
-                       'area_id', 'area_name', 'position', 'symptom_text', 'diagnosis_text']
-        df = df[column_order]
-        
         # 生成输出文件名
-        base_name = os.path.splitext(os.path.basename(json_file))[0]
-        output_file = os.path.join(output_dir, 
-                                  f"{base_name}_converted_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+        if output_file is None:
+            output_file = timestamped_output_path(json_file, output_dir, fmt)
         
-        # 导出到Excel
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='科室数据', index=False)
-            
-            # 获取worksheet对象以调整列宽
-            worksheet = writer.sheets['科室数据']
-            
-            # 自动调整列宽
-            for idx, col in enumerate(df.columns):
-                max_length = max(
-                    df[col].astype(str).apply(len).max(),
-                    len(col)
-                ) + 2
-                # 设置最大宽度为50
-                worksheet.column_dimensions[chr(65 + idx)].width = min(max_length, 50)
+        # 导出
+        sink_class = PandasSink if writer == 'pandas' and fmt == 'xlsx' else engine.FileSink
+        sink = sink_class(output_file, fmt, width_sample=width_sample, split=split)
+        if metrics is None:
+            row_count = sink.write(rows, COLUMN_ORDER)
+        else:
+            with metrics.stage('write'):
+                row_count = sink.write(rows, COLUMN_ORDER)
         
-        print(f"✅ 成功: {json_file} → {output_file} ({len(rows)}条记录)")
+        print(f"✅ 成功: {json_file} → {output_file} ({row_count}条记录)", flush=True)
         return True
         
     except Exception as e:
-        print(f"❌ 错误: 处理 {json_file} 时发生错误: {str(e)}")
+        print(f"❌ 错误: 处理 {json_file} 时发生错误: {str(e)}", flush=True)
         return False
 
 
+def iter_process_results(json_files, output_dir, jobs=1, output_files=None, collect_metrics=False,
+                         trace_memory=False, executor=None, prefetch=pipeline.DEFAULT_PREFETCH, **options):
+    """处理多个文件，逐个产出 (输入文件, 是否成功, 指标)
+
+    jobs > 1 时使用进程池并行处理，按完成顺序产出；executor 为已创建的进程池时使用该进程池
+    （监视模式下复用已导入模块的工作进程），否则临时创建；
+    串行处理时后台线程提前读取后面的 prefetch 个文件，读取与转换重叠（见 pipeline）；
+    output_files 可为每个输入文件指定输出路径；options 传给 process_json_file；
+    collect_metrics=True 时指标为每个文件的指标字典（见 metrics.FileMetrics），否则为None
+    """
+    output_files = output_files or {}
+    if collect_metrics:
+        task = functools.partial(metrics.run_with_metrics, process_json_file, trace_memory=trace_memory)
+    else:
+        task = process_json_file
+
+    def unpack(result):
+        return result if collect_metrics else (result, None)
+
+    if jobs <= 1:
+        def convert(json_file):
+            return unpack(task(json_file, output_dir, output_file=output_files.get(json_file), **options))
+        
+        for json_file, result in pipeline.iter_pipelined(json_files, convert, prefetch,
+                                                         options.get('stream', False)):
+            yield (json_file,) + result
+        return
+    
+    if executor is None:
+        # 进程池只在并行时导入（multiprocessing导入较慢，单个文件的转换不需要）
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            yield from _iter_futures(executor, task, unpack, json_files, output_dir, output_files, options)
+        return
+    yield from _iter_futures(executor, task, unpack, json_files, output_dir, output_files, options)
+
+
+def _iter_futures(executor, task, unpack, json_files, output_dir, output_files, options):
+    futures = {executor.submit(task, json_file, output_dir,
+                               output_file=output_files.get(json_file), **options): json_file
+               for json_file in json_files}
+    from concurrent.futures import as_completed
+    try:
+        for future in as_completed(futures):
+            json_file = futures[future]
+            try:
+                yield (json_file,) + unpack(future.result())
+            except Exception as e:
+                # 子进程异常退出、参数无法序列化等情况
+                print(f"❌ 错误: 处理 {json_file} 时发生错误: {str(e)}", flush=True)
+                yield json_file, False, None
+    finally:
+        # 调用方提前停止（如Ctrl+C）时取消尚未开始的文件，不等待它们全部转换完
+        for future in futures:
+            future.cancel()
+
+
+def process_combined(json_files, output_dir, mode, stream=False, width_sample=None, fmt='xlsx', backend=None,
+                     split=None, row_filter=None, aggregate=False):
+    """将所有文件合并写入一个输出文件，返回成功处理的文件数"""
+    output_file = os.path.join(output_dir, f"combined_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                                           f"{output_formats.EXTENSIONS[fmt]}")
+    success_files = []
+    
+    def on_file_done(json_file, row_count, error):
+        if error:
+            print(f"❌ 错误: 处理 {json_file} 时发生错误: {error}", flush=True)
+        elif row_count == 0:
+            print(f"⚠️  警告: {json_file} 中没有找到科室数据", flush=True)
+        else:
+            success_files.append(json_file)
+            print(f"✅ 成功: {json_file} ({row_count}条记录)", flush=True)
+    
+    total = consolidate.write_consolidated(json_files, output_file, mode, stream, width_sample, on_file_done,
+                                           fmt, backend, split, row_filter, aggregate)
+    print(f"合并输出: {output_file} (共{total}条记录)")
+    return len(success_files)
+
+
+def manifest_version(row_filter=None, aggregate=False, split=None):
+    """增量清单中记录的转换器版本；筛选条件、是否合并重复科室或分割阈值不同时输出不同，变化后重新转换"""
+    version = CONVERTER_VERSION
+    if row_filter:
+        version += f" {row_filter.describe()}"
+    if split:
+        version += f" {split.describe()}"
+    if aggregate is True:
+        version += " aggregate"
+    elif aggregate:
+        version += f" aggregate={aggregate}"
+    return version
+
+
+def convert_files(json_files, args, executor=None):
+    """按命令行参数逐个转换文件（任务日志、增量清单、并行处理），打印结果，返回指标列表
+
+    executor 为已创建的进程池时复用（见 iter_process_results）
+    """
+    # 任务日志：每处理完一个文件追加一条记录，中断后使用 --resume 跳过已完成的文件
+    journal = JobJournal(args.output, job_id(json_files, fmt=args.format, incremental=args.incremental,
+                                             split=[args.split_rows, args.split_bytes, args.split_to],
+                                             version=manifest_version(args.row_filter, args.aggregate, args.split)))
+    journal.start(args.resume)
+    resumed_files = [json_file for json_file in json_files if journal.is_done(json_file)]
+    if args.resume:
+        if journal.entries:
+            print(f"继续上次的任务: {len(resumed_files)} 个文件已完成，将被跳过")
+        else:
+            print("没有找到可以继续的任务，将处理全部文件")
+    
+    # 增量模式：跳过内容和转换器版本都未变化的文件
+    manifest = None
+    fingerprints = {}
+    output_files = {}
+    pending_files = [json_file for json_file in json_files if not journal.is_done(json_file)]
+    unchanged_count = 0
+    if args.incremental:
+        manifest = Manifest(args.output, manifest_version(args.row_filter, args.aggregate, args.split))
+        for json_file in resumed_files:
+            # 中断前已完成但未保存到清单的文件
+            try:
+                unchanged, fingerprint = manifest.check(json_file)
+            except input_files.READ_ERRORS:
+                continue
+            if not unchanged:
+                manifest.record(json_file, fingerprint, journal.output(json_file))
+        candidates, pending_files = pending_files, []
+        for json_file in candidates:
+            try:
+                unchanged, fingerprint = manifest.check(json_file, incremental_output_path(json_file, args.output,
+                                                                                            args.format))
+            except input_files.READ_ERRORS:
+                unchanged, fingerprint = False, None
+            if unchanged:
+                unchanged_count += 1
+                continue
+            fingerprints[json_file] = fingerprint
+            output_files[json_file] = incremental_output_path(json_file, args.output, args.format)
+            pending_files.append(json_file)
+        print(f"增量模式: {unchanged_count} 个文件未变化，将被跳过")
+    else:
+        # 提前确定输出文件名，记录到任务日志中
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_files = {json_file: timestamped_output_path(json_file, args.output, args.format, timestamp)
+                        for json_file in pending_files}
+    
+    jobs = max(1, min(args.jobs, len(pending_files)))
+    if jobs > 1:
+        print(f"并行进程数: {jobs}")
+    print("-" * 50)
+    
+    # 处理每个文件
+    success_count = 0
+    records = []
+    try:
+        results = iter_process_results(pending_files, args.output, jobs, output_files,
+                                       collect_metrics=bool(args.metrics), trace_memory=args.trace_memory,
+                                       stream=args.stream, writer=args.writer, columnar=args.columnar,
+                                       width_sample=args.width_sample, fmt=args.format,
+                                       backend=args.json_backend, split=args.split, cache=args.cache,
+                                       row_filter=args.row_filter, aggregate=args.aggregate, executor=executor,
+                                       prefetch=args.prefetch)
+        for json_file, success, record in results:
+            if record:
+                records.append(record)
+            journal.record(json_file, DONE if success else FAILED, output_files[json_file] if success else None)
+            if not success:
+                continue
+            success_count += 1
+            if manifest and fingerprints.get(json_file):
+                manifest.record(json_file, fingerprints[json_file], output_files[json_file])
+        finished = journal.finish(pending_files)
+    finally:
+        journal.close()
+        if manifest:
+            manifest.save()
+    
+    print("-" * 50)
+    skipped = []
+    if resumed_files:
+        skipped.append(f"{len(resumed_files)} 个上次已完成的文件")
+    if manifest:
+        skipped.append(f"{unchanged_count} 个未变化的文件")
+    if skipped:
+        print(f"处理完成: 成功 {success_count}/{len(pending_files)} 个文件，跳过 " + "、".join(skipped))
+    else:
+        print(f"处理完成: 成功 {success_count}/{len(json_files)} 个文件")
+    if not finished:
+        print("💡 提示: 部分文件处理失败，任务日志已保留，使用 --resume 可只重新处理这些文件")
+    return records
+
+
 def main():
     """主函数"""
+    profile = startup_profile.StartupProfile()
     parser = argparse.ArgumentParser(description='批量转换JSON文件到Excel')
     parser.add_argument('input_pattern', nargs='?', default='*_triage.json',
-                       help='输入文件模式 (默认: *_triage.json)')
+                       help='输入文件模式 (默认: *_triage.json)；同时匹配 .gz/.bz2/.xz/.zst 压缩文件和'
+                            '同一目录下zip/tar归档中的文件，也可以直接指定归档')
     parser.add_argument('-o', '--output', default='output',
                        help='输出目录 (默认: output)')
+    parser.add_argument('--stream', action='store_true',
+                       help='流式解析JSON，适用于超大文件')
+    parser.add_argument('--json-backend', choices=json_backend.BACKENDS, default='auto',
+                       help='JSON解析后端 (默认: auto，优先使用已安装的orjson、simdjson)；流式解析时不使用')
+    parser.add_argument('-f', '--format', choices=output_formats.FORMATS, default='xlsx',
+                       help='输出格式 (默认: xlsx)；parquet需要安装pyarrow')
+    parser.add_argument('--writer', choices=['stream', 'pandas'], default='stream',
+                       help='Excel写入方式: stream=流式写入(默认), pandas=通过DataFrame写入')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                       help='并行处理的进程数 (默认: CPU核心数)')
+    parser.add_argument('--columnar', action='store_true',
+                       help='列式提取: 数据按列存储，不为每行创建字典')
+    parser.add_argument('--prefetch', type=int, default=pipeline.DEFAULT_PREFETCH, metavar='N',
+                       help=f'串行处理时提前读取后面的N个文件，读取与转换同时进行 '
+                            f'(默认: {pipeline.DEFAULT_PREFETCH}，0为不预读)')
+    parser.add_argument('--width-sample', type=int, metavar='N',
+                       help='只根据前N行估算列宽（默认测量全部行）')
+    parser.add_argument('--split-rows', type=int, metavar='N',
+                       help='每个工作表或文件最多N行数据，超过时继续写入下一个（xlsx总是在Excel行数上限处分割）')
+    parser.add_argument('--split-bytes', metavar='SIZE',
+                       help='每个工作表或文件的大致大小上限，如 200M（xlsx按未压缩的XML大小估算）')
+    parser.add_argument('--split-to', choices=splitting.SPLIT_MODES,
+                       help='xlsx的分割方式: sheets=科室数据_2等工作表(默认), files=name_2.xlsx等文件；其他格式总是分割为文件')
+    parser.add_argument('--campus', action='append', metavar='ID',
+                       help='只提取这些院区的科室，多个ID用逗号分隔或多次指定')
+    parser.add_argument('--title-regex', metavar='REGEX',
+                       help='只提取名称匹配该正则表达式（部分匹配）的科室')
+    parser.add_argument('--hospital', action='append', metavar='ID',
+                       help='只处理这些hospital_id的文件（按文件名判断，其他文件不读取），多个ID用逗号分隔或多次指定')
+    parser.add_argument('--has-param', action='append', metavar='NAME',
+                       help='只提取提供了这些URL参数（非空）的科室，如 departId，多个参数用逗号分隔或多次指定')
+    parser.add_argument('--aggregate', action='store_true',
+                       help='合并重复的科室: 相同院区和科室ID只输出一行，症状和诊断文本合并（以"；"分隔）')
+    parser.add_argument('--aggregate-max-keys', type=int, metavar='N',
+                       help=f'合并重复科室时内存中最多保存的科室数，超过时先输出已合并的行，内存较小时调低；'
+                            f'指定时隐含 --aggregate (默认: {AGGREGATE_MAX_KEYS})')
+    parser.add_argument('--combine', choices=consolidate.COMBINE_MODES,
+                       help='合并输出到一个Excel: sheet=单个工作表, hospital=每个医院一个工作表')
+    parser.add_argument('--incremental', action='store_true',
+                       help='增量模式: 根据输出目录中的清单跳过未变化的文件')
+    parser.add_argument('--resume', action='store_true',
+                       help='继续上次中断的任务: 跳过输出目录的任务日志中已完成的文件')
+    parser.add_argument('--watch', action='store_true',
+                       help='监视模式: 先处理已有文件，然后持续转换新增或修改的文件（隐含 --incremental），Ctrl+C退出')
+    parser.add_argument('--debounce', type=float, default=watcher.DEFAULT_DEBOUNCE, metavar='SECONDS',
+                       help=f'监视模式下文件多少秒不再变化后才转换 (默认: {watcher.DEFAULT_DEBOUNCE})')
+    parser.add_argument('--poll', action='store_true',
+                       help='监视模式下定时扫描目录，不使用inotify（如网络文件系统）')
+    parser.add_argument('--poll-interval', type=float, default=watcher.DEFAULT_INTERVAL, metavar='SECONDS',
+                       help=f'定时扫描的间隔秒数 (默认: {watcher.DEFAULT_INTERVAL})')
+    parser.add_argument('--cache', action='store_true',
+                       help='使用提取结果缓存，只改变输出选项重新导出时不再解析JSON（--stream 时只用于 --columnar，逐行流式输出不使用缓存）')
+    parser.add_argument('--cache-dir', metavar='DIR',
+                       help=f'提取结果缓存目录，指定时隐含 --cache (默认: {extract_cache.default_cache_dir()})')
+    parser.add_argument('--cache-size', default='2G', metavar='SIZE',
+                       help='缓存目录的大小上限，超过时删除最久未使用的条目 (默认: 2G)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='不读取也不写入提取结果缓存（默认不使用缓存，覆盖 --cache 和 --cache-dir）')
+    parser.add_argument('--metrics', metavar='REPORT',
+                       help='记录每个文件各阶段的耗时、读取字节数、行数和峰值内存，保存为JSON或CSV（按扩展名）；'
+                            f'监视模式下只保留最近 {WATCH_METRICS_RECORDS} 个文件')
+    parser.add_argument('--trace-memory', action='store_true',
+                       help='记录指标时同时用tracemalloc统计Python对象的峰值内存（较慢）')
+    parser.add_argument('--slowest', type=int, default=5, metavar='N',
+                       help='记录指标时列出最慢的N个文件 (默认: 5)')
+    parser.add_argument('--profile-startup', action='store_true',
+                       help='结束时报告解释器启动、模块导入、准备和转换的耗时，以及加载了哪些较慢的依赖')
     
     args = parser.parse_args()
+    if args.profile_startup:
+        atexit.register(report_startup, profile)
+    
+    try:
+        output_formats.check_format(args.format)
+        args.json_backend = json_backend.resolve_backend(args.json_backend)
+        if args.split_bytes is not None:
+            args.split_bytes = splitting.parse_size(args.split_bytes)
+        use_cache = (args.cache or args.cache_dir) and not args.no_cache
+        args.cache = None
+        if use_cache:
+            args.cache = extract_cache.ExtractCache(args.cache_dir or extract_cache.default_cache_dir(),
+                                                    splitting.parse_size(args.cache_size), CONVERTER_VERSION)
+        if args.aggregate_max_keys is not None:
+            if args.aggregate_max_keys < 1:
+                raise ValueError("--aggregate-max-keys 必须为正整数")
+            args.aggregate = args.aggregate_max_keys
+        args.row_filter = RowFilter(args.campus, args.title_regex, args.hospital, args.has_param) or None
+        args.split = None
+        if args.split_rows is not None or args.split_bytes is not None or args.split_to:
+            args.split = splitting.SplitLimit(args.split_rows, args.split_bytes, args.split_to or 'sheets')
+    except ValueError as e:
+        parser.error(str(e))
+    if args.split and args.writer == 'pandas':
+        parser.error("分割输出不支持 --writer pandas")
+    if args.split and args.split.mode == 'files' and args.combine == 'hospital':
+        parser.error("--combine hospital 只能分割为工作表")
+    if args.resume and args.combine:
+        parser.error("--resume 不支持 --combine")
+    if args.watch:
+        if args.combine:
+            parser.error("--watch 不支持 --combine")
+        if any(c in os.path.dirname(args.input_pattern) for c in '*?['):
+            parser.error("--watch 只支持在文件名中使用通配符")
+        # 修改的文件覆盖原来的输出，内容未变化的事件（如touch）不重新转换
+        args.incremental = True
     
     # 创建输出目录
     if not os.path.exists(args.output):
         os.makedirs(args.output)
     
+    # 监视模式在查找和转换已有文件之前开始监视，转换已有文件期间新增或修改的文件也会被检测到
+    # （同时出现在已有文件中的文件再次转换时按增量清单跳过）
+    source = open_watch_source(args) if args.watch else None
+    
     # 查找所有匹配的JSON文件
-    json_files = glob.glob(args.input_pattern)
+    json_files = input_files.list_inputs(args.input_pattern)
+    if args.row_filter and args.row_filter.hospitals:
+        # 按文件名中的hospital_id筛选，其他文件不打开
+        selected = args.row_filter.select_files(json_files)
+        if len(selected) < len(json_files):
+            print(f"按hospital_id跳过 {len(json_files) - len(selected)} 个文件")
+        json_files = selected
+    profile.mark('参数解析和查找文件')
+    
+    # 不同的输入文件写入同名的输出文件时会相互覆盖
+    duplicates = input_files.duplicate_output_names(json_files) if not args.combine else {}
+    if duplicates:
+        print("❌ 错误: 以下输入文件的输出文件名相同，请分别转换:")
+        for paths in duplicates.values():
+            print("  " + "、".join(paths))
+        if source is not None:
+            source.close()
+        return
     
     if not json_files:
         print(f"没有找到匹配的JSON文件: {args.input_pattern}")
-        return
+        if not args.watch:
+            return
     
     print(f"找到 {len(json_files)} 个JSON文件")
     print(f"输出目录: {args.output}")
-    print("-" * 50)
+    if not args.stream:
+        print(f"JSON解析: {args.json_backend}")
+    if args.row_filter:
+        print(f"筛选条件: {args.row_filter.describe()}")
+    if args.aggregate:
+        print("合并重复科室: 相同院区和科室ID只输出一行")
+        if args.aggregate is not True:
+            print(f"  内存中最多保存 {args.aggregate} 个科室")
     
-    # 处理每个文件
-    success_count = 0
-    for json_file in json_files:
-        if process_json_file(json_file, args.output):
-            success_count += 1
+    # 合并模式：所有文件写入同一个Excel
+    if args.combine:
+        print("-" * 50)
+        success_count = process_combined(json_files, args.output, args.combine, args.stream, args.width_sample,
+                                         args.format, args.json_backend, args.split, args.row_filter,
+                                         args.aggregate)
+        print("-" * 50)
+        print(f"处理完成: 成功 {success_count}/{len(json_files)} 个文件")
+        return
+    
+    records = convert_files(json_files, args) if json_files else []
+    if args.metrics:
+        report_metrics(records, args)
     
+    if args.watch:
+        watch_directory(args, records, source)
+
+
+def open_watch_source(args):
+    """开始监视输入目录（见 watcher.open_source）"""
+    directory = os.path.dirname(args.input_pattern) or '.'
+    pattern = os.path.basename(args.input_pattern)
+    return watcher.open_source(directory, pattern, 'poll' if args.poll else 'auto', args.poll_interval)
+
+
+def watch_directory(args, records, source):
+    """监视输入目录，文件写完后立即转换；进程和已导入的模块保持常驻，不需要每次重新启动
+
+    source 为转换已有文件之前打开的事件来源，结束时关闭
+    """
+    directory = os.path.dirname(args.input_pattern) or '.'
+    pattern = os.path.basename(args.input_pattern)
     print("-" * 50)
-    print(f"处理完成: 成功 {success_count}/{len(json_files)} 个文件")
+    print(f"👀 监视目录: {os.path.abspath(directory)} ({pattern}，{source.name})，按 Ctrl+C 退出")
+    
+    # 之后每批变化的文件都是新的任务
+    args.resume = False
+    # 只保留最近的指标记录，长时间监视时内存占用和报告大小不会一直增长
+    records = collections.deque(records, maxlen=WATCH_METRICS_RECORDS)
+    # 进程池在监视期间保持常驻
+    executor = None
+    if args.jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=args.jobs)
+    try:
+        for changed in watcher.iter_ready_files(source, args.debounce):
+            if args.row_filter:
+                changed = args.row_filter.select_files(changed)
+                if not changed:
+                    continue
+            print(f"\n🔔 {datetime.now().strftime('%H:%M:%S')} 检测到 {len(changed)} 个新增或修改的文件")
+            records.extend(convert_files(changed, args, executor))
+            if args.metrics:
+                report_metrics(list(records), args)
+    except KeyboardInterrupt:
+        print("\n已停止监视")
+    finally:
+        source.close()
+        if executor:
+            executor.shutdown()
+
+
+def report_startup(profile):
+    """打印启动耗时分析（--profile-startup，退出时调用）"""
+    profile.mark('转换')
+    print("⏱️  启动耗时分析:")
+    for line in profile.report_lines():
+        print(line)
+
+
+def report_metrics(records, args):
+    """保存性能指标报告并列出最慢的文件"""
+    metrics.write_report(records, args.metrics)
+    print(f"性能指标已保存: {args.metrics}")
+    if records and args.slowest > 0:
+        print(f"最慢的 {min(args.slowest, len(records))} 个文件:")
+        for line in metrics.summary_lines(records, args.slowest):
+            print(f"  🐢 {line}")
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
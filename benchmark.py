@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转换性能基准测试
+用模拟数据分别测量命令行和GUI两条路径各阶段（读取、提取、构建DataFrame、写入XLSX）的
+耗时、吞吐量和峰值内存，并与保存的基准结果比较；读取阶段使用转换器实际的读取路径，
+并分别测量每个已安装的JSON解析后端和流式解析
+"""
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+import engine
+import json_backend
+import synthetic_data
+
+
+# 默认的基准结果文件
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# 测试场景: 名称 -> synthetic_data.generate 的参数（行数 = 分组 * 院区 * 科室）
+SCENARIOS = {
+    '63': {'style': '63', 'departments': 400, 'campuses': 3, 'items_per_campus': 5, 'params_width': 0},
+    '193': {'style': '193', 'departments': 400, 'campuses': 3, 'items_per_campus': 5, 'params_width': 0},
+    '193-wide': {'style': '193', 'departments': 200, 'campuses': 3, 'items_per_campus': 5, 'params_width': 20},
+}
+
+# 前端路径: 名称 -> 输出列
+PATHS = {
+    'cli': engine.CLI_COLUMNS,
+    'gui': engine.GUI_COLUMNS,
+}
+
+STAGES = ('load', 'extract', 'dataframe', 'xlsx')
+
+# 耗时低于该值的阶段不判断性能下降（计时误差较大）
+MIN_COMPARE_SECONDS = 0.01
+
+
+def _gui_fixed_widths():
+    # GUI模块依赖tkinter，只在需要时导入
+    from json_to_excel_converter import EXCEL_FIXED_WIDTHS
+    return EXCEL_FIXED_WIDTHS
+
+
+def load_variants():
+    """读取阶段的变体：load 为默认的读取路径（自动选择解析后端），load.<后端> 为每个已安装的后端，
+    stream 为流式解析（解析与提取交替进行，不能分开计时，包括提取）"""
+    return ['load'] + [f'load.{backend}' for backend in json_backend.available_backends()] + ['stream']
+
+
+def stage_names():
+    """每条路径报告的全部阶段"""
+    return load_variants() + list(STAGES[1:])
+
+
+def measure(func, repeat=1, memory=True):
+    """执行 func，返回 (结果, 最短耗时秒数, 峰值内存字节数或None)
+
+    计时执行 repeat 次取最短耗时；memory=True 时另外在 tracemalloc 下执行一次测量峰值内存
+    """
+    best = None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return result, best, peak
+
+
+def run_path(json_file, hospital_id, path, work_dir, repeat=1, memory=True):
+    """测量一条前端路径的各阶段，返回 {阶段: (耗时, 峰值内存)} 和行数"""
+    columns = PATHS[path]
+    fixed_widths = _gui_fixed_widths() if path == 'gui' else None
+    output_file = os.path.join(work_dir, f'{path}.xlsx')
+    stages = {}
+
+    # 与转换时相同的读取路径（engine.open_source：按后端一次性读取字节或mmap映射后解析）
+    for stage in load_variants():
+        if stage == 'stream':
+            _, seconds, peak = measure(
+                lambda: sum(1 for _ in engine.iter_rows(json_file, columns, stream=True, hospital_id=hospital_id)),
+                repeat, memory)
+        else:
+            backend = stage.partition('.')[2] or None
+            result, seconds, peak = measure(
+                lambda: engine.open_source(json_file, hospital_id=hospital_id, backend=backend)[1],
+                repeat, memory)
+            if stage == 'load':
+                data = result
+        stages[stage] = (seconds, peak)
+
+    rows, seconds, peak = measure(lambda: list(engine.iter_rows(data, columns, hospital_id=hospital_id)),
+                                  repeat, memory)
+    stages['extract'] = (seconds, peak)
+
+    _, seconds, peak = measure(lambda: pd.DataFrame(rows, columns=columns), repeat, memory)
+    stages['dataframe'] = (seconds, peak)
+
+    sink = engine.FileSink(output_file, 'xlsx', fixed_widths=fixed_widths)
+    _, seconds, peak = measure(lambda: sink.write(rows, columns), repeat, memory)
+    stages['xlsx'] = (seconds, peak)
+
+    return stages, len(rows)
+
+
+def run(scale=1.0, repeat=3, memory=True, scenarios=None):
+    """运行全部场景，返回结果字典"""
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in scenarios or SCENARIOS:
+            params = dict(SCENARIOS[name])
+            params['departments'] = max(1, int(params['departments'] * scale))
+            hospital_id = params['style']
+            json_file = os.path.join(work_dir, f'{hospital_id}_triage.json')
+            synthetic_data.write_file(json_file, **params)
+
+            stages = {}
+            for path in PATHS:
+                path_stages, row_count = run_path(json_file, hospital_id, path, work_dir, repeat, memory)
+                for stage, (seconds, peak) in path_stages.items():
+                    stages[f'{path}.{stage}'] = {
+                        'seconds': round(seconds, 6),
+                        'rows_per_sec': round(row_count / seconds) if seconds else None,
+                        'peak_mb': round(peak / (1 << 20), 3) if peak is not None else None,
+                    }
+            results[name] = {'params': params, 'rows': row_count,
+                             'file_mb': round(os.path.getsize(json_file) / (1 << 20), 3),
+                             'stages': stages}
+
+    return {'python': platform.python_version(), 'scale': scale, 'scenarios': results}
+
+
+def compare(current, baseline, tolerance=0.25):
+    """与基准结果比较，返回 [(场景, 阶段, 当前耗时, 基准耗时, 比值), ...] 中变慢超过容差的条目"""
+    regressions = []
+    for name, result in current['scenarios'].items():
+        base_result = baseline.get('scenarios', {}).get(name)
+        if not base_result or base_result.get('rows') != result['rows']:
+            continue
+        for stage, stats in result['stages'].items():
+            base_stats = base_result['stages'].get(stage)
+            if not base_stats or not base_stats['seconds']:
+                continue
+            ratio = stats['seconds'] / base_stats['seconds']
+            if ratio > 1 + tolerance and stats['seconds'] >= MIN_COMPARE_SECONDS:
+                regressions.append((name, stage, stats['seconds'], base_stats['seconds'], ratio))
+    return regressions
+
+
+def print_report(current, baseline=None):
+    """打印各阶段的耗时、吞吐量、峰值内存和与基准的比值"""
+    for name, result in current['scenarios'].items():
+        base_stages = ((baseline or {}).get('scenarios', {}).get(name) or {}).get('stages', {})
+        print(f"\n📊 场景 {name}: {result['rows']}条记录, JSON {result['file_mb']} MB")
+        print(f"{'阶段':<16}{'耗时(秒)':>12}{'行/秒':>12}{'峰值内存(MB)':>16}{'对比基准':>10}")
+        for stage, stats in result['stages'].items():
+            base_stats = base_stages.get(stage)
+            ratio = ''
+            if base_stats and base_stats['seconds']:
+                ratio = f"{stats['seconds'] / base_stats['seconds']:.2f}x"
+            peak = '-' if stats['peak_mb'] is None else f"{stats['peak_mb']:.2f}"
+            rate = '-' if stats['rows_per_sec'] is None else stats['rows_per_sec']
+            print(f"{stage:<16}{stats['seconds']:>12.4f}{rate:>12}{peak:>16}{ratio:>10}")
+
+
+def load_baseline(filename):
+    """读取基准结果，文件不存在时返回None"""
+    if not os.path.exists(filename):
+        return None
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='转换性能基准测试')
+    parser.add_argument('--scale', type=float, default=1.0, help='数据规模倍数 (默认: 1.0)')
+    parser.add_argument('--repeat', type=int, default=3, help='每个阶段重复次数，取最短耗时 (默认: 3)')
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                        help='只运行指定场景（可重复指定）')
+    parser.add_argument('--no-memory', action='store_true', help='不测量峰值内存')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='基准结果文件')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果保存为基准')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='允许比基准慢的比例，超过时返回非零退出码 (默认: 0.25)')
+    parser.add_argument('--output', help='将结果保存为JSON文件')
+    args = parser.parse_args()
+
+    current = run(args.scale, args.repeat, not args.no_memory, args.scenario)
+    baseline = load_baseline(args.baseline)
+    if baseline and baseline.get('scale') != current['scale']:
+        print(f"⚠️  警告: 基准结果的数据规模为 {baseline.get('scale')}，与本次不同，不进行比较")
+        baseline = None
+
+    print_report(current, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"\n基准结果已保存: {args.baseline}")
+        return 0
+
+    if baseline:
+        regressions = compare(current, baseline, args.tolerance)
+        print("-" * 50)
+        if regressions:
+            for name, stage, seconds, base_seconds, ratio in regressions:
+                print(f"❌ 变慢: {name} {stage} {base_seconds:.4f}s → {seconds:.4f}s ({ratio:.2f}x)")
+            return 1
+        print(f"✅ 所有阶段均未超过基准的 {1 + args.tolerance:.2f} 倍")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式数据表
+提取结果按列存储，不为每行创建字典；hospital_id、symptom_text 等重复字段使用游程编码
+"""
+
+import itertools
+
+
+def _same(a, b):
+    """判断两个值能否合并为同一游程（1、1.0、True 不视为相同）"""
+    return a is b or (type(a) is type(b) and a == b)
+
+
+class StringPool(dict):
+    """字符串去重：内容相同的字符串共用同一个对象
+
+    pool[s] 返回池中与 s 相等的字符串（第一次出现时加入池中）；只在一次提取内使用，
+    不用 sys.intern，提取结束后随数据一起释放
+    """
+
+    def __missing__(self, key):
+        self[key] = key
+        return key
+
+    def intern(self, value):
+        """字符串去重，其他类型原样返回"""
+        return self[value] if type(value) is str else value
+
+
+class RunLengthColumn:
+    """游程编码列：values[i] 连续重复 counts[i] 次"""
+
+    __slots__ = ('values', 'counts', '_length')
+
+    def __init__(self):
+        self.values = []
+        self.counts = []
+        self._length = 0
+
+    @classmethod
+    def from_runs(cls, values, counts):
+        """由 (值列表, 重复次数列表) 直接构建"""
+        column = cls()
+        column.values = list(values)
+        column.counts = list(counts)
+        column._length = sum(column.counts)
+        return column
+
+    def append(self, value):
+        self.extend_repeat(value, 1)
+
+    def extend_repeat(self, value, count):
+        """追加 count 个相同的值"""
+        if count <= 0:
+            return
+        if self.values and _same(self.values[-1], value):
+            self.counts[-1] += count
+        else:
+            self.values.append(value)
+            self.counts.append(count)
+        self._length += count
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for value, count in zip(self.values, self.counts):
+            yield from itertools.repeat(value, count)
+
+    def runs(self):
+        """逐个产出 (值, 重复次数)"""
+        return zip(self.values, self.counts)
+
+    def to_categorical(self):
+        """转换为pandas分类数据：每个不同的值只保存一次，行中只保存分类编号"""
+        import numpy
+        import pandas as pd
+        categories = {}
+        codes = []
+        for value in self.values:
+            if value is None:
+                codes.append(-1)
+            else:
+                # 按类型区分，1、1.0、True 不合并为同一分类
+                codes.append(categories.setdefault((type(value), value), len(categories)))
+        categories = pd.Index([value for _, value in categories], dtype=object)
+        if not categories.is_unique:
+            # pandas把 1 和 True 视为同一分类，保留原始值
+            return list(self)
+        return pd.Categorical.from_codes(numpy.repeat(codes, self.counts), categories=categories)
+
+
+class ColumnarTable:
+    """按列存储的提取结果
+
+    Args:
+        columns: 列顺序
+        run_length_columns: 使用游程编码的列（同一文件、同一症状或同一院区内重复的字段）
+    """
+
+    def __init__(self, columns, run_length_columns=()):
+        self.columns = list(columns)
+        self.data = {col: RunLengthColumn() if col in run_length_columns else []
+                     for col in self.columns}
+
+    def __getitem__(self, column):
+        return self.data[column]
+
+    def __len__(self):
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def iter_tuples(self, columns=None):
+        """按行产出值元组（不创建字典）"""
+        return zip(*(self.data[col] for col in (columns or self.columns)))
+
+    def iter_dicts(self, columns=None):
+        """按行产出字典，用于需要行字典的旧接口"""
+        columns = columns or self.columns
+        for values in self.iter_tuples(columns):
+            yield dict(zip(columns, values))
+
+    def to_dataframe(self, columns=None):
+        """直接由列数据构建DataFrame，无需pandas从行字典推断列；游程编码列转换为分类(category)列"""
+        import pandas as pd
+        columns = columns or self.columns
+        data = {}
+        for col in columns:
+            column = self.data[col]
+            data[col] = column.to_categorical() if isinstance(column, RunLengthColumn) else list(column)
+        return pd.DataFrame(data, columns=columns)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多医院合并输出
+将多个JSON文件写入同一个输出文件：单个工作表（以hospital_id列区分）或每个医院一个工作表。
+URL参数展开为独立的列，列集合为全部文件URL参数的并集，通过只读取baseurl的预扫描确定。
+"""
+
+import itertools
+import re
+import tempfile
+
+import engine
+import input_files
+import excel_writer
+import json_stream
+import output_formats
+from extraction import extract_baseurls, extract_hospital_id, extract_url_params
+from xlsx_writer import XlsxWorkbook
+
+
+# 合并方式: sheet=全部写入一个工作表, hospital=每个医院一个工作表
+COMBINE_MODES = ('sheet', 'hospital')
+
+BASE_COLUMNS = ['hospital_id', 'baseurl', 'campus_id', 'department_title',
+                'symptom_text', 'diagnosis_text']
+
+FIXED_WIDTHS = {'baseurl': 80}
+
+# Excel工作表名称的限制
+_MAX_SHEET_NAME = 31
+_INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+
+def scan_url_params(json_files):
+    """预扫描所有文件的baseurl，返回URL参数的并集（保持首次出现的顺序）
+
+    只读取顶层的baseurl字段，不解析科室数据；无法读取或解压的文件跳过，由正式处理时报告错误
+    """
+    params = {}
+    for json_file in json_files:
+        try:
+            metadata = json_stream.read_metadata(json_file)
+        except input_files.READ_ERRORS + (ValueError,):
+            continue
+        for url, _ in extract_baseurls(metadata):
+            params.update(dict.fromkeys(extract_url_params(url)))
+    # 63格式的position字段也会出现在参数中
+    params.setdefault('position')
+    return list(params)
+
+
+def build_columns(url_params):
+    """合并输出的列：基础列 + URL参数列（与基础列重名时加 param_ 前缀）"""
+    return BASE_COLUMNS + [f'param_{p}' if p in BASE_COLUMNS else p for p in url_params]
+
+
+def iter_file_values(json_file, url_params, stream=False, backend=None, row_filter=None, aggregate=False):
+    """产出单个文件按合并列顺序排列的值元组，row_filter 和 aggregate 见 engine.iter_rows"""
+    for row in engine.iter_rows(json_file, BASE_COLUMNS, stream, params_as_dict=True, backend=backend,
+                                row_filter=row_filter, aggregate=aggregate):
+        params = row['url_params']
+        yield (row['hospital_id'], row['baseurl'], row['campus_id'], row['department_title'],
+               row['symptom_text'], row['diagnosis_text']) + tuple(params.get(p, '') for p in url_params)
+
+
+def _track_file(json_file, values, on_file_done):
+    """转发一个文件的行并在结束时报告结果，出错的文件不中断整个合并
+
+    行先暂存到临时文件，整个文件读取成功后才转发，中途出错的文件不会在合并结果中留下部分行
+    """
+    with tempfile.TemporaryFile() as spool:
+        try:
+            count = excel_writer.spool_rows(values, spool)
+        except Exception as e:
+            if on_file_done:
+                on_file_done(json_file, 0, str(e))
+            return
+        yield from excel_writer.iter_spool(spool)
+    if on_file_done:
+        on_file_done(json_file, count, None)
+
+
+def _sheet_name(json_file, hospital_id, used_names):
+    """生成合法且不重复的工作表名称"""
+    base = hospital_id or input_files.base_name(json_file)
+    base = _INVALID_SHEET_CHARS.sub('_', base)[:_MAX_SHEET_NAME] or 'sheet'
+    name = base
+    suffix = 2
+    while name.lower() in used_names:
+        tail = f'_{suffix}'
+        name = base[:_MAX_SHEET_NAME - len(tail)] + tail
+        suffix += 1
+    used_names.add(name.lower())
+    return name
+
+
+def write_consolidated(json_files, output_file, mode='sheet', stream=False, width_sample=None,
+                       on_file_done=None, fmt='xlsx', backend=None, split=None, row_filter=None, aggregate=False):
+    """将多个JSON文件合并写入一个文件，返回写入的总行数
+
+    每个医院一个工作表只支持xlsx；合并为单个表时也可以输出CSV、JSONL或Parquet
+
+    Args:
+        json_files: 输入文件列表
+        output_file: 输出文件
+        mode: 'sheet' 全部写入一个工作表；'hospital' 每个医院一个工作表
+        stream: 是否流式解析JSON
+        width_sample: 估算列宽的抽样行数
+        on_file_done: 每个文件处理完成后调用 on_file_done(文件, 行数, 错误信息)
+        fmt: 输出格式
+        backend: JSON解析后端
+        split: 分割阈值（splitting.SplitLimit）；每个医院一个工作表时，超过阈值的医院继续写入
+            {名称}_2 等工作表
+        row_filter: 筛选条件（row_filter.RowFilter）；hospital_id不符合的文件不读取
+        aggregate: 是否合并每个文件中重复的科室
+    """
+    if mode not in COMBINE_MODES:
+        raise ValueError(f"不支持的合并方式: {mode}")
+    output_formats.check_format(fmt)
+    if mode == 'hospital' and fmt != 'xlsx':
+        raise ValueError("每个医院一个工作表只支持xlsx格式")
+    if mode == 'hospital' and split is not None and split.mode == 'files':
+        raise ValueError("每个医院一个工作表时只能分割为工作表")
+
+    if row_filter:
+        json_files = row_filter.select_files(json_files)
+    url_params = scan_url_params(json_files)
+    columns = build_columns(url_params)
+
+    if mode == 'sheet':
+        value_rows = (row for json_file in json_files
+                      for row in _track_file(json_file,
+                                             iter_file_values(json_file, url_params, stream, backend, row_filter,
+                                                              aggregate),
+                                             on_file_done))
+        return output_formats.write_values(value_rows, output_file, columns, fmt, FIXED_WIDTHS, width_sample,
+                                           split)
+
+    # 每个医院一个工作表
+    with XlsxWorkbook() as workbook:
+        total = 0
+        used_names = set()
+        for json_file in json_files:
+            value_rows = _track_file(json_file,
+                                     iter_file_values(json_file, url_params, stream, backend, row_filter,
+                                                      aggregate),
+                                     on_file_done)
+            # 出错或没有数据的文件不创建工作表
+            first_row = next(value_rows, None)
+            if first_row is None:
+                continue
+            sheet_name = _sheet_name(json_file, extract_hospital_id(json_file), used_names)
+            total += excel_writer.append_sheet(workbook, sheet_name, itertools.chain([first_row], value_rows),
+                                               columns, FIXED_WIDTHS, width_sample, limit=split)
+            # 分割出的 {名称}_2 等工作表
+            used_names.update(name.lower() for name in workbook.sheetnames)
+        if not used_names:
+            # 工作簿至少需要一个工作表
+            excel_writer.append_sheet(workbook, excel_writer.SHEET_NAME, iter(()), columns)
+
+        with output_formats.atomic_output(output_file) as tmp_path:
+            workbook.save(tmp_path)
+    return total
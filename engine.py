@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转换引擎
+GUI、命令行和其他Python服务共用的转换入口，不依赖tkinter：
+iter_rows 逐条产出行数据，convert 将行数据交给可替换的输出目标（sink）
+"""
+
+import itertools
+
+import input_files
+import json_backend
+import json_stream
+import output_formats
+from columnar import ColumnarTable
+from extraction import (COLUMNS, LEGACY_COLUMNS, RUN_LENGTH_COLUMNS, extract_baseurl, extract_baseurls,
+                        extract_columnar, extract_hospital_id, iter_department_rows, load_json)
+
+
+# 各前端使用的列，其他调用方可以从 extraction.ALL_COLUMNS 中任选
+GUI_COLUMNS = COLUMNS
+CLI_COLUMNS = LEGACY_COLUMNS
+
+# 转换器版本：提取逻辑或输出格式变化时递增，增量清单和提取结果缓存中的旧记录随之失效
+CONVERTER_VERSION = '3'
+
+# 每处理多少行检查一次取消请求
+CANCEL_CHECK_ROWS = 1000
+
+
+class Cancelled(Exception):
+    """转换被调用方取消"""
+
+
+def cancellable(rows, cancel):
+    """包装行迭代器，每 CANCEL_CHECK_ROWS 行检查一次 cancel（threading.Event），已设置时抛出 Cancelled"""
+    for i, row in enumerate(rows):
+        if i % CANCEL_CHECK_ROWS == 0 and cancel.is_set():
+            raise Cancelled()
+        yield row
+
+
+def _load_with_metrics(json_file, stream, metrics, backend=None):
+    """与 load_json 相同，同时记录读取字节数和读取、解析阶段的耗时"""
+    metrics.bytes_read += input_files.stored_size(json_file)
+    if stream:
+        # 流式解析时读取与解析交替进行，全部计入解析阶段
+        with metrics.stage('parse'):
+            metadata = json_stream.read_metadata(json_file)
+        departments = json_stream.iter_departments(json_file, lazy=True,
+                                                   wrap=lambda items: metrics.timed_iter(items, 'parse'))
+        return metadata, metrics.timed_iter(departments, 'parse')
+    with metrics.stage('read'):
+        raw = json_backend.read_bytes(json_file)
+    with metrics.stage('parse'):
+        data = json_backend.loads(raw, backend)
+    del raw
+    return data, data.get('departments', [])
+
+
+def open_source(source, stream=False, hospital_id=None, metrics=None, backend=None):
+    """打开数据源，返回 (hospital_id, 顶层字段, departments迭代器)
+
+    source 可以是JSON文件路径，也可以是已解析的JSON对象（dict）；
+    hospital_id 为空时从文件名提取；metrics 为 metrics.FileMetrics 时记录读取和解析阶段；
+    backend 为非流式解析时使用的JSON解析后端（见 json_backend）
+    """
+    if isinstance(source, dict):
+        return hospital_id, source, source.get('departments', [])
+    if hospital_id is None:
+        hospital_id = extract_hospital_id(source)
+    if metrics is not None:
+        data, departments = _load_with_metrics(source, stream, metrics, backend)
+    else:
+        data, departments = load_json(source, stream, backend)
+    return hospital_id, data, departments
+
+
+def iter_rows(source, columns=GUI_COLUMNS, stream=False, hospital_id=None, params_as_dict=False,
+              metrics=None, backend=None, cancel=None, cache=None, row_filter=None, aggregate=False):
+    """逐条产出行字典，行中只包含 columns 中的字段
+
+    stream=True 时逐个科室流式解析文件（见 json_stream）；params_as_dict=True 时URL参数以字典形式
+    保存在 'url_params' 中；metrics 不为空时记录各阶段耗时和行数；
+    cancel 为 threading.Event 时，设置后在处理下一批行时抛出 Cancelled；
+    cache 为 extract_cache.ExtractCache 时先查找缓存，未命中时在产出行的同时按列收集，
+    全部产出后写入缓存（只用于文件路径，不用于 params_as_dict）；流式解析时不使用缓存
+    （收集会保存全部行，内存占用不再固定；查找需要计算整个文件的哈希）；
+    row_filter 为 row_filter.RowFilter 时只产出符合条件的行，hospital_id不符合时不打开文件；
+    aggregate=True 时合并重复的科室，症状和诊断合并到一行中，为整数时同时指定索引中最多保存的科室数
+    （见 extraction.iter_department_rows）
+    """
+    if row_filter:
+        if hospital_id is None and not isinstance(source, dict):
+            hospital_id = extract_hospital_id(source)
+        if not row_filter.accepts_hospital(hospital_id):
+            return
+    if cache is not None and not stream and not isinstance(source, dict) and not params_as_dict:
+        if hospital_id is None:
+            hospital_id = extract_hospital_id(source)
+        key, table = _cache_lookup(cache, source, columns, hospital_id, metrics, row_filter, aggregate)
+        if table is not None:
+            rows = table.iter_dicts(columns)
+            if cancel is not None:
+                rows = cancellable(rows, cancel)
+            yield from rows
+            return
+        yield from _collect_into_cache(iter_rows(source, columns, stream, hospital_id, metrics=metrics,
+                                                 backend=backend, cancel=cancel, row_filter=row_filter,
+                                                 aggregate=aggregate),
+                                       columns, cache, key)
+        return
+
+    hospital_id, data, departments = open_source(source, stream, hospital_id, metrics, backend)
+    baseurl, url_params = extract_baseurl(data)
+    rows = iter_department_rows(departments, hospital_id, baseurl, url_params, extract_baseurls(data),
+                                params_as_dict, columns, row_filter, aggregate)
+    if cancel is not None:
+        rows = cancellable(rows, cancel)
+    if metrics is not None:
+        rows = metrics.timed_iter(rows, 'extract', count_rows=True)
+    yield from rows
+
+
+def extract_table(source, columns=GUI_COLUMNS, stream=False, hospital_id=None, metrics=None, backend=None,
+                  cache=None, row_filter=None, aggregate=False):
+    """列式提取，返回 ColumnarTable；cache、row_filter 和 aggregate 见 iter_rows"""
+    if row_filter:
+        if hospital_id is None and not isinstance(source, dict):
+            hospital_id = extract_hospital_id(source)
+        if not row_filter.accepts_hospital(hospital_id):
+            return ColumnarTable(columns, RUN_LENGTH_COLUMNS)
+    if cache is not None and not isinstance(source, dict):
+        if hospital_id is None:
+            hospital_id = extract_hospital_id(source)
+        key, table = _cache_lookup(cache, source, columns, hospital_id, metrics, row_filter, aggregate)
+        if table is None:
+            table = extract_table(source, columns, stream, hospital_id, metrics, backend, row_filter=row_filter,
+                                  aggregate=aggregate)
+            cache.put(key, table)
+        return table
+
+    hospital_id, data, departments = open_source(source, stream, hospital_id, metrics, backend)
+    baseurl, url_params = extract_baseurl(data)
+    if metrics is None:
+        return extract_columnar(departments, hospital_id, baseurl, url_params, extract_baseurls(data), columns,
+                                row_filter, aggregate)
+    with metrics.stage('extract'):
+        table = extract_columnar(departments, hospital_id, baseurl, url_params, extract_baseurls(data), columns,
+                                 row_filter, aggregate)
+    metrics.add_rows(len(table))
+    return table
+
+
+def _cache_lookup(cache, json_file, columns, hospital_id, metrics=None, row_filter=None, aggregate=False):
+    """查找缓存，返回 (缓存键, ColumnarTable)，未命中时表为None；计算哈希和读取缓存计入读取阶段
+
+    筛选条件不同、是否合并重复科室不同的提取结果分别缓存
+    """
+    options = {'columns': list(columns), 'hospital_id': hospital_id}
+    if row_filter:
+        options['row_filter'] = row_filter.options()
+    if aggregate:
+        options['aggregate'] = aggregate
+    if metrics is None:
+        key = cache.key(json_file, **options)
+        return key, cache.get(key)
+    with metrics.stage('read'):
+        key = cache.key(json_file, **options)
+        table = cache.get(key)
+    metrics.cache_hit = table is not None
+    if table is not None:
+        metrics.bytes_read += input_files.stored_size(json_file)
+        metrics.add_rows(len(table))
+    return key, table
+
+
+def _collect_into_cache(rows, columns, cache, key):
+    """产出行的同时按列收集，全部产出后写入缓存（中途取消、出错或未读完时不写入）"""
+    table = ColumnarTable(columns, RUN_LENGTH_COLUMNS)
+    collected = [(table[col], col) for col in columns]
+    for row in rows:
+        for column, col in collected:
+            column.append(row.get(col))
+        yield row
+    cache.put(key, table)
+
+
+def peek(rows):
+    """检查是否有数据，返回 (rows, 是否有数据)
+
+    行迭代器会预读第一行，返回的 rows 仍包含该行；列式数据表直接按长度判断
+    """
+    if isinstance(rows, ColumnarTable):
+        return rows, len(rows) > 0
+    rows = iter(rows)
+    first_row = next(rows, None)
+    if first_row is None:
+        return rows, False
+    return itertools.chain([first_row], rows), True
+
+
+def convert(source, sink, columns=GUI_COLUMNS, stream=False, columnar=False, hospital_id=None, metrics=None,
+            backend=None, cancel=None, cache=None, row_filter=None, aggregate=False):
+    """转换一个数据源并写入 sink，返回 sink.write 的结果（通常为行数）
+
+    sink 是任何提供 write(rows, columns) 方法的对象，rows 为行字典的迭代器，
+    columnar=True 时为列式数据表（ColumnarTable）；metrics 不为空时记录各阶段指标；
+    cancel 见 iter_rows（列式提取在提取完成后检查）；cache 为提取结果缓存（见 iter_rows）；
+    row_filter 为筛选条件，aggregate=True 时合并重复的科室（见 iter_rows）
+    """
+    if columnar:
+        rows = extract_table(source, columns, stream, hospital_id, metrics, backend, cache, row_filter, aggregate)
+        if cancel is not None and cancel.is_set():
+            raise Cancelled()
+    else:
+        rows = iter_rows(source, columns, stream, hospital_id, metrics=metrics, backend=backend, cancel=cancel,
+                         cache=cache, row_filter=row_filter, aggregate=aggregate)
+    if metrics is None:
+        return sink.write(rows, columns)
+    with metrics.stage('write'):
+        return sink.write(rows, columns)
+
+
+class FileSink:
+    """写入文件，格式由 fmt 指定或根据文件扩展名确定（xlsx/csv/jsonl/parquet）
+
+    split 为 splitting.SplitLimit 时按行数或大小分割为多个工作表或文件（见 output_formats.write_values）
+    """
+
+    def __init__(self, filename, fmt=None, fixed_widths=None, width_sample=None, split=None):
+        self.filename = filename
+        self.fmt = fmt or output_formats.format_from_filename(filename)
+        self.fixed_widths = fixed_widths
+        self.width_sample = width_sample
+        self.split = split
+
+    def write(self, rows, columns):
+        return output_formats.write_rows(rows, self.filename, columns, self.fmt, self.fixed_widths,
+                                         self.width_sample, self.split)
+
+
+class ListSink:
+    """收集行字典到列表中（如GUI预览）"""
+
+    def __init__(self):
+        self.rows = []
+
+    def write(self, rows, columns):
+        if isinstance(rows, ColumnarTable):
+            rows = rows.iter_dicts(columns)
+        self.rows.extend(rows)
+        return len(self.rows)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式Excel写入
+不经过pandas DataFrame，将行数据直接写入工作表（见 xlsx_writer，重复的字符串只在共享字符串表中保存一次）
+"""
+
+import itertools
+import pickle
+import tempfile
+from contextlib import contextmanager
+
+import splitting
+from splitting import SplitLimit
+from xlsx_writer import HEADER_STYLE, XlsxWorkbook, column_letter
+
+
+SHEET_NAME = '科室数据'
+MAX_COLUMN_WIDTH = 50
+
+# 暂存文件中每批写入的行数
+SPOOL_BATCH_SIZE = 1000
+
+# 写入共享字符串表的列（取值在大量行中重复），其他列的字符串写为内联字符串，
+# 如每行不同的 url_params_json 和科室ID不占用共享字符串表的内存
+SHARED_STRING_COLUMNS = frozenset(('hospital_id', 'baseurl', 'campus_id', 'department_title', 'area_name',
+                                   'symptom_text', 'diagnosis_text'))
+
+
+class ColumnWidthTracker:
+    """在数据产生的同时统计每列最大显示宽度
+
+    sample_rows 不为空时只统计前 sample_rows 行，之后的行不再测量
+    """
+
+    def __init__(self, columns, sample_rows=None):
+        self.columns = list(columns)
+        self.sample_rows = sample_rows
+        self.max_lengths = [len(str(col)) for col in self.columns]
+        self.rows_seen = 0
+
+    @property
+    def done(self):
+        """是否已达到抽样行数"""
+        return self.sample_rows is not None and self.rows_seen >= self.sample_rows
+
+    def update(self, values):
+        """测量一行（按列顺序的值元组）"""
+        if self.done:
+            return
+        self.rows_seen += 1
+        max_lengths = self.max_lengths
+        for idx, value in enumerate(values):
+            length = len(value) if type(value) is str else len(str(value))
+            if length > max_lengths[idx]:
+                max_lengths[idx] = length
+
+    def track(self, value_rows):
+        """包装值元组迭代器，在数据流经时测量"""
+        for values in value_rows:
+            self.update(values)
+            yield values
+
+    def track_dicts(self, rows):
+        """包装行字典迭代器，在数据流经时测量"""
+        columns = self.columns
+        for row in rows:
+            self.update(tuple(row.get(col) for col in columns))
+            yield row
+
+    def update_column(self, idx, values):
+        """直接测量一整列的值（用于列式数据，重复值只需测量一次）"""
+        max_length = self.max_lengths[idx]
+        for value in values:
+            length = len(value) if type(value) is str else len(str(value))
+            if length > max_length:
+                max_length = length
+        self.max_lengths[idx] = max_length
+
+    def widths(self, fixed_widths=None, max_width=MAX_COLUMN_WIDTH):
+        """计算列宽：最大长度+2，不超过 max_width；fixed_widths 中的列使用固定宽度"""
+        fixed_widths = fixed_widths or {}
+        return {col: fixed_widths[col] if col in fixed_widths else min(length + 2, max_width)
+                for col, length in zip(self.columns, self.max_lengths)}
+
+    def column_widths(self, fixed_widths=None, max_width=MAX_COLUMN_WIDTH):
+        """按列序号（从1开始）的列宽，用于 xlsx_writer 工作表"""
+        widths = self.widths(fixed_widths, max_width)
+        return {idx + 1: widths[col] for idx, col in enumerate(self.columns)}
+
+    def apply(self, worksheet, fixed_widths=None, max_width=MAX_COLUMN_WIDTH):
+        """设置工作表列宽（支持超过26列）"""
+        widths = self.widths(fixed_widths, max_width)
+        for idx, col in enumerate(self.columns):
+            worksheet.column_dimensions[column_letter(idx + 1)].width = widths[col]
+
+
+def measure_table(table, columns=None, sample_rows=None):
+    """测量列式数据表的列宽，游程编码列中重复的值只测量一次"""
+    columns = list(columns or table.columns)
+    tracker = ColumnWidthTracker(columns, sample_rows)
+    for idx, col in enumerate(columns):
+        column = table[col]
+        if hasattr(column, 'runs'):
+            runs = column.runs()
+            if sample_rows is not None:
+                runs = _limit_runs(runs, sample_rows)
+            tracker.update_column(idx, (value for value, _ in runs))
+        else:
+            values = column if sample_rows is None else itertools.islice(column, sample_rows)
+            tracker.update_column(idx, values)
+    tracker.rows_seen = len(table) if sample_rows is None else min(len(table), sample_rows)
+    return tracker
+
+
+def _limit_runs(runs, limit):
+    """只取覆盖前 limit 行的游程"""
+    total = 0
+    for value, count in runs:
+        if total >= limit:
+            return
+        yield value, count
+        total += count
+
+
+def spool_rows(value_rows, spool):
+    """将行数据（值元组）分批写入暂存文件，返回行数"""
+    batch = []
+    count = 0
+    for values in value_rows:
+        batch.append(values)
+        count += 1
+        if len(batch) >= SPOOL_BATCH_SIZE:
+            pickle.dump(batch, spool, pickle.HIGHEST_PROTOCOL)
+            batch = []
+    if batch:
+        pickle.dump(batch, spool, pickle.HIGHEST_PROTOCOL)
+    return count
+
+
+def iter_spool(spool):
+    """从暂存文件中逐行读回数据"""
+    spool.seek(0)
+    while True:
+        try:
+            batch = pickle.load(spool)
+        except EOFError:
+            return
+        yield from batch
+
+
+def write_excel(rows, filename, columns=None, fixed_widths=None, sheet_name=SHEET_NAME,
+                width_sample=None, limit=None):
+    """流式写入Excel文件，返回写入的行数
+
+    rows 为字典的可迭代对象（可以是生成器）。只写工作表要求在写入第一行之前确定列宽，
+    因此默认先将行数据分批暂存到临时文件并统计列宽，再写入工作表，内存占用与行数无关。
+    指定 width_sample 时只根据前 width_sample 行估算列宽，不再暂存，单次写入完成。
+
+    Args:
+        rows: 行数据（字典）
+        filename: 输出文件路径
+        columns: 列顺序，默认使用第一行的键
+        fixed_widths: 指定列的固定宽度，如 {'baseurl': 80}
+        sheet_name: 工作表名称
+        width_sample: 估算列宽的抽样行数，为空时测量全部行
+        limit: 每个工作表的分割阈值（splitting.SplitLimit），默认为Excel的行数上限
+    """
+    rows = iter(rows)
+    if columns is None:
+        first_row = next(rows, None)
+        columns = list(first_row.keys()) if first_row else []
+        if first_row is not None:
+            rows = itertools.chain([first_row], rows)
+    value_rows = (tuple(row.get(col) for col in columns) for row in rows)
+    return write_values(value_rows, filename, columns, fixed_widths, sheet_name, width_sample, limit=limit)
+
+
+def write_table(table, filename, columns=None, fixed_widths=None, sheet_name=SHEET_NAME,
+                width_sample=None, limit=None):
+    """将列式数据表（ColumnarTable）写入Excel，不创建行字典，返回写入的行数
+
+    数据已在内存中，列宽直接按列测量，不需要暂存文件
+    """
+    columns = list(columns or table.columns)
+    tracker = measure_table(table, columns, width_sample)
+    return write_values(table.iter_tuples(columns), filename, columns, fixed_widths, sheet_name,
+                        tracker=tracker, limit=limit)
+
+
+def write_values(value_rows, filename, columns, fixed_widths=None, sheet_name=SHEET_NAME,
+                 width_sample=None, tracker=None, limit=None):
+    """写入值元组形式的行数据，返回写入的行数
+
+    tracker 为已完成测量的 ColumnWidthTracker 时直接写入；
+    超过 limit（splitting.SplitLimit，默认为Excel的行数上限）时切换到下一个工作表
+    """
+    with XlsxWorkbook() as workbook:
+        count = append_sheet(workbook, sheet_name, value_rows, columns, fixed_widths, width_sample, tracker,
+                             limit)
+        workbook.save(filename)
+    return count
+
+
+def write_files(value_rows, open_part, columns, fixed_widths=None, sheet_name=SHEET_NAME,
+                width_sample=None, tracker=None, limit=None):
+    """按 limit 分割为多个Excel文件，每个文件一个工作表，返回写入的总行数
+
+    open_part(part) 为上下文管理器，产出第 part 个文件（从1开始）的写入路径；
+    列宽按全部行统计，各文件的列宽相同
+    """
+    limit = (limit or SplitLimit()).for_sheet()
+    with _measured_rows(value_rows, columns, width_sample, tracker) as (tracker, value_rows):
+        widths = tracker.column_widths(fixed_widths)
+        splitter = limit.split(value_rows)
+        count = 0
+        part = 1
+        while True:
+            with XlsxWorkbook() as workbook:
+                count += _write_sheet(workbook, sheet_name, splitter, columns, widths)
+                with open_part(part) as path:
+                    workbook.save(path)
+            if not splitter.has_more():
+                return count
+            part += 1
+
+
+def append_sheet(workbook, sheet_name, value_rows, columns, fixed_widths=None, width_sample=None,
+                 tracker=None, limit=None):
+    """在工作簿（xlsx_writer.XlsxWorkbook）中追加工作表并写入全部行，写完后立即关闭工作表
+
+    工作表内容只保存在临时文件中，多个工作表依次写入时内存占用不会累积，
+    所有工作表共用工作簿的共享字符串表；超过 limit（默认为Excel的行数上限）时
+    继续写入 sheet_name_2、sheet_name_3 ...，每个工作表都有表头，列宽相同
+    """
+    limit = (limit or SplitLimit()).for_sheet()
+    with _measured_rows(value_rows, columns, width_sample, tracker) as (tracker, value_rows):
+        widths = tracker.column_widths(fixed_widths)
+        splitter = limit.split(value_rows)
+        count = 0
+        part = 1
+        while True:
+            count += _write_sheet(workbook, splitting.sheet_name(sheet_name, part, workbook.sheetnames), splitter,
+                                  columns, widths)
+            if not splitter.has_more():
+                return count
+            part += 1
+
+
+@contextmanager
+def _measured_rows(value_rows, columns, width_sample, tracker):
+    """产出 (已完成测量的 tracker, 行迭代器)
+
+    只写工作表要求在写入第一行之前确定列宽：未指定 tracker 时先暂存全部行并测量，
+    指定 width_sample 时只缓存抽样行
+    """
+    with tempfile.TemporaryFile() as spool:
+        if tracker is None:
+            tracker = ColumnWidthTracker(columns, width_sample)
+            if width_sample is None:
+                # 暂存全部行，同时测量列宽
+                spool_rows(tracker.track(value_rows), spool)
+                value_rows = iter_spool(spool)
+            else:
+                # 只缓存抽样行
+                sample = list(itertools.islice(value_rows, width_sample))
+                for values in sample:
+                    tracker.update(values)
+                value_rows = itertools.chain(sample, value_rows)
+        yield tracker, value_rows
+
+
+def _write_sheet(workbook, sheet_name, splitter, columns, widths):
+    """创建一个工作表，写入表头和 splitter 的下一部分行，返回行数"""
+    shared_columns = [idx for idx, col in enumerate(columns) if col in SHARED_STRING_COLUMNS]
+    worksheet = workbook.create_sheet(sheet_name, widths, shared_columns)
+    worksheet.append(columns, HEADER_STYLE)
+    count = 0
+    for values in splitter.part(worksheet.size):
+        worksheet.append(values)
+        count += 1
+    worksheet.close()
+    return count
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提取结果缓存
+将提取出的列式数据保存在本地磁盘上，以输入文件内容的哈希、转换器版本和提取选项为键；
+只改变输出选项（格式、列宽、分割等）重新导出时，不需要重新读取、解析和提取JSON。
+缓存目录有大小上限，超过时删除最久未使用的条目
+"""
+
+import hashlib
+import json
+import marshal
+import os
+import sys
+from array import array
+
+from columnar import ColumnarTable, RunLengthColumn
+from manifest import file_sha256
+
+
+# 缓存文件格式版本，格式变化时旧的缓存自动失效
+CACHE_FORMAT = 1
+CACHE_SUFFIX = '.cache'
+
+# 默认大小上限（字节）
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3
+
+
+def default_cache_dir():
+    """用户缓存目录中的默认位置（Windows为LOCALAPPDATA，其他平台为XDG_CACHE_HOME或~/.cache）"""
+    base = os.environ.get('LOCALAPPDATA') if os.name == 'nt' else os.environ.get('XDG_CACHE_HOME')
+    base = base or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'json2excel', 'extract')
+
+
+def _encode(values):
+    """字典编码：返回 (不同值的列表, 每个值在其中的序号 array('I'))"""
+    index = {}
+    dictionary = []
+    codes = array('I')
+    for value in values:
+        # 字符串直接作为键；其他类型带上类型，1、1.0、True 不合并
+        key = value if type(value) is str else (type(value), value)
+        code = index.get(key)
+        if code is None:
+            code = index[key] = len(dictionary)
+            dictionary.append(value)
+        codes.append(code)
+    return dictionary, codes
+
+
+def _decode(dictionary, data):
+    codes = array('I')
+    codes.frombytes(data)
+    return list(map(dictionary.__getitem__, codes))
+
+
+def _dump_table(table):
+    """列式数据表转换为可用 marshal 保存的结构
+
+    每列字典编码：不同的值只保存一次，行中保存序号（连续的二进制数组，读取时不需要逐个解析对象）；
+    游程编码列对游程的值编码，另存重复次数
+    """
+    columns = []
+    for col in table.columns:
+        column = table[col]
+        if isinstance(column, RunLengthColumn):
+            dictionary, codes = _encode(column.values)
+            counts = array('I', column.counts).tobytes()
+        else:
+            dictionary, codes = _encode(column)
+            counts = None
+        columns.append((col, dictionary, codes.tobytes(), counts))
+    return CACHE_FORMAT, sys.byteorder, columns
+
+
+def _load_table(payload):
+    fmt, byteorder, columns = payload
+    if fmt != CACHE_FORMAT or byteorder != sys.byteorder:
+        raise ValueError("缓存格式版本不同")
+    table = ColumnarTable([col for col, _, _, _ in columns])
+    for col, dictionary, codes, counts in columns:
+        values = _decode(dictionary, codes)
+        if counts is None:
+            table.data[col] = values
+        else:
+            run_counts = array('I')
+            run_counts.frombytes(counts)
+            table.data[col] = RunLengthColumn.from_runs(values, run_counts)
+    return table
+
+
+class ExtractCache:
+    """磁盘上的提取结果缓存
+
+    数据按列字典编码后用 marshal 保存（二进制，读取比解析JSON快得多，且不会像pickle那样执行任意代码）；
+    读取命中时更新修改时间，写入后按修改时间淘汰最久未使用的条目。多个进程可以同时使用同一个目录，
+    缓存读写出错时当作未命中，不影响转换
+
+    Args:
+        directory: 缓存目录，默认为 default_cache_dir()
+        max_size: 缓存目录的大小上限（字节）
+        version: 转换器版本，提取逻辑变化时旧的缓存自动失效
+    """
+
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE, version=''):
+        self.directory = directory or default_cache_dir()
+        self.max_size = max_size
+        self.version = version
+
+    def key(self, json_file, **options):
+        """缓存键：文件内容的SHA-256、转换器版本和影响提取结果的选项（如列、hospital_id）"""
+        payload = json.dumps({'sha256': file_sha256(json_file), 'version': self.version, 'options': options},
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def get(self, key):
+        """读取缓存的列式数据表，不存在或已损坏时返回None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                table = _load_table(marshal.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, TypeError):
+            self._remove(path)
+            return None
+        try:
+            # 记录最近使用时间
+            os.utime(path)
+        except OSError:
+            pass
+        return table
+
+    def put(self, key, table):
+        """保存列式数据表（先写临时文件再替换），然后淘汰超出大小上限的条目；返回是否已保存"""
+        path = self._path(key)
+        tmp_path = os.path.join(self.directory, f'.{key}.{os.getpid()}.tmp')
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                marshal.dump(_dump_table(table), f)
+            os.replace(tmp_path, path)
+        except (OSError, ValueError):
+            # 目录不可写、磁盘已满或数据中有无法保存的类型
+            self._remove(tmp_path)
+            return False
+        self.evict()
+        return True
+
+    def entries(self):
+        """缓存条目: [(修改时间, 大小, 路径), ...]"""
+        entries = []
+        try:
+            scanned = list(os.scandir(self.directory))
+        except OSError:
+            return entries
+        for entry in scanned:
+            if not entry.name.endswith(CACHE_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def size(self):
+        """缓存条目的总字节数"""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """删除最久未使用的条目，直到总大小不超过上限，返回删除的条目数"""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+科室数据提取
+根据baseurl动态解析URL参数，不依赖GUI，可供命令行、子进程和其他服务直接调用
+"""
+
+import re
+
+import input_files
+import json_backend
+import json_stream
+from columnar import ColumnarTable, StringPool
+from extraction_plan import BaseurlSelector, compile_plan, extract_url_params
+
+
+# 全部可输出的列（GUI与命令行两种格式的并集）
+ALL_COLUMNS = ['hospital_id', 'baseurl', 'campus_id', 'department_title', 'department_id',
+               'area_id', 'area_name', 'position', 'symptom_text', 'diagnosis_text', 'url_params_json']
+
+# GUI输出列顺序：URL参数合并为一个JSON列
+COLUMNS = ['hospital_id', 'baseurl', 'campus_id', 'department_title',
+           'symptom_text', 'diagnosis_text', 'url_params_json']
+
+# 命令行输出列顺序：固定的科室ID、区域和位置列
+LEGACY_COLUMNS = ['hospital_id', 'campus_id', 'department_title', 'department_id',
+                  'area_id', 'area_name', 'position', 'symptom_text', 'diagnosis_text']
+
+# 固定的科室ID、区域和位置列
+LEGACY_FIELDS = ('department_id', 'area_id', 'area_name', 'position')
+
+# 列式提取时使用游程编码的列
+RUN_LENGTH_COLUMNS = ('hospital_id', 'baseurl', 'campus_id', 'symptom_text', 'diagnosis_text')
+
+# 合并重复科室时，连接多个症状、诊断文本的分隔符
+AGGREGATE_SEPARATOR = '；'
+
+# 合并重复科室时索引中默认最多保存的科室数，超过时先输出已合并的行（之后再出现的重复科室另起一行）；
+# 每个科室约占2KB（行字典、症状和诊断集合），10万个约200MB
+AGGREGATE_MAX_KEYS = 100_000
+
+# 每个科室最多合并的不同症状（诊断）文本数，更多的不再记录
+AGGREGATE_MAX_TEXTS = 200
+
+# 合并后文本的最大长度（Excel单元格最多32767个字符），超出时在最后一个完整的文本处截断
+AGGREGATE_MAX_CHARS = 32767
+
+
+def extract_baseurls(json_data):
+    """提取全部baseurl条目，返回 [(url, 原始baseurl对象), ...]"""
+    entries = []
+    for baseurl_obj in json_data.get('baseurl', None) or []:
+        if not isinstance(baseurl_obj, dict):
+            continue
+        # 查找url_pattern或类似的键
+        for key in ['url_pattern', 'url', 'base_url', 'baseurl']:
+            if key in baseurl_obj:
+                entries.append((baseurl_obj[key], baseurl_obj))
+                break
+    return entries
+
+
+def extract_baseurl(json_data):
+    """提取第一个baseurl及其参数"""
+    entries = extract_baseurls(json_data)
+    if entries:
+        url = entries[0][0]
+        # 提取URL中的参数
+        return url, extract_url_params(url)
+    return None, []
+
+
+def load_json(json_file, stream=False, backend=None):
+    """读取JSON文件，返回 (顶层字段, departments迭代器)
+
+    stream=True 时只读取baseurl等顶层字段，departments在迭代时逐个科室流式解析（见 json_stream）；
+    否则一次性读取整个文件，用 backend 指定的解析后端解析（见 json_backend，默认自动选择）
+    """
+    if stream:
+        metadata = json_stream.read_metadata(json_file)
+        return metadata, json_stream.iter_departments(json_file, lazy=True)
+    data = json_backend.load_file(json_file, backend)
+    return data, data.get('departments', [])
+
+
+def extract_department_data(json_data, hospital_id, baseurl, url_params, columns=None, row_filter=None):
+    """从JSON数据中提取科室信息，row_filter 为 row_filter.RowFilter 时只提取符合条件的科室"""
+    return list(iter_department_rows(json_data.get('departments', []), hospital_id, baseurl, url_params,
+                                     extract_baseurls(json_data), columns=columns, row_filter=row_filter))
+
+
+def _iter_campuses(departments, row_filter=None):
+    """逐个产出 (症状, 诊断, 院区ID, 科室列表)
+
+    流式解析时院区列表和科室列表为 json_stream.LazyArray，科室列表只能迭代一次；
+    row_filter 不为空时跳过不符合条件的院区，科室列表中只保留符合条件的科室
+    """
+    check_departments = row_filter is not None and row_filter.filters_departments
+    for dept in departments:
+        # 获取基本信息
+        symptom_text = dept.get('symptom_text', '')
+        diagnosis_text = dept.get('diagnosis_text', '')
+
+        # 查找包含科室列表的key（可能是'data'、空字符串或其他）
+        data_list = None
+        for key, value in dept.items():
+            if isinstance(value, (list, json_stream.LazyArray)) and key not in json_stream.DEPARTMENT_FIELDS:
+                data_list = value
+                break
+
+        if not data_list:
+            continue
+
+        # 遍历每个院区
+        for campus_data in data_list:
+            campus_id = campus_data.get('campus_id', '')
+            if row_filter is not None and not row_filter.accepts_campus(campus_id):
+                continue
+            department_list = campus_data.get('department_list', [])
+            if check_departments:
+                department_list = filter(row_filter.accepts_department, department_list)
+            yield symptom_text, diagnosis_text, campus_id, department_list
+
+
+def _legacy_fields(dept_item):
+    """返回 (department_id, area_id, area_name, position)"""
+    if 'params' in dept_item:
+        # 193_triage.json格式，没有position
+        params = dept_item.get('params', {})
+        return params.get('departId', ''), params.get('areaId', ''), params.get('areaName', ''), ''
+    # 63_triage.json格式，没有area_id和area_name
+    return dept_item.get('department_id', ''), '', '', dept_item.get('position', '')
+
+
+def department_key(campus_id, dept_item):
+    """科室的去重键：院区ID + 科室ID（department_id 或 params.departId），没有科室ID时使用科室名称"""
+    if 'params' in dept_item:
+        department_id = (dept_item.get('params') or {}).get('departId')
+    else:
+        department_id = dept_item.get('department_id')
+    if department_id is None or department_id == '':
+        return str(campus_id), 'title', str(dept_item.get('title', ''))
+    return str(campus_id), 'id', str(department_id)
+
+
+def _join_texts(texts):
+    """连接去重后的症状或诊断文本；只有一个时原样返回（与不合并时相同）"""
+    if len(texts) == 1:
+        return next(iter(texts))
+    joined = AGGREGATE_SEPARATOR.join(str(text) for text in texts if text is not None and text != '')
+    if len(joined) > AGGREGATE_MAX_CHARS:
+        cut = joined.rfind(AGGREGATE_SEPARATOR, 0, AGGREGATE_MAX_CHARS + 1)
+        joined = joined[:cut] if cut > 0 else joined[:AGGREGATE_MAX_CHARS]
+    return joined
+
+
+def _iter_aggregated(index):
+    """产出索引中合并后的行，并清空索引"""
+    for row, symptoms, diagnoses in index.values():
+        row['symptom_text'] = _join_texts(symptoms)
+        row['diagnosis_text'] = _join_texts(diagnoses)
+        yield row
+    index.clear()
+
+
+def iter_department_rows(departments, hospital_id, baseurl, url_params, baseurl_entries=None,
+                         params_as_dict=False, columns=None, row_filter=None, aggregate=False):
+    """逐条产出科室行数据，departments 可以是列表或流式迭代器
+
+    baseurl_entries 包含多个baseurl条目时，每个科室按院区或参数匹配对应的模板；
+    params_as_dict=True 时URL参数以字典形式保存在 'url_params' 中，而不是 'url_params_json'；
+    columns 为需要的列（默认 COLUMNS），行字典只包含其中的字段，不需要的字段不计算；
+    row_filter 为 row_filter.RowFilter 时不符合条件的院区和科室在创建行之前跳过；
+    aggregate=True 时合并重复的科室（见 department_key）：以去重键建立哈希索引，科室第一次出现时创建行，
+    再次出现时只记录症状和诊断，全部读完后按第一次出现的顺序产出，症状和诊断文本去重后以
+    AGGREGATE_SEPARATOR 连接（每个科室最多 AGGREGATE_MAX_TEXTS 个）；内存占用与不同科室的数量成正比，
+    索引超过 AGGREGATE_MAX_KEYS 个（aggregate 为整数时为该数量）科室时先输出
+    """
+    columns = COLUMNS if columns is None else columns
+    want_baseurl = 'baseurl' in columns
+    want_legacy = any(col in columns for col in LEGACY_FIELDS)
+    want_json = not params_as_dict and 'url_params_json' in columns
+
+    plan = compile_plan(tuple(url_params))
+    selector = BaseurlSelector(baseurl_entries) if baseurl_entries and len(baseurl_entries) > 1 else None
+    baseurl = baseurl or ''
+    hospital_id = hospital_id or ''
+    # 逐行产出时不做字符串去重：同一院区的行本来就共用症状、诊断等对象，
+    # 去重池会让所有不同的字符串（如每行不同的 url_params_json）一直保留到提取结束
+    # 合并重复科室时的索引: {去重键: (行, 症状, 诊断)}，症状和诊断以字典作为有序集合
+    index = {} if aggregate else None
+    max_keys = AGGREGATE_MAX_KEYS if aggregate is True else aggregate
+
+    for symptom_text, diagnosis_text, campus_id, department_list in _iter_campuses(departments, row_filter):
+        # 遍历每个具体科室
+        for dept_item in department_list:
+            if index is not None:
+                key = department_key(campus_id, dept_item)
+                entry = index.get(key)
+                if entry is not None:
+                    # 重复的科室不再创建行
+                    _, symptoms, diagnoses = entry
+                    if len(symptoms) < AGGREGATE_MAX_TEXTS:
+                        symptoms[symptom_text] = None
+                    if len(diagnoses) < AGGREGATE_MAX_TEXTS:
+                        diagnoses[diagnosis_text] = None
+                    continue
+
+            if selector:
+                row_baseurl, row_plan = selector.select(campus_id, dept_item)
+            else:
+                row_baseurl, row_plan = baseurl, plan
+
+            row = {'hospital_id': hospital_id}
+            if want_baseurl:
+                row['baseurl'] = row_baseurl
+            row['campus_id'] = campus_id
+            row['department_title'] = dept_item.get('title', '')
+            if want_legacy:
+                (row['department_id'], row['area_id'], row['area_name'],
+                 row['position']) = _legacy_fields(dept_item)
+            row['symptom_text'] = symptom_text
+            row['diagnosis_text'] = diagnosis_text
+            if params_as_dict:
+                row['url_params'] = row_plan.to_mapping(dept_item)
+            elif want_json:
+                # 所有URL参数合并为一个JSON字符串，保存在单个单元格中
+                row['url_params_json'] = row_plan.to_json(dept_item)
+            if index is None:
+                yield row
+                continue
+            if len(index) >= max_keys:
+                yield from _iter_aggregated(index)
+            index[key] = (row, {symptom_text: None}, {diagnosis_text: None})
+
+    if index:
+        yield from _iter_aggregated(index)
+
+
+def extract_columnar(departments, hospital_id, baseurl, url_params, baseurl_entries=None, columns=None,
+                     row_filter=None, aggregate=False):
+    """列式提取科室数据，直接追加到每列的数组中，不创建行字典
+
+    hospital_id、baseurl、campus_id、symptom_text、diagnosis_text 使用游程编码，
+    其余字符串去重后保存；columns 为需要的列（默认 COLUMNS）；row_filter 和 aggregate 见 iter_department_rows
+    """
+    columns = COLUMNS if columns is None else columns
+    table = ColumnarTable(columns, RUN_LENGTH_COLUMNS)
+    if aggregate:
+        # 合并后的行不再按院区整段重复，逐行追加
+        collected = [(table[col], col) for col in columns]
+        for row in iter_department_rows(departments, hospital_id, baseurl, url_params, baseurl_entries,
+                                        columns=columns, row_filter=row_filter, aggregate=aggregate):
+            for column, col in collected:
+                column.append(row.get(col))
+        return table
+    data = table.data
+    # 同一院区内重复的字段：(列, 取值位置)
+    repeated = [(data[col], index) for index, col in enumerate(('hospital_id', 'campus_id',
+                                                                 'symptom_text', 'diagnosis_text'))
+                if col in data]
+    baseurl_col = data.get('baseurl')
+    title_col = data.get('department_title')
+    legacy_cols = [(data[col], index) for index, col in enumerate(LEGACY_FIELDS) if col in data]
+    params_json_col = data.get('url_params_json')
+
+    plan = compile_plan(tuple(url_params))
+    selector = BaseurlSelector(baseurl_entries) if baseurl_entries and len(baseurl_entries) > 1 else None
+    baseurl = baseurl or ''
+    hospital_id = hospital_id or ''
+    # 只对重复出现的字段去重（症状、诊断在不同院区下重复，科室名称和科室ID在不同症状下重复）；
+    # url_params_json 基本每行不同，去重只会让池中多保存一份
+    intern = StringPool().intern
+
+    for symptom_text, diagnosis_text, campus_id, department_list in _iter_campuses(departments, row_filter):
+        if not isinstance(department_list, list):
+            # 流式解析或筛选后的科室列表（一个院区）
+            department_list = list(department_list)
+        # 同一院区内重复的字段一次性追加
+        count = len(department_list)
+        values = (hospital_id, campus_id, intern(symptom_text), intern(diagnosis_text))
+        for column, index in repeated:
+            column.extend_repeat(values[index], count)
+        if baseurl_col is not None and not selector:
+            baseurl_col.extend_repeat(baseurl, count)
+
+        # 遍历每个具体科室
+        for dept_item in department_list:
+            row_plan = plan
+            if selector:
+                row_baseurl, row_plan = selector.select(campus_id, dept_item)
+                if baseurl_col is not None:
+                    baseurl_col.append(row_baseurl)
+            if title_col is not None:
+                title_col.append(intern(dept_item.get('title', '')))
+            if legacy_cols:
+                fields = _legacy_fields(dept_item)
+                for column, index in legacy_cols:
+                    column.append(intern(fields[index]))
+            if params_json_col is not None:
+                params_json_col.append(row_plan.to_json(dept_item))
+
+    return table
+
+
+def extract_hospital_id(filename):
+    """从文件名提取hospital_id（压缩文件和归档成员按成员的文件名）"""
+    match = re.match(r'^(\d+)', input_files.base_name(filename))
+    return match.group(1) if match else None
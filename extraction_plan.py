@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+URL参数提取计划
+将baseurl模板预先编译为参数访问方式和JSON序列化前缀，
+同一模板的文件共享缓存的计划，避免逐行重复查找和 json.dumps
+"""
+
+import json
+import re
+from functools import lru_cache
+
+
+# 缓存的提取计划数量上限
+PLAN_CACHE_SIZE = 256
+
+_URL_PARAM_RE = re.compile(r'\{(\w+)\}')
+
+# ensure_ascii=False 时 json.dumps 使用的字符串编码函数
+_encode_str = json.encoder.encode_basestring
+_encoder = json.JSONEncoder(ensure_ascii=False)
+
+
+def extract_url_params(url_pattern):
+    """从URL模式中提取参数名"""
+    # 查找所有 {param} 格式的参数
+    return _URL_PARAM_RE.findall(url_pattern)
+
+
+def _encode_value(value):
+    """与 json.dumps(value, ensure_ascii=False) 结果一致"""
+    if type(value) is str:
+        return _encode_str(value)
+    return _encoder.encode(value)
+
+
+def _first_truthy(mapping, keys):
+    """依次尝试多个键名，返回第一个非空值"""
+    for key in keys:
+        value = mapping.get(key)
+        if value:
+            return value
+    return ''
+
+
+def _key_variants(*keys):
+    """去重后的键名变体（保持顺序）"""
+    return tuple(dict.fromkeys(keys))
+
+
+class ExtractionPlan:
+    """一个URL模板对应的参数提取计划"""
+
+    def __init__(self, url_params):
+        # 参数名去重（同一参数在模板中出现多次时只输出一次）
+        self.params = tuple(dict.fromkeys(url_params))
+
+        # 193格式：参数在params对象中，依次尝试原名、小写、大写
+        self._nested_keys = [_key_variants(p, p.lower(), p.upper()) for p in self.params]
+
+        # 63格式：参数直接在科室对象中
+        self._flat_getters = []
+        for param in self.params:
+            if param == 'departId':
+                # 特殊处理departId -> department_id的映射
+                self._flat_getters.append((True, 'department_id'))
+            elif param in ('title', 'departName'):
+                # title通常对应department_title
+                self._flat_getters.append((True, 'title'))
+            else:
+                self._flat_getters.append((False, _key_variants(param, param.lower())))
+
+        # 预先编码的 '"key": ' 前缀
+        self._prefixes = [_encode_str(p) + ': ' for p in self.params]
+        self._position_index = self.params.index('position') if 'position' in self.params else None
+        self._prefixes_with_position = self._prefixes + [_encode_str('position') + ': ']
+
+    @staticmethod
+    def _serialize(prefixes, values):
+        return '{' + ', '.join([prefix + _encode_value(value)
+                                for prefix, value in zip(prefixes, values)]) + '}'
+
+    def extract_values(self, dept_item):
+        """按参数顺序提取参数值"""
+        if 'params' in dept_item:
+            params = dept_item.get('params', {})
+            return [_first_truthy(params, keys) for keys in self._nested_keys]
+        return [dept_item.get(key, '') if direct else _first_truthy(dept_item, key)
+                for direct, key in self._flat_getters]
+
+    def to_json(self, dept_item):
+        """生成 url_params_json 单元格内容"""
+        values = self.extract_values(dept_item)
+        # 63格式：添加position字段（如果存在）
+        if 'params' not in dept_item and 'position' in dept_item:
+            if self._position_index is None:
+                values.append(dept_item['position'])
+                return self._serialize(self._prefixes_with_position, values)
+            values[self._position_index] = dept_item['position']
+        return self._serialize(self._prefixes, values)
+
+    def to_mapping(self, dept_item):
+        """与 to_json 内容相同的参数字典，用于将参数展开为独立的列"""
+        mapping = dict(zip(self.params, self.extract_values(dept_item)))
+        if 'params' not in dept_item and 'position' in dept_item:
+            mapping['position'] = dept_item['position']
+        return mapping
+
+    def resolves(self, dept_item):
+        """科室对象是否能提供模板中的全部参数"""
+        return all(self.extract_values(dept_item))
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def compile_plan(url_params):
+    """编译参数列表（元组）为提取计划"""
+    return ExtractionPlan(url_params)
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def get_plan(url_pattern):
+    """按URL模板获取提取计划（LRU缓存）"""
+    return compile_plan(tuple(extract_url_params(url_pattern or '')))
+
+
+class BaseurlSelector:
+    """为每个科室选择对应的baseurl条目
+
+    baseurl条目带 campus_id 时按院区匹配；有多个条目时选择第一个能提供全部参数的模板；
+    否则使用第一个条目
+    """
+
+    def __init__(self, entries):
+        # entries: [(url, 原始baseurl对象), ...]
+        self.entries = [(url, get_plan(url), obj) for url, obj in entries]
+        self.by_campus = {}
+        for url, plan, obj in self.entries:
+            if 'campus_id' in obj:
+                self.by_campus.setdefault(str(obj['campus_id']), (url, plan))
+
+    def select(self, campus_id, dept_item):
+        """返回 (url, 提取计划)"""
+        if self.by_campus:
+            match = self.by_campus.get(str(campus_id))
+            if match:
+                return match
+        for url, plan, _ in self.entries:
+            if plan.resolves(dept_item):
+                return url, plan
+        url, plan, _ = self.entries[0]
+        return url, plan
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输入文件
+直接读取压缩的JSON文件（.gz、.bz2、.xz，安装zstandard后支持.zst）和zip/tar归档中的成员，
+读取时流式解压，不需要先解压到磁盘。归档成员的路径写作 归档路径!/成员名称，
+如 dumps.zip!/2024/63_triage.json
+"""
+
+import bz2
+import fnmatch
+import functools
+import glob
+import gzip
+import io
+import lzma
+import os
+import posixpath
+import re
+import tarfile
+import zipfile
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstandard为可选依赖
+    zstandard = None
+
+
+# 归档路径与成员名称之间的分隔符
+MEMBER_SEPARATOR = '!/'
+
+# 压缩文件的扩展名
+COMPRESSION_SUFFIXES = ('.gz', '.bz2', '.xz', '.zst')
+
+# 归档文件的扩展名（tar可以是压缩的）
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+# 指定的模式直接匹配到归档文件时，读取其中的这些成员
+ARCHIVE_MEMBER_PATTERN = '*.json'
+
+# 读取（解压）损坏或截断的输入文件时可能抛出的异常
+READ_ERRORS = (OSError, EOFError, zlib.error, lzma.LZMAError, zipfile.BadZipFile, tarfile.TarError) + \
+    ((zstandard.ZstdError,) if zstandard is not None else ())
+
+_MEMBER_RE = re.compile(r'(.+?(?:' + '|'.join(re.escape(s) for s in ARCHIVE_SUFFIXES) + r'))![/\\](.+)$',
+                        re.IGNORECASE)
+
+
+class _OwnedReader(io.BufferedReader):
+    """关闭时一并关闭其依赖的对象（归档、底层文件）"""
+
+    def __init__(self, raw, *owners):
+        super().__init__(raw)
+        self._owners = owners
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            for owner in self._owners:
+                owner.close()
+
+
+def member_path(archive, member):
+    """归档成员的路径"""
+    return f'{archive}{MEMBER_SEPARATOR}{member}'
+
+
+def split_member(path):
+    """拆分为 (归档路径, 成员名称)；不是归档成员时为 (path, None)"""
+    match = _MEMBER_RE.match(path)
+    if not match:
+        return path, None
+    return match.group(1), match.group(2).replace('\\', '/')
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def compression(path):
+    """压缩格式的扩展名（如 '.gz'），不是压缩文件时为None"""
+    name = path.lower()
+    for suffix in COMPRESSION_SUFFIXES:
+        if name.endswith(suffix):
+            return suffix
+    return None
+
+
+def is_plain(path):
+    """是否为磁盘上未压缩的普通文件（可以直接打开或映射）"""
+    return split_member(path)[1] is None and compression(path) is None
+
+
+def base_name(path):
+    """不含目录、压缩扩展名和文件扩展名的名称，如 dumps.zip!/63_triage.json.gz → 63_triage"""
+    archive, member = split_member(path)
+    name = posixpath.basename(member) if member is not None else os.path.basename(archive)
+    suffix = compression(name)
+    if suffix:
+        name = name[:-len(suffix)]
+    return os.path.splitext(name)[0]
+
+
+def _archive_stem(archive):
+    """不含目录和归档扩展名的归档名称，如 dumps.tar.gz → dumps"""
+    name = os.path.basename(archive)
+    for suffix in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True):
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def output_name(path):
+    """输出文件名使用的名称，不同的输入文件对应不同的名称
+
+    普通文件与 base_name 相同（63_triage）；压缩文件加上压缩格式（63_triage_gz），
+    归档成员加上归档名称和成员所在的目录（dumps.zip!/2024/63_triage.json → dumps_2024_63_triage）
+    """
+    archive, member = split_member(path)
+    name = base_name(path)
+    suffix = compression(member if member is not None else archive)
+    if suffix:
+        name = f'{name}_{suffix[1:]}'
+    if member is not None:
+        directory = posixpath.dirname(member)
+        parts = [_archive_stem(archive)] + [part for part in directory.split('/') if part] + [name]
+        name = '_'.join(parts)
+    return name
+
+
+def duplicate_output_names(paths):
+    """output_name 相同的输入文件: {名称: [路径, ...]}（正常情况下为空）"""
+    groups = {}
+    for path in paths:
+        groups.setdefault(os.path.normcase(output_name(path)), []).append(path)
+    return {name: group for name, group in groups.items() if len(group) > 1}
+
+
+@functools.lru_cache(maxsize=16)
+def _archive_index(archive, mtime_ns, size):
+    """归档成员的索引: {名称: ZipInfo或TarInfo}（归档修改后重新读取）"""
+    if archive.lower().endswith('.zip'):
+        with zipfile.ZipFile(archive) as zf:
+            return {info.filename: info for info in zf.infolist() if not info.is_dir()}
+    with tarfile.open(archive) as tf:
+        return {info.name: info for info in tf.getmembers() if info.isfile()}
+
+
+def _member_info(archive, member):
+    stat = os.stat(archive)
+    try:
+        return _archive_index(archive, stat.st_mtime_ns, stat.st_size)[member]
+    except KeyError:
+        raise FileNotFoundError(f"归档中没有该文件: {member_path(archive, member)}") from None
+
+
+def list_members(archive, pattern=ARCHIVE_MEMBER_PATTERN):
+    """归档中文件名（不含目录，可带压缩扩展名）匹配 pattern 的成员路径"""
+    stat = os.stat(archive)
+    names = _archive_index(archive, stat.st_mtime_ns, stat.st_size)
+    return [member_path(archive, name) for name in names if _matches(posixpath.basename(name), pattern)]
+
+
+def _matches(name, pattern):
+    return any(fnmatch.fnmatch(name, pattern + suffix) for suffix in ('',) + COMPRESSION_SUFFIXES)
+
+
+def list_inputs(pattern):
+    """展开输入文件模式
+
+    包括匹配的文件、加上压缩扩展名后匹配的文件（如 *_triage.json.gz），以及同一目录下
+    归档中文件名匹配的成员；模式直接匹配到归档文件时包含其中的全部JSON文件
+    """
+    paths = []
+    archives = set()
+    for suffix in ('',) + COMPRESSION_SUFFIXES:
+        for path in glob.glob(pattern + suffix):
+            if is_archive(path):
+                archives.add(path)
+                paths.extend(_list_archive(path, ARCHIVE_MEMBER_PATTERN))
+            else:
+                paths.append(path)
+
+    directory, name_pattern = os.path.split(pattern)
+    for archive in sorted(glob.glob(os.path.join(directory, '*'))):
+        if is_archive(archive) and archive not in archives and os.path.isfile(archive):
+            paths.extend(_list_archive(archive, name_pattern))
+    return list(dict.fromkeys(paths))
+
+
+def _list_archive(archive, pattern):
+    try:
+        return list_members(archive, pattern)
+    except READ_ERRORS:
+        # 损坏的归档不影响其他文件
+        return []
+
+
+def _decompress(f, suffix):
+    """包装二进制文件对象，读取时解压（关闭时同时关闭 f）"""
+    if suffix == '.gz':
+        return _OwnedReader(gzip.GzipFile(fileobj=f), f)
+    if suffix == '.bz2':
+        return _OwnedReader(bz2.BZ2File(f), f)
+    if suffix == '.xz':
+        return _OwnedReader(lzma.LZMAFile(f), f)
+    if zstandard is None:
+        raise ValueError("读取 .zst 文件需要安装zstandard: pip install zstandard")
+    return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(f, closefd=True))
+
+
+def _open_member(archive, member):
+    info = _member_info(archive, member)
+    if isinstance(info, zipfile.ZipInfo):
+        with zipfile.ZipFile(archive) as zf:
+            # 成员文件关闭前归档文件保持打开
+            return zf.open(info)
+    tf = tarfile.open(archive)
+    try:
+        # 使用索引中的位置，不需要从头查找
+        return _OwnedReader(tf.extractfile(info), tf)
+    except BaseException:
+        tf.close()
+        raise
+
+
+def open_binary(path):
+    """以二进制方式打开输入文件，压缩文件和归档成员在读取时解压"""
+    archive, member = split_member(path)
+    if member is None:
+        f = open(path, 'rb')
+    else:
+        f = _open_member(archive, member)
+    suffix = compression(member if member is not None else path)
+    if suffix is None:
+        return f
+    try:
+        return _decompress(f, suffix)
+    except BaseException:
+        f.close()
+        raise
+
+
+def open_text(path):
+    """以UTF-8文本方式打开输入文件"""
+    if is_plain(path):
+        return open(path, 'r', encoding='utf-8')
+    return io.TextIOWrapper(open_binary(path), encoding='utf-8')
+
+
+def read_bytes(path):
+    """读取输入文件的全部内容（解压后）"""
+    with open_binary(path) as f:
+        return f.read()
+
+
+def stored_size(path):
+    """输入文件在磁盘上占用的字节数（压缩后的大小）"""
+    archive, member = split_member(path)
+    if member is None:
+        return os.path.getsize(path)
+    info = _member_info(archive, member)
+    return info.compress_size if isinstance(info, zipfile.ZipInfo) else info.size
+
+
+def file_stat(path):
+    """(大小, 修改时间)；归档成员为成员的大小和归档文件的修改时间"""
+    archive, member = split_member(path)
+    stat = os.stat(archive)
+    if member is None:
+        return stat.st_size, stat.st_mtime
+    info = _member_info(archive, member)
+    return (info.file_size if isinstance(info, zipfile.ZipInfo) else info.size), stat.st_mtime
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批处理任务日志
+每处理完一个文件就在输出目录的日志中追加一行并同步到磁盘，
+进程中途退出（内存不足、被终止、休眠断电）后可以从中断处继续
+"""
+
+import hashlib
+import json
+import os
+
+
+JOURNAL_NAME = '.batch_journal.jsonl'
+JOURNAL_FORMAT = 1
+
+DONE = 'done'
+FAILED = 'failed'
+
+
+def job_id(json_files, **options):
+    """根据输入文件列表和影响输出的选项生成任务标识，相同的任务才能继续"""
+    files = sorted(os.path.normcase(os.path.abspath(f)) for f in json_files)
+    payload = json.dumps({'files': files, 'options': options}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _fsync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class JobJournal:
+    """输出目录中的批处理任务日志（JSON Lines）
+
+    第一行记录任务标识，之后每个文件一行；追加写入不需要重写整个日志，
+    中途退出时最后一行可能不完整，读取时忽略
+    """
+
+    def __init__(self, output_dir, job):
+        self.path = os.path.join(output_dir, JOURNAL_NAME)
+        self.job = job
+        self.entries = {}
+        self._file = None
+
+    @staticmethod
+    def _key(json_file):
+        return os.path.normcase(os.path.abspath(json_file))
+
+    def load(self):
+        """读取同一任务的日志，返回已完成的文件数；日志不存在、属于其他任务或损坏时返回0"""
+        self.entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                if header.get('format') != JOURNAL_FORMAT or header.get('job') != self.job:
+                    return 0
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 写到一半时中断的最后一行
+                        continue
+                    self.entries[entry['key']] = entry
+        except (OSError, ValueError, AttributeError):
+            self.entries = {}
+            return 0
+        return len(self.done_files())
+
+    @staticmethod
+    def _done(entry):
+        # 已成功转换且输出文件仍然存在
+        return entry['status'] == DONE and (not entry.get('output') or os.path.exists(entry['output']))
+
+    def done_files(self):
+        """已成功转换的输入文件"""
+        return [entry['input'] for entry in self.entries.values() if self._done(entry)]
+
+    def is_done(self, json_file):
+        entry = self.entries.get(self._key(json_file))
+        return entry is not None and self._done(entry)
+
+    def output(self, json_file):
+        """记录中的输出文件"""
+        entry = self.entries.get(self._key(json_file))
+        return entry.get('output') if entry else None
+
+    def start(self, resume=False):
+        """开始记录；resume=True 时保留同一任务已有的记录并继续追加，否则重新开始"""
+        if resume:
+            self.load()
+        else:
+            self.entries = {}
+        # 先写临时文件再替换：继续时只保留完整的记录，去掉中断时写了一半的最后一行
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'format': JOURNAL_FORMAT, 'job': self.job}) + '\n')
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            _fsync(f)
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def record(self, json_file, status, output_file=None, error=None):
+        """记录一个文件的结果，写入后立即同步到磁盘"""
+        entry = {'key': self._key(json_file), 'input': os.path.abspath(json_file), 'status': status,
+                 'output': os.path.abspath(output_file) if output_file else None}
+        if error:
+            entry['error'] = str(error)
+        self.entries[entry['key']] = entry
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        _fsync(self._file)
+
+    def close(self):
+        """停止记录，保留日志（任务未完成时用于继续）"""
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def finish(self, json_files=None):
+        """任务完成：所有文件都成功时删除日志，返回是否已删除；有失败的文件时保留，继续时只重新处理这些文件
+
+        json_files 为任务的全部输入文件时，其中有未记录的文件（如处理中途停止）也保留日志
+        """
+        self.close()
+        if any(entry['status'] != DONE for entry in self.entries.values()):
+            return False
+        if json_files is not None and any(self._key(json_file) not in self.entries for json_file in json_files):
+            return False
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        return True
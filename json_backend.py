@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON解析后端
+以字节形式一次性读取文件（或通过mmap映射），交给orjson、simdjson或标准库解析；
+默认自动选择已安装的最快后端
+"""
+
+import gc
+import json
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+
+import input_files
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:  # pysimdjson为可选依赖
+    simdjson = None
+
+
+BACKENDS = ('auto', 'orjson', 'simdjson', 'stdlib')
+
+# 自动选择时的优先顺序
+_PREFERENCE = ('orjson', 'simdjson', 'stdlib')
+
+# 已提前读取的文件内容: {绝对路径: bytes}（见 preloaded）
+_preloaded = {}
+
+# 只读取文件的线程标识（见 io_thread）
+_io_threads = set()
+
+
+def available_backends():
+    """已安装的后端（按优先顺序）"""
+    installed = {'orjson': orjson is not None, 'simdjson': simdjson is not None, 'stdlib': True}
+    return [name for name in _PREFERENCE if installed[name]]
+
+
+def resolve_backend(backend=None):
+    """将 None/'auto' 解析为实际使用的后端，指定的后端未安装时抛出ValueError"""
+    if backend in (None, 'auto'):
+        return available_backends()[0]
+    if backend not in BACKENDS:
+        raise ValueError(f"不支持的JSON解析后端: {backend}")
+    if backend not in available_backends():
+        package = 'pysimdjson' if backend == 'simdjson' else backend
+        raise ValueError(f"JSON解析后端 {backend} 未安装: pip install {package}")
+    return backend
+
+
+@contextmanager
+def preloaded(json_file, data):
+    """在该上下文中读取 json_file 时直接使用已读取的内容 data（如批处理流水线预读的文件），data 为None时不起作用"""
+    if data is None:
+        yield
+        return
+    key = os.path.abspath(json_file)
+    _preloaded[key] = data
+    try:
+        yield
+    finally:
+        _preloaded.pop(key, None)
+
+
+def preloaded_bytes(json_file):
+    """json_file 已提前读取的内容，没有时返回None"""
+    if not _preloaded:
+        return None
+    return _preloaded.get(os.path.abspath(json_file))
+
+
+def read_bytes(json_file, use_mmap=False):
+    """读取文件内容
+
+    use_mmap=True 时返回映射整个文件的memoryview（调用方负责在使用后释放），
+    否则一次性读取为bytes；文件已提前读取（见 preloaded）时直接返回其内容；
+    压缩文件和归档成员（见 input_files）解压后返回bytes
+    """
+    data = preloaded_bytes(json_file)
+    if data is not None:
+        return data
+    if not input_files.is_plain(json_file):
+        return input_files.read_bytes(json_file)
+    with open(json_file, 'rb') as f:
+        if use_mmap:
+            try:
+                return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            except ValueError:
+                # 空文件不能映射
+                return b''
+        return f.read()
+
+
+@contextmanager
+def io_thread():
+    """标记当前线程只读取文件、不创建容器对象（如流水线的预读线程），其运行期间仍可暂停垃圾回收"""
+    ident = threading.get_ident()
+    _io_threads.add(ident)
+    try:
+        yield
+    finally:
+        _io_threads.discard(ident)
+
+
+def _only_io_threads():
+    """除当前线程外只有只读取文件的线程（见 io_thread）"""
+    current = threading.current_thread()
+    return all(thread is current or thread.ident in _io_threads for thread in threading.enumerate())
+
+
+@contextmanager
+def _gc_paused():
+    """暂停循环垃圾回收
+
+    解析时只创建新的容器对象，不会产生循环引用，但大量分配会反复触发垃圾回收扫描。
+    gc.disable() 对整个进程生效，只在其他线程都只读取文件时暂停（命令行串行处理时的预读线程、子进程中）；
+    GUI界面线程等其他线程运行时不暂停，以免这些线程在回收关闭期间产生循环引用
+    """
+    if not gc.isenabled() or not _only_io_threads():
+        yield
+        return
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.enable()
+
+
+def loads(data, backend=None):
+    """用指定后端解析bytes（或orjson支持的memoryview）
+
+    注意orjson会将超过64位的整数解析为浮点数
+    """
+    backend = resolve_backend(backend)
+    with _gc_paused():
+        return _loads(data, backend)
+
+
+def _loads(data, backend):
+    if backend == 'orjson':
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN、孤立的代理字符等标准库接受而orjson拒绝的输入，回退到标准库（真正的格式错误由标准库报告）
+            return json.loads(bytes(data))
+    if backend == 'simdjson':
+        return simdjson.loads(bytes(data))
+    return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+
+def load_file(json_file, backend=None):
+    """读取并解析JSON文件
+
+    orjson可以直接解析mmap映射的内存，不复制文件内容；其他后端一次性读取为bytes
+    """
+    backend = resolve_backend(backend)
+    data = read_bytes(json_file, use_mmap=backend == 'orjson')
+    try:
+        return loads(data, backend)
+    finally:
+        if isinstance(data, memoryview):
+            mapping = data.obj
+            data.release()
+            mapping.close()
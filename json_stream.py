@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式JSON解析
+按 departments[*] -> data/"" -> department_list[*] 逐层流式解析科室数据，避免一次性 json.load 整个文件；
+每次只解析一个科室（department_list 的一个元素），内存占用与文件大小和单个症状下的院区、科室数量无关。
+
+读取缓冲区中已完整的小元素直接整体解析（更快），超出缓冲区的大元素才逐层解析。
+院区列表在症状和诊断之后、department_list 在 campus_id 之后出现时（导出的文件都是这样）才能逐个解析；
+顺序不同时该数组整体解析，结果相同，只是内存占用由该数组的大小决定
+"""
+
+import json
+
+import input_files
+
+
+# 每次从文件读取的字符数
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = ' \t\n\r'
+
+# decode_buffered 中缓冲区内没有完整的值
+_INCOMPLETE = object()
+
+# departments[*] 中不是院区列表的字段（其余第一个数组值为院区列表，与 extraction 相同）
+DEPARTMENT_FIELDS = ('title', 'symptom_text', 'diagnosis_text')
+
+
+class _StreamReader:
+    """基于 JSONDecoder.raw_decode 的增量读取器，只在内存中保留当前元素和读取缓冲区"""
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        """读取更多数据，已消费部分从缓冲区丢弃"""
+        if self.eof:
+            return False
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        # 单个元素跨越多个块时按缓冲区大小倍增读取，避免反复重试
+        chunk = self.fp.read(max(self.chunk_size, len(self.buf)))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """跳过空白并返回下一个字符（文件结束时返回空字符串）"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, ch):
+        """读取一个指定的结构字符"""
+        actual = self.peek()
+        if actual != ch:
+            raise ValueError(f"JSON格式错误: 期望 '{ch}'，实际为 '{actual or 'EOF'}'")
+        self.pos += 1
+
+    def decode_value(self):
+        """解析一个完整的JSON值"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # 数字等值可能恰好在缓冲区末尾被截断，读取更多后重新解析
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def decode_buffered(self):
+        """缓冲区中已有完整的对象或数组时直接解析（不读取更多数据），否则返回 _INCOMPLETE"""
+        self.peek()
+        try:
+            value, end = self.decoder.raw_decode(self.buf, self.pos)
+        except json.JSONDecodeError:
+            return _INCOMPLETE
+        self.pos = end
+        return value
+
+    def iter_elements(self):
+        """逐个定位数组元素：每次产出时位于下一个元素的开头，调用方在继续迭代之前读取该元素"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            ch = self.peek()
+            self.pos += 1
+            if ch == ']':
+                return
+            if ch != ',':
+                raise ValueError(f"JSON格式错误: 数组中出现意外字符 '{ch or 'EOF'}'")
+
+    def iter_array(self):
+        """逐个产出数组元素"""
+        for _ in self.iter_elements():
+            yield self.decode_value()
+
+    def iter_keys(self):
+        """逐个产出对象的键：每次产出时位于对应值的开头，调用方在继续迭代之前读取该值"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.decode_value()
+            self.expect(':')
+            yield key
+            ch = self.peek()
+            self.pos += 1
+            if ch == '}':
+                return
+            if ch != ',':
+                raise ValueError(f"JSON格式错误: 对象中出现意外字符 '{ch or 'EOF'}'")
+
+
+class LazyArray:
+    """流式解析中尚未读取的数组：迭代时逐个解析元素，只能迭代一次
+
+    包含它的对象之后的内容要等数组读完才能解析，未读完的元素会被自动跳过
+    """
+
+    def __init__(self, items):
+        self._items = items
+
+    def __iter__(self):
+        return self._items
+
+    def drain(self):
+        """跳过未读取的元素"""
+        for _ in self._items:
+            pass
+
+
+def _iter_lazy(reader, read_element):
+    """逐个产出数组元素；read_element 返回 (元素, 读完该元素的函数或None)"""
+    for _ in reader.iter_elements():
+        element, finish = read_element(reader)
+        yield element
+        if finish is not None:
+            finish()
+
+
+def _finisher(reader, keys, array):
+    """返回读完对象的函数：跳过数组中未读取的元素，再解析对象中剩余的字段（已产出，丢弃）"""
+    def finish():
+        array.drain()
+        for _ in keys:
+            reader.decode_value()
+    return finish
+
+
+def _read_campus(reader, wrap):
+    """读取一个院区；campus_id 之后的 department_list 以 LazyArray 逐个科室解析"""
+    if reader.peek() != '{':
+        return reader.decode_value(), None
+    campus = reader.decode_buffered()
+    if campus is not _INCOMPLETE:
+        return campus, None
+    campus = {}
+    keys = reader.iter_keys()
+    for key in keys:
+        if key == 'department_list' and 'campus_id' in campus and reader.peek() == '[':
+            campus[key] = items = LazyArray(wrap(reader.iter_array()))
+            return campus, _finisher(reader, keys, items)
+        campus[key] = reader.decode_value()
+    return campus, None
+
+
+def _read_department(reader, wrap):
+    """读取 departments 的一个元素；症状和诊断之后的院区列表以 LazyArray 逐个院区解析"""
+    if reader.peek() != '{':
+        return reader.decode_value(), None
+    dept = reader.decode_buffered()
+    if dept is not _INCOMPLETE:
+        return dept, None
+    dept = {}
+    keys = reader.iter_keys()
+    for key in keys:
+        if (key not in DEPARTMENT_FIELDS and 'symptom_text' in dept and 'diagnosis_text' in dept
+                and reader.peek() == '[' and not any(isinstance(value, list) for value in dept.values())):
+            dept[key] = campuses = LazyArray(_iter_lazy(reader, lambda r: _read_campus(r, wrap)))
+            return dept, _finisher(reader, keys, campuses)
+        dept[key] = reader.decode_value()
+    return dept, None
+
+
+def iter_top_level(fp, stream_keys=('departments',), chunk_size=None):
+    """逐个产出顶层对象的 (key, value)
+
+    stream_keys 中的数组值以迭代器形式产出，调用方未读完的元素会被自动跳过；chunk_size 默认为 CHUNK_SIZE
+    """
+    reader = _StreamReader(fp, chunk_size or CHUNK_SIZE)
+    for key in reader.iter_keys():
+        if key in stream_keys and reader.peek() == '[':
+            items = reader.iter_array()
+            yield key, items
+            # 跳过调用方未消费的元素
+            for _ in items:
+                pass
+        else:
+            yield key, reader.decode_value()
+
+
+def iter_departments(json_file, lazy=False, wrap=None):
+    """流式读取JSON文件中的 departments 数组，逐条产出科室数据（压缩文件边读取边解压）
+
+    lazy=True 时院区列表和 department_list 为 LazyArray，迭代时才逐个解析（见模块说明），
+    必须在取下一条之前使用；wrap 包装每个 department_list 的元素迭代器（如记录解析耗时）
+    """
+    with input_files.open_text(json_file) as f:
+        reader = _StreamReader(f, CHUNK_SIZE)
+        for key in reader.iter_keys():
+            if key != 'departments' or reader.peek() != '[':
+                reader.decode_value()
+            elif lazy:
+                yield from _iter_lazy(reader, lambda r: _read_department(r, wrap or iter))
+            else:
+                yield from reader.iter_array()
+
+
+def read_metadata(json_file, keys=('baseurl',)):
+    """读取除 departments 以外的顶层字段
+
+    找到 keys 中的全部字段后立即停止；若它们位于 departments 之后，
+    departments 会被逐条解析并丢弃，内存占用仍保持平稳
+    """
+    metadata = {}
+    wanted = set(keys or ())
+    with input_files.open_text(json_file) as f:
+        for key, value in iter_top_level(f):
+            if key == 'departments':
+                continue
+            metadata[key] = value
+            if wanted and wanted.issubset(metadata):
+                break
+    return metadata
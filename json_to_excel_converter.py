@@ -6,26 +6,321 @@ JSON to Excel Converter
 支持单文件和批处理模式，动态解析参数
 """
 
-import json
 import os
+import queue
 import re
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
-from tkinter.scrolledtext import ScrolledText
-import pandas as pd
+import tempfile
 from datetime import datetime
 import threading
-import glob
+import time
+
+import consolidate
+import engine
+import extract_cache
+import input_files
+import json_backend
+import metrics
+import output_formats
+import pipeline
+import row_store
+from metrics import iter_with_progress
+from job_journal import DONE, FAILED, JobJournal, job_id
+from row_filter import RowFilter
+from extraction import (extract_baseurl, extract_department_data, extract_hospital_id, extract_url_params,
+                        iter_department_rows, load_json)
+
+# tkinter在创建界面时导入（见 load_tkinter）：导入本模块的批处理子进程和 convert_json_file 等转换函数不需要
+tk = filedialog = messagebox = ttk = None
+
+
+# 批处理合并输出选项: (显示名称, consolidate合并方式)
+COMBINE_CHOICES = [
+    ("不合并", None),
+    ("合并为单个工作表", 'sheet'),
+    ("每个医院一个工作表", 'hospital'),
+]
+
+# 导出文件类型（Parquet需要安装pyarrow）
+EXPORT_FILETYPES = [
+    ("Excel files", "*.xlsx"),
+    ("CSV files", "*.csv"),
+    ("JSON Lines files", "*.jsonl"),
+]
+if output_formats.parquet_available():
+    EXPORT_FILETYPES.append(("Parquet files", "*.parquet"))
+
+# Excel中使用固定宽度的列
+EXCEL_FIXED_WIDTHS = {
+    'baseurl': 80,
+    'url_params_json': 100,  # 为JSON列设置较大宽度
+}
+
+# 预览默认每页行数（按Treeview高度调整）和每次滚轮滚动的行数
+PREVIEW_PAGE_ROWS = 25
+PREVIEW_WHEEL_ROWS = 3
+
+# 筛选时表示在所有列中查找
+ALL_COLUMNS_LABEL = "全部列"
+
+
+def convert_json_file(json_file, output_dir, stream=False, columnar=False, metrics=None, backend=None,
+                      cancel=None, cache=None, row_filter=None, aggregate=False, on_rows=None):
+    """转换单个JSON文件到Excel，不依赖GUI，可在子进程中执行
+
+    columnar=True 时按列提取数据，不创建行字典；
+    metrics 为 metrics.FileMetrics 时记录各阶段指标；backend 为JSON解析后端；
+    cancel 为 threading.Event 时，设置后抛出 engine.Cancelled（不会留下输出文件）；
+    cache 为 extract_cache.ExtractCache 时优先读取缓存的提取结果；
+    row_filter 为 row_filter.RowFilter 时只输出符合条件的科室；aggregate=True 时合并重复的科室；
+    on_rows 为不记录指标时的进度回调（见 metrics.iter_with_progress，记录指标时由 metrics 报告进度）
+
+    Returns:
+        (输出文件路径, 记录数)；没有科室数据时输出文件路径为None
+    """
+    # 读取、解析JSON并提取数据
+    if columnar:
+        rows = engine.extract_table(json_file, engine.GUI_COLUMNS, stream, metrics=metrics, backend=backend,
+                                    cache=cache, row_filter=row_filter, aggregate=aggregate)
+        if cancel is not None and cancel.is_set():
+            raise engine.Cancelled()
+    else:
+        rows = engine.iter_rows(json_file, engine.GUI_COLUMNS, stream, metrics=metrics, backend=backend,
+                                cancel=cancel, cache=cache, row_filter=row_filter, aggregate=aggregate)
+        if metrics is None and on_rows:
+            rows = iter_with_progress(rows, on_rows)
+    rows, has_rows = engine.peek(rows)
+    if not has_rows:
+        return None, 0
+
+    # 生成输出文件名
+    name = input_files.output_name(json_file)
+    output_file = os.path.join(output_dir,
+                               f"{name}_converted_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+
+    # 保存到Excel
+    sink = engine.FileSink(output_file, 'xlsx', fixed_widths=EXCEL_FIXED_WIDTHS)
+    if metrics is None:
+        return output_file, sink.write(rows, engine.GUI_COLUMNS)
+    with metrics.stage('write'):
+        return output_file, sink.write(rows, engine.GUI_COLUMNS)
+
+
+def parse_into_store(json_file, db_path, messages, stream=False, backend=None, hospital_id=None, cache=None,
+                     row_filter=None, aggregate=False):
+    """解析JSON文件，提取的行写入数据库文件 db_path（在解析子进程中运行）
+
+    进度以 ('rows', (行数, 已用秒数)) 发送到 messages，结束时发送 ('done', None) 或 ('error', 错误信息)
+    """
+    try:
+        store = row_store.RowStore(engine.GUI_COLUMNS, db_path)
+        try:
+            recorder = metrics.FileMetrics(json_file, on_rows=lambda *progress: messages.put(('rows', progress)))
+            recorder.start()
+            engine.convert(json_file, store, engine.GUI_COLUMNS, stream=stream, hospital_id=hospital_id,
+                           metrics=recorder, backend=backend, cache=cache, row_filter=row_filter,
+                           aggregate=aggregate)
+        finally:
+            store.close()
+    except Exception as e:
+        messages.put(('error', str(e)))
+    else:
+        messages.put(('done', None))
+
+
+def parse_in_process(json_file, cancel=None, on_rows=None, **options):
+    """在子进程中解析JSON文件（options 见 parse_into_store），返回行存储（RowStore）
+
+    解析器持有GIL，在界面进程的线程中解析大文件会使界面停顿；子进程中解析时界面总是保持响应，
+    解析选项（JSON解析后端、流式解析等）与批处理相同；cancel 被设置时终止子进程并抛出 engine.Cancelled
+    """
+    # multiprocessing只在解析时导入（导入较慢，启动界面不需要）
+    import multiprocessing
+    fd, db_path = tempfile.mkstemp(suffix='.sqlite')
+    os.close(fd)
+    messages = multiprocessing.Queue()
+    process = multiprocessing.Process(target=parse_into_store, args=(json_file, db_path, messages),
+                                      kwargs=options, daemon=True)
+    process.start()
+    try:
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise engine.Cancelled()
+            try:
+                kind, value = messages.get(timeout=0.1)
+            except queue.Empty:
+                # 子进程退出前已发送的消息都已写入管道
+                if not process.is_alive() and messages.empty():
+                    raise RuntimeError(f"解析进程意外退出（退出码 {process.exitcode}）")
+                continue
+            if kind == 'rows':
+                if on_rows:
+                    on_rows(*value)
+            elif kind == 'error':
+                raise RuntimeError(value)
+            else:
+                break
+        process.join()
+        return row_store.RowStore.open(engine.GUI_COLUMNS, db_path)
+    except BaseException:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        os.remove(db_path)
+        raise
+
+
+def batch_job_id(json_files, row_filter=None, aggregate=False):
+    """GUI批处理的任务标识（输出的列与命令行不同，不能与命令行的任务日志混用；
+    筛选条件或是否合并重复科室不同时为不同的任务）"""
+    options = {}
+    if row_filter:
+        options['row_filter'] = row_filter.options()
+    if aggregate:
+        options['aggregate'] = aggregate
+    return job_id(json_files, frontend='gui', **options)
+
+
+class BatchControl:
+    """批处理的暂停/继续和取消
+
+    由界面线程设置，批处理线程在开始每个文件前检查；暂停在当前文件完成后生效
+    """
+
+    def __init__(self):
+        self._running = threading.Event()
+        self._running.set()
+        self.cancelled = threading.Event()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self.cancelled.set()
+        self._running.set()
+
+    def is_paused(self):
+        return not self._running.is_set()
+
+    def is_running(self):
+        """未暂停且未取消"""
+        return self._running.is_set() and not self.cancelled.is_set()
+
+    def wait(self):
+        """暂停时阻塞直到继续或取消，返回是否可以继续处理"""
+        self._running.wait()
+        return not self.cancelled.is_set()
+
+
+def convert_batch_file(json_file, output_dir, stream, columnar, collect_metrics, **options):
+    """转换单个文件（options 见 convert_json_file），返回 (输出文件, 记录数, 指标字典)
+
+    collect_metrics=False 时不记录各阶段耗时和内存（指标为None）；为模块级函数，可以提交到进程池
+    """
+    if not collect_metrics:
+        output_file, rows = convert_json_file(json_file, output_dir, stream, columnar, **options)
+        return output_file, rows, None
+    on_rows = options.pop('on_rows', None)
+    (output_file, rows), record = metrics.run_with_metrics(convert_json_file, json_file, output_dir, stream,
+                                                           columnar, on_rows=on_rows, **options)
+    return output_file, rows, record
+
+
+def iter_batch_results(json_files, output_dir, stream=False, jobs=1, on_start=None, columnar=False,
+                       on_rows=None, backend=None, control=None, cache=None, prefetch=pipeline.DEFAULT_PREFETCH,
+                       row_filter=None, aggregate=False, collect_metrics=False):
+    """批量转换文件，逐个产出 (输入文件, 输出文件, 错误信息, 记录数, 指标)
+
+    jobs > 1 时使用进程池并行转换，按完成顺序产出结果；
+    on_start 和 on_rows(行数, 已用秒数) 仅在串行模式下调用；
+    collect_metrics=True 时指标为每个文件的指标字典（见 metrics.FileMetrics），否则（或出错时）为None；
+    control 为 BatchControl 时，暂停后不再开始新的文件，取消后停止产出
+    （串行时中止当前文件，并行时等待已开始的文件完成）；cache 为提取结果缓存；
+    串行时后台线程提前读取后面的 prefetch 个文件（见 pipeline）；row_filter 为筛选条件；
+    aggregate=True 时合并重复的科室
+    """
+    cancel = control.cancelled if control else None
+    if jobs <= 1:
+        for json_file, data in pipeline.iter_prefetched(json_files, prefetch, stream):
+            if control and not control.wait():
+                return
+            if on_start:
+                on_start(json_file)
+            try:
+                with json_backend.preloaded(json_file, data):
+                    output_file, rows, record = convert_batch_file(json_file, output_dir, stream, columnar,
+                                                                   collect_metrics, on_rows=on_rows,
+                                                                   backend=backend, cancel=cancel, cache=cache,
+                                                                   row_filter=row_filter, aggregate=aggregate)
+                yield json_file, output_file, None, rows, record
+            except engine.Cancelled:
+                return
+            except Exception as e:
+                yield json_file, None, str(e), 0, None
+        return
+
+    # 进程池只在并行时导入（multiprocessing导入较慢，串行批处理和启动界面不需要）
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # 最多同时提交 jobs 个文件，暂停或取消时不再提交
+        pending = iter(json_files)
+        futures = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(futures) < jobs and (control is None or control.is_running()):
+                json_file = next(pending, None)
+                if json_file is None:
+                    exhausted = True
+                    break
+                futures[executor.submit(convert_batch_file, json_file, output_dir, stream, columnar,
+                                        collect_metrics, backend=backend, cache=cache,
+                                        row_filter=row_filter, aggregate=aggregate)] = json_file
+            if not futures:
+                # 全部完成，或已暂停且已提交的文件都已完成
+                if exhausted or not control.wait():
+                    return
+                continue
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                json_file = futures.pop(future)
+                try:
+                    output_file, rows, record = future.result()
+                    yield json_file, output_file, None, rows, record
+                except Exception as e:
+                    yield json_file, None, str(e), 0, None
+
+
+def load_tkinter():
+    """导入tkinter，返回是否可用（没有Tk的环境中为False）"""
+    global tk, filedialog, messagebox, ttk
+    if tk is None:
+        try:
+            import tkinter as tk
+            from tkinter import filedialog, messagebox, ttk
+        except ImportError:
+            return False
+    return True
 
 
 class JSONToExcelConverter:
     def __init__(self, root):
+        load_tkinter()
         self.root = root
         self.root.title("JSON转Excel工具 - 医院科室数据转换器")
         self.root.geometry("900x700")
         
-        # 存储当前处理的数据
-        self.current_data = None
+        # 存储当前处理的数据（磁盘行存储，预览按页读取）
+        self.row_store = None
+        self._preview_offset = 0
+        self._preview_rows = PREVIEW_PAGE_ROWS
+        self._sort_column = None
+        self._sort_descending = False
+        # 后台解析/导出任务的取消标志，没有任务运行时为None
+        self._task_cancel = None
+        # 批处理的暂停/取消控制，没有批处理运行时为None
+        self._batch_control = None
         self.current_filename = None
         self.hospital_id = None
         self.baseurl = None
@@ -35,6 +330,25 @@ class JSONToExcelConverter:
         self.batch_mode = tk.BooleanVar(value=False)
         self.input_dir_var = tk.StringVar(value=".")  # 添加输入目录变量
         
+        # 流式解析（大文件）
+        self.stream_mode = tk.BooleanVar(value=False)
+        # 批处理时列式提取
+        self.columnar_mode = tk.BooleanVar(value=False)
+        # 批处理时保存性能报告
+        self.metrics_mode = tk.BooleanVar(value=False)
+        # 缓存提取结果（再次导出同一文件时不重新解析）
+        self.cache_mode = tk.BooleanVar(value=False)
+        self._current_batch_file = None
+        # JSON解析后端
+        self.json_backend_var = tk.StringVar(value='auto')
+        # 提取时的筛选条件（院区、科室名称、hospital_id、URL参数）
+        self.filter_campus_var = tk.StringVar()
+        self.filter_title_var = tk.StringVar()
+        self.filter_hospital_var = tk.StringVar()
+        self.filter_param_var = tk.StringVar()
+        # 合并重复的科室（相同院区和科室ID只输出一行）
+        self.aggregate_mode = tk.BooleanVar(value=False)
+        
         # 创建界面
         self.create_widgets()
         
@@ -49,6 +363,28 @@ class JSONToExcelConverter:
                        value=False, command=self.on_mode_change).grid(row=0, column=1, padx=5)
         ttk.Radiobutton(mode_frame, text="批处理模式", variable=self.batch_mode, 
                        value=True, command=self.on_mode_change).grid(row=0, column=2, padx=5)
+        ttk.Checkbutton(mode_frame, text="流式解析(大文件)", 
+                       variable=self.stream_mode).grid(row=0, column=3, padx=15)
+        ttk.Checkbutton(mode_frame, text="列式提取(批处理)", 
+                       variable=self.columnar_mode).grid(row=0, column=4, padx=5)
+        ttk.Label(mode_frame, text="JSON解析:").grid(row=0, column=5, padx=(15, 5))
+        ttk.Combobox(mode_frame, textvariable=self.json_backend_var, state='readonly', width=10,
+                     values=['auto'] + json_backend.available_backends()).grid(row=0, column=6)
+        ttk.Checkbutton(mode_frame, text="缓存提取结果", 
+                       variable=self.cache_mode).grid(row=0, column=7, padx=15)
+        
+        # 提取筛选：只提取符合条件的科室（多个ID或参数用逗号分隔）
+        extract_filter_frame = ttk.Frame(mode_frame)
+        extract_filter_frame.grid(row=1, column=0, columnspan=8, sticky=tk.W, pady=(8, 0))
+        ttk.Label(extract_filter_frame, text="提取筛选:").grid(row=0, column=0, padx=5)
+        for column, (text, variable, width) in enumerate([("院区ID", self.filter_campus_var, 8),
+                                                          ("科室名称(正则)", self.filter_title_var, 14),
+                                                          ("hospital_id", self.filter_hospital_var, 8),
+                                                          ("必需参数", self.filter_param_var, 12)]):
+            ttk.Label(extract_filter_frame, text=text).grid(row=0, column=2 * column + 1, padx=(10, 2))
+            ttk.Entry(extract_filter_frame, textvariable=variable, width=width).grid(row=0, column=2 * column + 2)
+        ttk.Checkbutton(extract_filter_frame, text="合并重复科室",
+                       variable=self.aggregate_mode).grid(row=0, column=9, padx=15)
         
         # 文件选择框架
         self.file_frame = ttk.Frame(self.root, padding="10")
@@ -63,9 +399,9 @@ class JSONToExcelConverter:
         entry1.grid(row=0, column=1, padx=5)
         btn1 = ttk.Button(self.file_frame, text="浏览", command=self.select_file)
         btn1.grid(row=0, column=2, padx=5)
-        btn2 = ttk.Button(self.file_frame, text="解析", command=self.parse_json)
-        btn2.grid(row=0, column=3, padx=5)
-        self.single_file_widgets = [label1, entry1, btn1, btn2]
+        self.parse_btn = ttk.Button(self.file_frame, text="解析", command=self.parse_json)
+        self.parse_btn.grid(row=0, column=3, padx=5)
+        self.single_file_widgets = [label1, entry1, btn1, self.parse_btn]
         
         # 批处理模式控件（初始隐藏）
         self.batch_widgets = []
@@ -84,7 +420,20 @@ class JSONToExcelConverter:
         btn3 = ttk.Button(self.file_frame, text="选择目录", command=self.select_output_dir)
         # 开始按钮
         btn4 = ttk.Button(self.file_frame, text="开始批处理", command=self.start_batch_process)
-        self.batch_widgets = [label_input, entry_input, btn_input, label2, entry2, label3, entry3, btn3, btn4]
+        # 并行进程数行
+        label_jobs = ttk.Label(self.file_frame, text="并行进程数:")
+        self.jobs_var = tk.StringVar(value=str(os.cpu_count() or 1))
+        spin_jobs = ttk.Spinbox(self.file_frame, from_=1, to=max(64, os.cpu_count() or 1),
+                                textvariable=self.jobs_var, width=8)
+        # 合并输出行
+        label_combine = ttk.Label(self.file_frame, text="合并输出:")
+        self.combine_var = tk.StringVar(value=COMBINE_CHOICES[0][0])
+        combo_combine = ttk.Combobox(self.file_frame, textvariable=self.combine_var, state='readonly', width=20,
+                                     values=[label for label, _ in COMBINE_CHOICES])
+        # 性能报告
+        check_metrics = ttk.Checkbutton(self.file_frame, text="保存性能报告", variable=self.metrics_mode)
+        self.batch_widgets = [label_input, entry_input, btn_input, label2, entry2, label3, entry3, btn3, btn4,
+                              label_jobs, spin_jobs, label_combine, combo_combine, check_metrics]
         
         # 中部框架 - 数据预览
         middle_frame = ttk.Frame(self.root, padding="10")
@@ -92,6 +441,22 @@ class JSONToExcelConverter:
         
         ttk.Label(middle_frame, text="数据预览:").grid(row=0, column=0, sticky=tk.W)
         
+        # 筛选栏（在行存储中查询，不影响导出）
+        filter_frame = ttk.Frame(middle_frame)
+        filter_frame.grid(row=0, column=0, sticky=tk.E)
+        self.preview_info_var = tk.StringVar()
+        ttk.Label(filter_frame, textvariable=self.preview_info_var).grid(row=0, column=0, padx=10)
+        ttk.Label(filter_frame, text="筛选:").grid(row=0, column=1, padx=5)
+        self.filter_column_var = tk.StringVar(value=ALL_COLUMNS_LABEL)
+        ttk.Combobox(filter_frame, textvariable=self.filter_column_var, state='readonly', width=16,
+                     values=[ALL_COLUMNS_LABEL] + engine.GUI_COLUMNS).grid(row=0, column=2, padx=5)
+        self.filter_text_var = tk.StringVar()
+        filter_entry = ttk.Entry(filter_frame, textvariable=self.filter_text_var, width=20)
+        filter_entry.grid(row=0, column=3, padx=5)
+        filter_entry.bind('<Return>', lambda event: self.apply_filter())
+        ttk.Button(filter_frame, text="筛选", command=self.apply_filter).grid(row=0, column=4, padx=5)
+        ttk.Button(filter_frame, text="清除", command=self.clear_filter).grid(row=0, column=5, padx=5)
+        
         # 创建Treeview用于显示表格数据
         self.tree_frame = ttk.Frame(middle_frame)
         self.tree_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -103,14 +468,17 @@ class JSONToExcelConverter:
         self.tree_scroll_x = ttk.Scrollbar(self.tree_frame, orient=tk.HORIZONTAL)
         self.tree_scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
         
-        # 创建Treeview
+        # 创建Treeview（虚拟滚动：只插入可见的一页，纵向滚动条按行存储的位置换页）
         self.tree = ttk.Treeview(self.tree_frame, 
-                                yscrollcommand=self.tree_scroll_y.set,
                                 xscrollcommand=self.tree_scroll_x.set)
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
-        self.tree_scroll_y.config(command=self.tree.yview)
+        self.tree_scroll_y.config(command=self.on_preview_scroll)
         self.tree_scroll_x.config(command=self.tree.xview)
+        self.tree.bind('<Configure>', self.on_preview_resize)
+        self.tree.bind('<MouseWheel>', self.on_preview_wheel)
+        self.tree.bind('<Button-4>', self.on_preview_wheel)
+        self.tree.bind('<Button-5>', self.on_preview_wheel)
         
         # 底部框架 - 导出和状态
         bottom_frame = ttk.Frame(self.root, padding="10")
@@ -119,15 +487,24 @@ class JSONToExcelConverter:
         self.export_btn = ttk.Button(bottom_frame, text="导出Excel", command=self.export_excel)
         self.export_btn.grid(row=0, column=0, padx=5)
         
-        # 进度条（批处理用）
+        # 暂停/继续按钮（批处理时显示）
+        self.pause_btn = ttk.Button(bottom_frame, text="暂停", command=self.toggle_pause)
+        self.pause_btn.grid(row=0, column=1, padx=5)
+        self.pause_btn.grid_remove()
+        
+        # 取消按钮（解析、导出和批处理时可用）
+        self.cancel_btn = ttk.Button(bottom_frame, text="取消", command=self.cancel_task, state='disabled')
+        self.cancel_btn.grid(row=0, column=2, padx=5)
+        
+        # 进度条
         self.progress = ttk.Progressbar(bottom_frame, length=300, mode='determinate')
-        self.progress.grid(row=0, column=1, padx=20)
+        self.progress.grid(row=0, column=3, padx=20)
         self.progress.grid_remove()  # 初始隐藏
         
         # 状态栏
         self.status_var = tk.StringVar()
         self.status_var.set("就绪")
-        ttk.Label(bottom_frame, textvariable=self.status_var).grid(row=1, column=0, columnspan=2, pady=5)
+        ttk.Label(bottom_frame, textvariable=self.status_var).grid(row=1, column=0, columnspan=4, pady=5)
         
         # 配置grid权重
         self.root.grid_columnconfigure(0, weight=1)
@@ -160,8 +537,17 @@ class JSONToExcelConverter:
             self.batch_widgets[6].grid(row=2, column=1, padx=5, sticky=(tk.W, tk.E))  # 输出目录输入
             self.batch_widgets[7].grid(row=2, column=2, padx=5)  # 选择输出目录按钮
             
+            # 并行进程数行
+            self.batch_widgets[9].grid(row=3, column=0, padx=5, sticky=tk.E)  # 并行进程数标签
+            self.batch_widgets[10].grid(row=3, column=1, padx=5, sticky=tk.W)  # 并行进程数输入
+            
+            # 合并输出行
+            self.batch_widgets[11].grid(row=4, column=0, padx=5, sticky=tk.E)  # 合并输出标签
+            self.batch_widgets[12].grid(row=4, column=1, padx=5, sticky=tk.W)  # 合并方式选择
+            self.batch_widgets[13].grid(row=3, column=2, padx=5, sticky=tk.W)  # 保存性能报告
+            
             # 开始按钮
-            self.batch_widgets[8].grid(row=3, column=0, columnspan=3, pady=10)  # 开始批处理按钮
+            self.batch_widgets[8].grid(row=5, column=0, columnspan=3, pady=10)  # 开始批处理按钮
             
             # 配置列权重
             self.file_frame.grid_columnconfigure(1, weight=1)
@@ -175,14 +561,16 @@ class JSONToExcelConverter:
             for i, widget in enumerate(self.single_file_widgets):
                 widget.grid(row=0, column=i, padx=5)
             
-            self.export_btn.config(state='normal')
-            self.progress.grid_remove()
+            if self._task_cancel is None:
+                self.export_btn.config(state='normal')
+                self.progress.grid_remove()
     
     def select_file(self):
         """选择JSON文件"""
         filename = filedialog.askopenfilename(
             title="选择JSON文件",
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+            filetypes=[("JSON files", "*.json"), ("Compressed JSON files", "*.json.gz *.json.bz2 *.json.xz *.json.zst"),
+                       ("All files", "*.*")]
         )
         if filename:
             self.file_path_var.set(filename)
@@ -208,217 +596,363 @@ class JSONToExcelConverter:
         if directory:
             self.input_dir_var.set(directory)
     
-    def extract_url_params(self, url_pattern):
-        """从URL模式中提取参数名"""
-        # 查找所有 {param} 格式的参数
-        params = re.findall(r'\{(\w+)\}', url_pattern)
-        return params
-    
     def parse_json(self):
-        """解析JSON文件并显示预览"""
+        """在后台线程中解析JSON文件，完成后显示预览"""
         if not self.file_path_var.get():
             messagebox.showwarning("警告", "请先选择JSON文件")
             return
-            
+        if self._task_cancel is not None:
+            return
+        
+        # Tk变量只在主线程中读取
+        json_file = self.file_path_var.get()
         try:
-            # 读取JSON文件
-            with open(self.file_path_var.get(), 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            # 解析baseurl
-            self.baseurl, self.url_params = self.extract_baseurl(data)
-            
-            # 解析数据
-            self.current_data = self.extract_department_data(data, self.hospital_id, self.baseurl)
-            
-            # 显示预览
-            self.display_preview()
-            
-            self.status_var.set(f"解析成功: 共{len(self.current_data)}条记录")
-            
-        except Exception as e:
-            messagebox.showerror("错误", f"解析失败: {str(e)}")
-            self.status_var.set("解析失败")
+            options = dict(stream=self.stream_mode.get(), backend=self.json_backend_var.get(),
+                           hospital_id=self.hospital_id, cache=self.extract_cache(),
+                           row_filter=self.row_filter(), aggregate=self.aggregate_mode.get())
+        except ValueError as e:
+            messagebox.showwarning("警告", str(e))
+            return
+        
+        def work(cancel, on_rows):
+            # 在子进程中读取并解析JSON文件，提取的行写入磁盘行存储
+            return parse_in_process(json_file, cancel, on_rows, **options)
+        
+        self.run_task(work, self._on_parse_done, "解析", f"正在解析: {os.path.basename(json_file)}")
+    
+    def extract_cache(self):
+        """勾选缓存时返回用户缓存目录中的提取结果缓存，否则为None（主线程中调用）"""
+        if not self.cache_mode.get():
+            return None
+        return extract_cache.ExtractCache(version=engine.CONVERTER_VERSION)
+    
+    def row_filter(self):
+        """界面中填写的提取筛选条件，没有填写时为None；正则表达式无效时抛出ValueError（主线程中调用）"""
+        return RowFilter(self.filter_campus_var.get(), self.filter_title_var.get().strip(),
+                         self.filter_hospital_var.get(), self.filter_param_var.get()) or None
+    
+    def _on_parse_done(self, store):
+        """解析完成（主线程）"""
+        if self.row_store is not None:
+            self.row_store.close()
+        self.row_store = store
+        first = next(store.iter_dicts(), None)
+        if first:
+            self.baseurl = first['baseurl']
+            self.url_params = self.extract_url_params(self.baseurl)
+        
+        # 显示预览
+        self.display_preview()
+        
+        self.status_var.set(f"解析成功: 共{len(store)}条记录")
+    
+    def run_task(self, work, on_done, action, message, total=None):
+        """在后台线程中执行 work(cancel, on_rows)，界面保持响应
+
+        work 在后台线程中运行，不能访问Tk控件；进度通过 root.after 回到主线程显示，
+        成功后在主线程调用 on_done(结果)；action 为状态栏中的操作名称，
+        total 为已知的总行数（用于进度条，未知时进度条为滚动模式）
+        """
+        cancel = threading.Event()
+        self._task_cancel = cancel
+        self.parse_btn.config(state='disabled')
+        self.export_btn.config(state='disabled')
+        self.cancel_btn.config(state='normal')
+        if total:
+            self.progress.config(mode='determinate', maximum=total, value=0)
+        else:
+            self.progress.config(mode='indeterminate')
+            self.progress.start(20)
+        self.progress.grid()
+        self.status_var.set(message)
+        
+        def on_rows(rows, seconds):
+            self.root.after(0, lambda: self._on_task_progress(cancel, message, rows, seconds))
+        
+        def run():
+            try:
+                result = work(cancel, on_rows)
+            except engine.Cancelled:
+                self.root.after(0, lambda: self._finish_task(cancel, f"{action}已取消"))
+            except Exception as e:
+                self.root.after(0, lambda error=str(e): self._finish_task(cancel, f"{action}失败", error))
+            else:
+                self.root.after(0, lambda: self._finish_task(cancel, on_done=lambda: on_done(result)))
+        
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+    
+    def _on_task_progress(self, cancel, message, rows, seconds):
+        """显示后台任务的进度（主线程）"""
+        if cancel is not self._task_cancel or cancel.is_set():
+            return
+        if str(self.progress.cget('mode')) == 'determinate':
+            self.progress.config(value=rows)
+        self.status_var.set(f"{message} ({rows}条, {rows / max(seconds, 1e-6):.0f} 条/秒)")
+    
+    def _finish_task(self, cancel, status=None, error=None, on_done=None):
+        """后台任务结束，恢复界面状态（主线程）"""
+        if cancel is not self._task_cancel:
+            return
+        self._task_cancel = None
+        self.progress.stop()
+        self.progress.config(mode='determinate', value=0)
+        if self._batch_control is None:
+            self.progress.grid_remove()
+            self.cancel_btn.config(state='disabled')
+        self.parse_btn.config(state='normal')
+        if not self.batch_mode.get():
+            self.export_btn.config(state='normal')
+        if status:
+            self.status_var.set(status)
+        if error:
+            messagebox.showerror("错误", f"{status}: {error}")
+        if on_done:
+            on_done()
+    
+    def cancel_task(self):
+        """请求取消当前的解析/导出任务（在处理下一批行时生效）或批处理"""
+        if self._task_cancel is not None:
+            self._task_cancel.set()
+        if self._batch_control is not None:
+            self._batch_control.cancel()
+            self.pause_btn.config(state='disabled')
+        self.cancel_btn.config(state='disabled')
+        self.status_var.set("正在取消...")
+    
+    def toggle_pause(self):
+        """暂停或继续批处理（暂停在当前文件完成后生效）"""
+        control = self._batch_control
+        if control is None:
+            return
+        if control.is_paused():
+            control.resume()
+            self.pause_btn.config(text="暂停")
+            self.status_var.set("继续处理...")
+        else:
+            control.pause()
+            self.pause_btn.config(text="继续")
+            self.status_var.set("当前文件完成后暂停...")
+    
+    def extract_url_params(self, url_pattern):
+        """从URL模式中提取参数名"""
+        return extract_url_params(url_pattern)
     
     def extract_baseurl(self, json_data):
         """提取baseurl信息"""
-        baseurl_list = json_data.get('baseurl', [])
-        if baseurl_list and len(baseurl_list) > 0:
-            # 获取第一个baseurl对象
-            baseurl_obj = baseurl_list[0]
-            # 查找url_pattern或类似的键
-            for key in ['url_pattern', 'url', 'base_url', 'baseurl']:
-                if key in baseurl_obj:
-                    url = baseurl_obj[key]
-                    # 提取URL中的参数
-                    params = self.extract_url_params(url)
-                    return url, params
-        return None, []
-    
-    def extract_department_data(self, json_data, hospital_id, baseurl, url_params=None):
-        """从JSON数据中提取科室信息"""
-        rows = []
-        
+        return extract_baseurl(json_data)
+    
+    def load_json(self, json_file, stream=False):
+        """读取JSON文件，返回 (顶层字段, departments迭代器)"""
+        return load_json(json_file, stream, self.json_backend_var.get())
+    
+    def extract_department_data(self, json_data, hospital_id=None, baseurl=None, url_params=None,
+                                columns=None):
+        """从JSON数据中提取科室信息
+
+        未提供的参数使用实例变量；columns 可从 ALL_COLUMNS 中选择（默认GUI列）
+        """
+        if hospital_id is None:
+            hospital_id = self.hospital_id
+        if baseurl is None:
+            baseurl = self.baseurl
         # 如果没有提供url_params，使用实例变量
         if url_params is None:
             url_params = self.url_params
-        
-        # 获取departments数组
-        departments = json_data.get('departments', [])
-        
-        for dept in departments:
-            # 获取基本信息
-            dept_title = dept.get('title', '')
-            symptom_text = dept.get('symptom_text', '')
-            diagnosis_text = dept.get('diagnosis_text', '')
-            
-            # 查找包含科室列表的key（可能是'data'、空字符串或其他）
-            data_list = None
-            for key, value in dept.items():
-                if isinstance(value, list) and key not in ['title', 'symptom_text', 'diagnosis_text']:
-                    data_list = value
-                    break
-            
-            if data_list:
-                # 遍历每个院区
-                for campus_data in data_list:
-                    campus_id = campus_data.get('campus_id', '')
-                    department_list = campus_data.get('department_list', [])
-                    
-                    # 遍历每个具体科室
-                    for dept_item in department_list:
-                        row = {
-                            'hospital_id': hospital_id or '',
-                            'baseurl': baseurl or '',
-                            'campus_id': campus_id,
-                            'department_title': dept_item.get('title', ''),
-                            'symptom_text': symptom_text,
-                            'diagnosis_text': diagnosis_text
-                        }
-                        
-                        # 收集所有URL参数到一个字典中
-                        url_params_dict = {}
-                        
-                        # 动态提取参数
-                        if 'params' in dept_item:
-                            # 193格式：参数在params对象中
-                            params = dept_item.get('params', {})
-                            for param in url_params:
-                                # 尝试不同的键名变体
-                                value = params.get(param) or params.get(param.lower()) or params.get(param.upper())
-                                url_params_dict[param] = value or ''
-                        else:
-                            # 63格式：直接在dept_item中查找
-                            for param in url_params:
-                                if param == 'departId':
-                                    # 特殊处理departId -> department_id的映射
-                                    value = dept_item.get('department_id', '')
-                                elif param == 'title' or param == 'departName':
-                                    # title通常对应department_title
-                                    value = dept_item.get('title', '')
-                                else:
-                                    # 其他参数直接查找
-                                    value = dept_item.get(param) or dept_item.get(param.lower()) or ''
-                                url_params_dict[param] = value
-                            
-                            # 添加position字段（如果存在）到参数字典中
-                            if 'position' in dept_item:
-                                url_params_dict['position'] = dept_item['position']
-                        
-                        # 将参数字典转换为JSON字符串，保存在单个单元格中
-                        row['url_params_json'] = json.dumps(url_params_dict, ensure_ascii=False)
-                        
-                        rows.append(row)
-        
-        return rows
+        return extract_department_data(json_data, hospital_id, baseurl, url_params, columns)
+    
+    def iter_department_rows(self, departments, hospital_id, baseurl, url_params=None):
+        """逐条产出科室行数据"""
+        if url_params is None:
+            url_params = self.url_params
+        return iter_department_rows(departments, hospital_id, baseurl, url_params)
+    
+    def extract_hospital_id(self, filename):
+        """从文件名提取hospital_id"""
+        return extract_hospital_id(filename)
     
     def display_preview(self):
-        """在Treeview中显示数据预览"""
-        # 清除现有数据
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        """在Treeview中显示数据预览（重置排序、筛选和滚动位置）"""
+        self._preview_offset = 0
+        self._sort_column = None
+        self._sort_descending = False
+        self.filter_text_var.set('')
+        self.filter_column_var.set(ALL_COLUMNS_LABEL)
         
-        if not self.current_data:
+        if not self.row_store:
+            self.tree.delete(*self.tree.get_children())
+            self.preview_info_var.set('')
             return
         
-        # 设置列（动态列）
-        if self.current_data:
-            columns = list(self.current_data[0].keys())
-            self.tree['columns'] = columns
-            self.tree['show'] = 'headings'
-            
-            # 设置列标题和宽度
-            for col in columns:
-                self.tree.heading(col, text=col)
-                # 根据列名设置不同的宽度
-                if col in ['hospital_id', 'campus_id']:
-                    width = 80
-                elif col in ['symptom_text', 'diagnosis_text', 'baseurl']:
-                    width = 200
-                elif col == 'url_params_json':
-                    width = 300  # 为JSON列设置更大的宽度
-                else:
-                    width = 120
-                self.tree.column(col, width=width)
-            
-            # 插入数据（只显示前100条以提高性能）
-            for i, row in enumerate(self.current_data[:100]):
-                values = [row.get(col, '') for col in columns]
-                self.tree.insert('', 'end', values=values)
-            
-            if len(self.current_data) > 100:
-                self.tree.insert('', 'end', values=['...' for _ in columns])
+        # 设置列
+        columns = self.row_store.columns
+        self.tree['columns'] = columns
+        self.tree['show'] = 'headings'
+        
+        # 设置列标题和宽度，点击标题排序
+        for col in columns:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by_column(c))
+            # 根据列名设置不同的宽度
+            if col in ['hospital_id', 'campus_id']:
+                width = 80
+            elif col in ['symptom_text', 'diagnosis_text', 'baseurl']:
+                width = 200
+            elif col == 'url_params_json':
+                width = 300  # 为JSON列设置更大的宽度
+            else:
+                width = 120
+            self.tree.column(col, width=width)
+        
+        self.row_store.set_view()
+        self.refresh_preview()
+    
+    def refresh_preview(self):
+        """从行存储读取当前位置的一页并显示"""
+        self.tree.delete(*self.tree.get_children())
+        if not self.row_store:
+            return
+        
+        total = self.row_store.count()
+        page = self._preview_rows
+        self._preview_offset = max(0, min(self._preview_offset, total - page))
+        for values in self.row_store.fetch(self._preview_offset, page):
+            self.tree.insert('', 'end', values=['' if v is None else v for v in values])
+        
+        if total:
+            first = self._preview_offset
+            last = min(first + page, total)
+            self.tree_scroll_y.set(first / total, last / total)
+            self.preview_info_var.set(f"第 {first + 1}-{last} 条 / 共 {total} 条")
+        else:
+            self.tree_scroll_y.set(0, 1)
+            self.preview_info_var.set("没有符合条件的记录")
+    
+    def scroll_preview(self, offset):
+        """滚动到指定位置"""
+        if self.row_store and offset != self._preview_offset:
+            self._preview_offset = offset
+            self.refresh_preview()
+    
+    def on_preview_scroll(self, action, value, unit=None):
+        """纵向滚动条回调（moveto 拖动 / scroll 按行或按页）"""
+        if not self.row_store:
+            return
+        if action == 'moveto':
+            offset = int(float(value) * self.row_store.count())
+        else:
+            step = self._preview_rows if unit == 'pages' else 1
+            offset = self._preview_offset + int(value) * step
+        self.scroll_preview(offset)
+    
+    def on_preview_wheel(self, event):
+        """鼠标滚轮（Windows/macOS为<MouseWheel>，Linux为<Button-4/5>）"""
+        if getattr(event, 'num', None) == 4 or getattr(event, 'delta', 0) > 0:
+            direction = -1
+        else:
+            direction = 1
+        self.scroll_preview(self._preview_offset + direction * PREVIEW_WHEEL_ROWS)
+        return "break"
+    
+    def on_preview_resize(self, event):
+        """根据Treeview高度计算每页行数"""
+        try:
+            row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        except (tk.TclError, ValueError):
+            row_height = 20
+        # 减去标题行的高度
+        rows = max(1, (event.height - row_height - 4) // row_height)
+        if rows != self._preview_rows:
+            self._preview_rows = rows
+            self.refresh_preview()
+    
+    def sort_by_column(self, column):
+        """按列排序，再次点击同一列切换升序/降序"""
+        if not self.row_store or self._view_locked():
+            return
+        if self._sort_column == column:
+            self._sort_descending = not self._sort_descending
+        else:
+            self._sort_column = column
+            self._sort_descending = False
+        for col in self.row_store.columns:
+            mark = ''
+            if col == self._sort_column:
+                mark = ' ▼' if self._sort_descending else ' ▲'
+            self.tree.heading(col, text=col + mark)
+        self.update_view()
+    
+    def apply_filter(self):
+        """按筛选条件在行存储中查询"""
+        if self.row_store and not self._view_locked():
+            self.update_view()
+    
+    def clear_filter(self):
+        """清除筛选和排序"""
+        if self.row_store and not self._view_locked():
+            self.display_preview()
+    
+    def _view_locked(self):
+        """导出时后台线程正在读取行存储，不能修改排序和筛选条件"""
+        if self._task_cancel is None:
+            return False
+        self.status_var.set("请等待当前任务完成后再排序或筛选")
+        return True
+    
+    def update_view(self):
+        """按当前排序和筛选条件更新预览，回到第一行"""
+        filter_column = self.filter_column_var.get()
+        if filter_column == ALL_COLUMNS_LABEL:
+            filter_column = None
+        total = self.row_store.set_view(self._sort_column, self._sort_descending,
+                                        filter_column, self.filter_text_var.get())
+        self._preview_offset = 0
+        self.refresh_preview()
+        self.status_var.set(f"符合条件: {total}条记录 / 共{len(self.row_store)}条")
     
     def export_excel(self):
         """导出数据到Excel文件"""
-        if not self.current_data:
+        if not self.row_store:
             messagebox.showwarning("警告", "请先解析JSON文件")
             return
+        if self._task_cancel is not None:
+            return
         
         # 选择保存位置
         filename = filedialog.asksaveasfilename(
             title="保存Excel文件",
             defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
+            filetypes=EXPORT_FILETYPES + [("All files", "*.*")],
             initialfile=f"{self.hospital_id}_departments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         )
         
         if not filename:
             return
         
-        try:
-            self.save_to_excel(self.current_data, filename)
-            messagebox.showinfo("成功", f"Excel文件已保存: {filename}")
-            self.status_var.set(f"导出成功: {len(self.current_data)}条记录")
-        except Exception as e:
-            messagebox.showerror("错误", f"导出失败: {str(e)}")
-            self.status_var.set("导出失败")
+        store = self.row_store
+        
+        def work(cancel, on_rows):
+            # 导出全部行（按原始顺序，不受预览的排序和筛选影响）
+            recorder = metrics.FileMetrics(filename, on_rows=on_rows)
+            recorder.start()
+            rows = recorder.timed_iter(engine.cancellable(store.iter_dicts(), cancel), 'write', count_rows=True)
+            # 先写入临时文件，取消时不会留下写了一半的文件
+            if output_formats.format_from_filename(filename) == 'xlsx':
+                self.save_to_excel(rows, filename)
+            else:
+                engine.FileSink(filename).write(rows, engine.GUI_COLUMNS)
+            return recorder.rows
+        
+        def on_done(count):
+            self.status_var.set(f"导出成功: {count}条记录")
+            messagebox.showinfo("成功", f"文件已保存: {filename}")
+        
+        self.run_task(work, on_done, "导出", f"正在导出: {os.path.basename(filename)}", total=len(store))
     
     def save_to_excel(self, data, filename):
-        """保存数据到Excel文件"""
-        # 创建DataFrame
-        df = pd.DataFrame(data)
-        
-        # 导出到Excel
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='科室数据', index=False)
-            
-            # 获取worksheet对象以调整列宽
-            worksheet = writer.sheets['科室数据']
-            
-            # 自动调整列宽
-            for idx, col in enumerate(df.columns):
-                max_length = max(
-                    df[col].astype(str).apply(len).max(),
-                    len(col)
-                ) + 2
-                # 设置最大宽度
-                if col == 'baseurl':
-                    worksheet.column_dimensions[chr(65 + idx)].width = 80
-                elif col == 'url_params_json':
-                    worksheet.column_dimensions[chr(65 + idx)].width = 100  # 为JSON列设置较大宽度
-                else:
-                    worksheet.column_dimensions[chr(65 + idx)].width = min(max_length, 50)
+        """保存数据到Excel文件（流式写入，不构建DataFrame）"""
+        # baseurl和JSON列使用固定宽度，其余列自动调整（最大50）
+        return engine.FileSink(filename, 'xlsx', fixed_widths=EXCEL_FIXED_WIDTHS).write(data, engine.GUI_COLUMNS)
     
     def start_batch_process(self):
         """开始批处理"""
@@ -430,83 +964,200 @@ class JSONToExcelConverter:
             messagebox.showwarning("警告", "请输入文件模式")
             return
         
-        # 预先查找匹配的文件
-        json_files = glob.glob(os.path.join(input_dir, pattern))
+        try:
+            jobs = int(self.jobs_var.get())
+        except ValueError:
+            jobs = 0
+        if jobs < 1:
+            messagebox.showwarning("警告", "并行进程数必须是正整数")
+            return
+        try:
+            row_filter = self.row_filter()
+        except ValueError as e:
+            messagebox.showwarning("警告", str(e))
+            return
+        
+        # 预先查找匹配的文件（包括压缩文件和目录中zip/tar归档内的文件）
+        json_files = input_files.list_inputs(os.path.join(input_dir, pattern))
+        if row_filter:
+            # 按文件名中的hospital_id筛选，其他文件不打开
+            json_files = row_filter.select_files(json_files)
         
         if not json_files:
             messagebox.showwarning("警告", f"在目录 {input_dir} 中没有找到匹配 {pattern} 的文件")
             return
+        combine = dict(COMBINE_CHOICES)[self.combine_var.get()]
+        duplicates = input_files.duplicate_output_names(json_files) if not combine else {}
+        if duplicates:
+            # 不同的输入文件写入同名的输出文件时会相互覆盖
+            names = "\n".join("、".join(map(os.path.basename, paths)) for paths in list(duplicates.values())[:5])
+            messagebox.showwarning("警告", f"以下输入文件的输出文件名相同，请分别转换:\n\n{names}")
+            return
         
         # 显示找到的文件列表，让用户确认
         file_list = "\n".join([os.path.basename(f) for f in json_files[:10]])
         if len(json_files) > 10:
             file_list += f"\n... 和其他 {len(json_files) - 10} 个文件"
         
-        msg = f"找到 {len(json_files)} 个文件:\n\n{file_list}\n\n是否继续处理？"
+        msg = f"找到 {len(json_files)} 个文件:\n\n{file_list}\n\n"
+        if row_filter:
+            msg += f"筛选条件: {row_filter.describe()}\n\n"
+        msg += "是否继续处理？"
         if not messagebox.askyesno("确认", msg):
             return
         
+        # 输出目录中有未完成的相同批处理时，询问是否跳过已完成的文件
+        resume = False
+        if not combine:
+            done_count = JobJournal(output_dir, batch_job_id(json_files, row_filter,
+                                                             self.aggregate_mode.get())).load()
+            if done_count:
+                resume = messagebox.askyesno(
+                    "继续上次的批处理",
+                    f"上次相同的批处理未完成（已完成 {done_count}/{len(json_files)} 个文件）。\n\n"
+                    f"是否跳过已完成的文件继续？选择\"否\"将重新处理全部文件。")
+        
         # 在新线程中执行批处理
-        thread = threading.Thread(target=self.batch_process, args=(json_files, output_dir))
+        control = BatchControl()
+        self._batch_control = control
+        self.pause_btn.config(text="暂停", state='normal')
+        self.pause_btn.grid()
+        self.cancel_btn.config(state='normal')
+        thread = threading.Thread(target=self.batch_process,
+                                  args=(json_files, output_dir, self.stream_mode.get(), jobs,
+                                        self.columnar_mode.get(), combine,
+                                        self.metrics_mode.get(), self.json_backend_var.get(), control, resume,
+                                        self.extract_cache(), row_filter, self.aggregate_mode.get()))
         thread.daemon = True
         thread.start()
     
-    def batch_process(self, json_files, output_dir):
-        """批处理函数"""
+    def batch_process(self, json_files, output_dir, stream=False, jobs=1, columnar=False, combine=None,
+                      save_metrics=False, backend=None, control=None, resume=False, cache=None, row_filter=None,
+                      aggregate=False):
+        """批处理函数
+
+        combine 为 'sheet' 或 'hospital' 时所有文件合并写入一个Excel文件；
+        save_metrics=True 时在输出目录中保存每个文件的性能报告（合并输出时不记录）；
+        backend 为JSON解析后端；control 为 BatchControl 时可以暂停和取消；
+        不合并输出时每完成一个文件记录到输出目录的任务日志，resume=True 时跳过日志中已完成的文件；
+        cache 为提取结果缓存（合并输出时不使用）；row_filter 为提取时的筛选条件；
+        aggregate=True 时合并重复的科室
+        """
+        journal = None
+        cancelled = False
         try:
             # 创建输出目录
             if not os.path.exists(output_dir):
                 os.makedirs(output_dir)
             
+            pending_files = json_files
+            if not combine:
+                journal = JobJournal(output_dir, batch_job_id(json_files, row_filter, aggregate))
+                journal.start(resume)
+                pending_files = [f for f in json_files if not journal.is_done(f)]
+            skipped = len(json_files) - len(pending_files)
+            
             # 更新进度条
             self.root.after(0, self.progress.grid)
-            self.root.after(0, lambda: self.progress.config(maximum=len(json_files)))
+            self.root.after(0, lambda: self.progress.config(mode='determinate', maximum=len(json_files),
+                                                            value=skipped))
+            if jobs > 1 and not combine:
+                self.root.after(0, lambda: self.status_var.set(f"正在使用 {jobs} 个进程并行处理..."))
             
-            success_count = 0
+            success_count = skipped
+            done_count = skipped
+            total_rows = 0
             error_files = []
+            records = []
+            started = time.perf_counter()
             
-            for i, json_file in enumerate(json_files):
-                try:
-                    # 更新状态
-                    self.root.after(0, lambda f=json_file: self.status_var.set(f"正在处理: {os.path.basename(f)}"))
-                    
-                    # 提取hospital_id
-                    hospital_id = self.extract_hospital_id(json_file)
-                    
-                    # 读取和解析JSON
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    # 提取baseurl
-                    baseurl, url_params = self.extract_baseurl(data)
-                    
-                    # 提取数据
-                    rows = self.extract_department_data(data, hospital_id, baseurl, url_params)
-                    
-                    if rows:
-                        # 生成输出文件名
-                        base_name = os.path.splitext(os.path.basename(json_file))[0]
-                        output_file = os.path.join(output_dir, 
-                                                  f"{base_name}_converted_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
-                        
-                        # 保存到Excel
-                        self.save_to_excel(rows, output_file)
-                        success_count += 1
-                    else:
-                        error_files.append((json_file, "没有找到科室数据"))
-                    
-                except Exception as e:
-                    error_files.append((json_file, str(e)))
-                    print(f"处理 {json_file} 时出错: {str(e)}")
+            def on_result(json_file, output_file, error, rows=0, record=None):
+                nonlocal success_count, done_count, total_rows
+                if error:
+                    error_files.append((json_file, error))
+                    print(f"处理 {json_file} 时出错: {error}")
+                elif output_file:
+                    success_count += 1
+                else:
+                    error_files.append((json_file, "没有符合筛选条件的科室数据" if row_filter else "没有找到科室数据"))
+                if journal:
+                    journal.record(json_file, DONE if output_file else FAILED, output_file, error)
+                
+                total_rows += rows
+                if record:
+                    records.append(record)
+                
+                # 根据已完成的文件数更新进度
+                done_count += 1
+                self.root.after(0, lambda v=done_count: self.progress.config(value=v))
+                if jobs > 1 or combine:
+                    rate = total_rows / max(time.perf_counter() - started, 1e-6)
+                    self.root.after(0, lambda f=json_file, v=done_count, r=rate: self.status_var.set(
+                        f"已完成 {v}/{len(json_files)}: {os.path.basename(f)} ({r:.0f} 条/秒)"))
+                if control and control.is_paused():
+                    self.root.after(0, lambda v=done_count: self.status_var.set(
+                        f"已暂停: 已完成 {v}/{len(json_files)} 个文件，点击\"继续\"恢复"))
+            
+            def on_rows(rows, seconds):
+                # 串行处理时实时显示当前文件的处理速度
+                self.root.after(0, lambda: self.status_var.set(
+                    f"正在处理: {os.path.basename(self._current_batch_file)} ({rows}条, {rows / seconds:.0f} 条/秒)"))
+            
+            if combine:
+                # 合并输出：流式追加到同一个Excel文件
+                combined_file = os.path.join(output_dir,
+                                             f"combined_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+                
+                def on_file_done(json_file, rows, error):
+                    on_result(json_file, combined_file if rows else None, error, rows)
+                    # 在文件之间暂停；取消时放弃整个合并文件
+                    if control and not control.wait():
+                        raise engine.Cancelled()
                 
-                # 更新进度
-                self.root.after(0, lambda v=i+1: self.progress.config(value=v))
+                try:
+                    consolidate.write_consolidated(json_files, combined_file, combine, stream,
+                                                   on_file_done=on_file_done, backend=backend,
+                                                   row_filter=row_filter, aggregate=aggregate)
+                except engine.Cancelled:
+                    cancelled = True
+                output_dir = combined_file
+            else:
+                results = iter_batch_results(pending_files, output_dir, stream, jobs,
+                                             on_start=self._on_batch_file_start, columnar=columnar,
+                                             on_rows=on_rows, backend=backend, control=control, cache=cache,
+                                             row_filter=row_filter, aggregate=aggregate,
+                                             collect_metrics=save_metrics)
+                for result in results:
+                    on_result(*result)
+                cancelled = bool(control and control.cancelled.is_set())
+                if not cancelled:
+                    journal.finish(pending_files)
+            
+            if cancelled:
+                msg = f"批处理已取消\n已完成 {done_count}/{len(json_files)} 个文件"
+                if journal:
+                    msg += "\n\n再次开始相同的批处理时可以跳过已完成的文件"
+                else:
+                    msg += "\n合并输出文件未保存"
+                self.root.after(0, lambda: self.status_var.set(
+                    f"批处理已取消: 已完成 {done_count}/{len(json_files)} 个文件"))
+                self.root.after(0, lambda: messagebox.showinfo("已取消", msg))
+                return
             
             # 完成
-            self.root.after(0, lambda: self.status_var.set(f"批处理完成: 成功 {success_count}/{len(json_files)} 个文件"))
+            elapsed = time.perf_counter() - started
+            self.root.after(0, lambda: self.status_var.set(
+                f"批处理完成: 成功 {success_count}/{len(json_files)} 个文件"
+                + (f"，{total_rows}条记录，{total_rows / elapsed:.0f} 条/秒" if total_rows and elapsed else "")))
             
             # 构建结果消息
-            msg = f"批处理完成\n成功处理 {success_count}/{len(json_files)} 个文件\n输出目录: {output_dir}"
+            msg = f"批处理完成\n成功处理 {success_count}/{len(json_files)} 个文件\n输出: {output_dir}"
+            if skipped:
+                msg += f"\n（其中 {skipped} 个文件上次已完成，已跳过）"
+            if save_metrics and records:
+                report_file = os.path.join(output_dir, f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+                metrics.write_report(records, report_file)
+                msg += f"\n性能报告: {report_file}\n\n最慢的文件:\n" + "\n".join(metrics.summary_lines(records, 3))
             if error_files:
                 msg += "\n\n以下文件处理失败:"
                 for file, error in error_files[:5]:
@@ -517,19 +1168,30 @@ class JSONToExcelConverter:
             self.root.after(0, lambda: messagebox.showinfo("完成", msg))
             
         except Exception as e:
-            self.root.after(0, lambda: messagebox.showerror("错误", f"批处理失败: {str(e)}"))
+            self.root.after(0, lambda error=str(e): messagebox.showerror("错误", f"批处理失败: {error}"))
         finally:
-            self.root.after(0, self.progress.grid_remove)
+            if journal:
+                journal.close()
+            self.root.after(0, self._finish_batch)
     
-    def extract_hospital_id(self, filename):
-        """从文件名提取hospital_id"""
-        basename = os.path.basename(filename)
-        match = re.match(r'^(\d+)', basename)
-        return match.group(1) if match else None
+    def _finish_batch(self):
+        """批处理结束，恢复界面状态（主线程）"""
+        self._batch_control = None
+        self.pause_btn.grid_remove()
+        if self._task_cancel is None:
+            self.progress.grid_remove()
+            self.cancel_btn.config(state='disabled')
+    
+    def _on_batch_file_start(self, json_file):
+        """串行处理时显示当前文件"""
+        self._current_batch_file = json_file
+        self.root.after(0, lambda: self.status_var.set(f"正在处理: {os.path.basename(json_file)}"))
 
 
 def main():
     """主函数"""
+    if not load_tkinter():
+        raise SystemExit("运行图形界面需要tkinter（如 apt install python3-tk），命令行转换请使用 batch_converter.py")
     root = tk.Tk()
     app = JSONToExcelConverter(root)
     root.mainloop()
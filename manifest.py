@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量转换清单
+记录每个输入文件的大小、修改时间、内容哈希、转换器版本和输出文件，
+再次运行时跳过未变化的文件
+"""
+
+import hashlib
+import json
+import os
+
+import input_files
+import json_backend
+
+
+MANIFEST_NAME = '.convert_manifest.json'
+MANIFEST_FORMAT = 1
+
+# 计算哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_sha256(path):
+    """计算文件内容的SHA-256（文件已提前读取时不再读取磁盘）"""
+    data = json_backend.preloaded_bytes(path)
+    if data is not None:
+        return hashlib.sha256(data).hexdigest()
+    digest = hashlib.sha256()
+    with input_files.open_binary(path) as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """输出目录中的增量转换清单"""
+
+    def __init__(self, output_dir, converter_version):
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.converter_version = converter_version
+        self.entries = {}
+        self.load()
+
+    @staticmethod
+    def _key(json_file):
+        return os.path.normcase(os.path.abspath(json_file))
+
+    def load(self):
+        """读取清单，文件不存在或损坏时从空清单开始"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('format') == MANIFEST_FORMAT:
+            self.entries = data.get('files', {})
+
+    def save(self):
+        """原子写入清单（先写临时文件再替换）"""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'format': MANIFEST_FORMAT, 'files': self.entries}, f,
+                      ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def check(self, json_file, output_file=None):
+        """检查输入文件是否需要重新转换
+
+        output_file 不为空时，记录中的输出文件必须与之相同（如输出格式改变时需要重新转换）
+
+        Returns:
+            (是否未变化, 文件指纹)；指纹用于转换成功后调用 record
+        """
+        size, mtime = input_files.file_stat(json_file)
+        fingerprint = {'size': size, 'mtime': mtime}
+        entry = self.entries.get(self._key(json_file))
+
+        reusable = (entry is not None
+                    and entry.get('converter_version') == self.converter_version
+                    and entry.get('size') == size
+                    and os.path.exists(entry.get('output', ''))
+                    and (output_file is None or entry.get('output') == os.path.abspath(output_file)))
+        if reusable and entry.get('mtime') == mtime:
+            # 大小和修改时间都未变化，不需要读取文件内容
+            fingerprint['sha256'] = entry['sha256']
+            return True, fingerprint
+
+        fingerprint['sha256'] = file_sha256(json_file)
+        if reusable and entry.get('sha256') == fingerprint['sha256']:
+            # 仅修改时间变化（如被重新复制）但内容相同，更新记录后跳过
+            entry['mtime'] = mtime
+            return True, fingerprint
+        return False, fingerprint
+
+    def record(self, json_file, fingerprint, output_file):
+        """记录一次成功的转换"""
+        entry = dict(fingerprint)
+        entry['input'] = os.path.abspath(json_file)
+        entry['converter_version'] = self.converter_version
+        entry['output'] = os.path.abspath(output_file)
+        self.entries[self._key(json_file)] = entry
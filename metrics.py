@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转换性能指标
+按文件记录各阶段（读取、解析、提取、写入）的耗时、读取字节数、行数和峰值内存，
+输出JSON或CSV报告，并列出最慢的文件
+"""
+
+import csv
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows没有resource模块
+    resource = None
+
+
+STAGES = ('read', 'parse', 'extract', 'write')
+
+# 每产出多少行报告一次实时进度
+PROGRESS_INTERVAL = 5000
+
+CSV_FIELDS = ['file', 'success', 'bytes_read', 'rows', 'wall_seconds'] + [f'{s}_seconds' for s in STAGES] + [
+    'rows_per_sec', 'peak_rss_mb', 'peak_traced_mb', 'cache_hit']
+
+
+def _reset_peak_rss():
+    """重置进程的峰值内存记录（仅Linux），失败时忽略"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    """进程的峰值常驻内存（MB），无法获取时返回None"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 3)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS单位为字节，Linux为KB
+    return round(maxrss / (1 << 20 if os.uname().sysname == 'Darwin' else 1024), 3)
+
+
+class FileMetrics:
+    """单个文件的转换指标
+
+    各阶段耗时为独占时间：嵌套阶段（如写入时拉取提取的行、提取时流式解析）的耗时
+    不计入外层阶段
+
+    Args:
+        json_file: 输入文件
+        trace_memory: 是否使用tracemalloc记录Python对象的峰值内存（较慢）
+        on_rows: 每产出 PROGRESS_INTERVAL 行调用 on_rows(行数, 已用秒数)
+    """
+
+    def __init__(self, json_file, trace_memory=False, on_rows=None):
+        self.file = json_file
+        self.trace_memory = trace_memory
+        self.on_rows = on_rows
+        self.success = False
+        self.bytes_read = 0
+        self.rows = 0
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.wall_seconds = 0.0
+        self.peak_rss_mb = None
+        self.peak_traced_mb = None
+        # 是否命中提取结果缓存，未使用缓存时为None
+        self.cache_hit = None
+        self._stack = []
+        self._started = None
+        self._tracing = False
+
+    def start(self):
+        _reset_peak_rss()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        self._started = time.perf_counter()
+
+    def finish(self, success=True):
+        self.wall_seconds = time.perf_counter() - self._started
+        self.success = bool(success)
+        self.peak_rss_mb = peak_rss_mb()
+        if self._tracing:
+            self.peak_traced_mb = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 3)
+            tracemalloc.stop()
+            self._tracing = False
+
+    def _enter(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            # 暂停外层阶段
+            outer = self._stack[-1]
+            self.stages[outer[0]] = self.stages.get(outer[0], 0.0) + now - outer[1]
+        self._stack.append([name, now])
+
+    def _exit(self):
+        now = time.perf_counter()
+        name, started = self._stack.pop()
+        self.stages[name] = self.stages.get(name, 0.0) + now - started
+        if self._stack:
+            # 恢复外层阶段
+            self._stack[-1][1] = now
+
+    @contextmanager
+    def stage(self, name):
+        """记录一个阶段的耗时"""
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def timed_iter(self, iterable, name, count_rows=False):
+        """包装迭代器，将每次取值的耗时计入指定阶段；count_rows=True 时统计行数"""
+        iterator = iter(iterable)
+        while True:
+            self._enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._exit()
+            if count_rows:
+                self.add_rows(1)
+            yield item
+
+    def add_rows(self, count):
+        """累加行数，并按间隔报告实时进度"""
+        before = self.rows
+        self.rows += count
+        if self.on_rows and self.rows // PROGRESS_INTERVAL != before // PROGRESS_INTERVAL:
+            self.on_rows(self.rows, time.perf_counter() - self._started)
+
+    def to_dict(self):
+        record = {
+            'file': self.file,
+            'success': self.success,
+            'bytes_read': self.bytes_read,
+            'rows': self.rows,
+            'wall_seconds': round(self.wall_seconds, 6),
+        }
+        for name, seconds in self.stages.items():
+            record[f'{name}_seconds'] = round(seconds, 6)
+        record['rows_per_sec'] = round(self.rows / self.wall_seconds) if self.wall_seconds else None
+        record['peak_rss_mb'] = self.peak_rss_mb
+        record['peak_traced_mb'] = self.peak_traced_mb
+        record['cache_hit'] = self.cache_hit
+        return record
+
+
+def run_with_metrics(func, json_file, *args, trace_memory=False, on_rows=None, **kwargs):
+    """调用 func(json_file, *args, metrics=..., **kwargs)，返回 (结果, 指标字典)
+
+    为模块级函数，可以提交到进程池
+    """
+    metrics = FileMetrics(json_file, trace_memory, on_rows)
+    metrics.start()
+    try:
+        result = func(json_file, *args, metrics=metrics, **kwargs)
+    finally:
+        metrics.finish(False)
+    metrics.success = bool(result[0] if isinstance(result, tuple) else result)
+    return result, metrics.to_dict()
+
+
+def iter_with_progress(rows, on_rows):
+    """逐个产出 rows，每 PROGRESS_INTERVAL 行调用 on_rows(行数, 已用秒数)；不记录指标时用于显示进度"""
+    started = time.perf_counter()
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % PROGRESS_INTERVAL == 0:
+            on_rows(count, time.perf_counter() - started)
+
+
+def slowest(records, count=5):
+    """按总耗时排序的最慢文件"""
+    return sorted(records, key=lambda r: r['wall_seconds'], reverse=True)[:count]
+
+
+def bottleneck(record):
+    """耗时最长的阶段"""
+    return max(STAGES, key=lambda s: record.get(f'{s}_seconds') or 0)
+
+
+def summary_lines(records, count=5):
+    """最慢文件的摘要文本"""
+    lines = []
+    for record in slowest(records, count):
+        stages = ', '.join(f"{s} {record[f'{s}_seconds']:.2f}s" for s in STAGES)
+        lines.append(f"{os.path.basename(record['file'])}: {record['wall_seconds']:.2f}s "
+                     f"({record['rows']}条, {stages}; 瓶颈: {bottleneck(record)})")
+    return lines
+
+
+def write_report(records, filename):
+    """保存指标报告，按扩展名选择CSV或JSON"""
+    if filename.lower().endswith('.csv'):
+        with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+        return
+
+    totals = {'files': len(records), 'rows': sum(r['rows'] for r in records),
+              'bytes_read': sum(r['bytes_read'] for r in records)}
+    for name in STAGES:
+        totals[f'{name}_seconds'] = round(sum(r[f'{name}_seconds'] for r in records), 6)
+    report = {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'totals': totals,
+        'slowest': [r['file'] for r in slowest(records)],
+        'files': records,
+    }
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
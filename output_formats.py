@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输出格式
+除Excel外支持CSV、JSONL（流式写入）和Parquet（需要安装pyarrow）；
+所有格式都先写入临时文件，完成后再替换为目标文件
+"""
+
+import csv
+import importlib.util
+import json
+import os
+from contextlib import contextmanager
+
+import excel_writer
+from columnar import ColumnarTable
+from splitting import part_path
+
+
+FORMATS = ('xlsx', 'csv', 'jsonl', 'parquet')
+
+# 文件扩展名
+EXTENSIONS = {
+    'xlsx': '.xlsx',
+    'csv': '.csv',
+    'jsonl': '.jsonl',
+    'parquet': '.parquet',
+}
+
+# Parquet每个行组的行数
+PARQUET_BATCH_SIZE = 50000
+
+
+def parquet_available():
+    """是否安装了pyarrow（pyarrow为可选依赖，导入较慢，写入Parquet时才导入）"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def format_from_filename(filename, default='xlsx'):
+    """根据文件扩展名判断输出格式"""
+    lower = filename.lower()
+    for fmt, ext in EXTENSIONS.items():
+        if lower.endswith(ext):
+            return fmt
+    return default
+
+
+def check_format(fmt):
+    """检查输出格式是否可用，不可用时抛出ValueError"""
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的输出格式: {fmt}")
+    if fmt == 'parquet' and not parquet_available():
+        raise ValueError("输出Parquet需要安装pyarrow: pip install pyarrow")
+
+
+def temporary_path(filename):
+    """写入 filename 时使用的临时文件：同一目录下以 . 开头的隐藏文件，保留扩展名"""
+    directory, name = os.path.split(filename)
+    base, ext = os.path.splitext(name)
+    return os.path.join(directory, f'.{base}.tmp{ext}')
+
+
+@contextmanager
+def atomic_output(filename):
+    """产出临时文件路径，写入成功后同步到磁盘并原子替换为 filename
+
+    出错（包括被取消）时删除临时文件，目标文件保持原样，不会出现写了一半的输出文件
+    """
+    tmp_path = temporary_path(filename)
+    try:
+        yield tmp_path
+        with open(tmp_path, 'r+b') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_csv(value_rows, filename, columns, splitter=None):
+    """流式写入CSV（UTF-8 BOM，Excel可直接打开中文），返回行数
+
+    splitter 为 splitting.RowSplitter 时只写入其中的一个部分
+    """
+    count = 0
+    with open(filename, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        if splitter is not None:
+            value_rows = splitter.part(f.tell)
+        for values in value_rows:
+            writer.writerow(['' if value is None else value for value in values])
+            count += 1
+    return count
+
+
+def write_jsonl(value_rows, filename, columns, splitter=None):
+    """流式写入JSON Lines，每行一个对象，键顺序与列顺序一致，返回行数（splitter 见 write_csv）"""
+    count = 0
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    with open(filename, 'w', encoding='utf-8') as f:
+        if splitter is not None:
+            value_rows = splitter.part(f.tell)
+        for values in value_rows:
+            f.write(dumps(dict(zip(columns, values))))
+            f.write('\n')
+            count += 1
+    return count
+
+
+def write_parquet(value_rows, filename, columns, splitter=None, batch_size=PARQUET_BATCH_SIZE):
+    """分批写入Parquet，返回行数（splitter 见 write_csv，大小按已写入磁盘的行组计算）
+
+    源数据中同一列可能混合数字和字符串（如campus_id），因此所有列统一保存为字符串；
+    所有列使用字典编码，每个行组中重复的症状、诊断文本等只保存一次
+    """
+    check_format('parquet')
+    import pyarrow
+    import pyarrow.parquet
+
+    schema = pyarrow.schema([(col, pyarrow.string()) for col in columns])
+    count = 0
+    with pyarrow.parquet.ParquetWriter(filename, schema, use_dictionary=True) as writer:
+        if splitter is not None:
+            value_rows = splitter.part(lambda: os.path.getsize(filename))
+        batch = [[] for _ in columns]
+        for values in value_rows:
+            for column, value in zip(batch, values):
+                column.append(None if value is None else str(value))
+            count += 1
+            if count % batch_size == 0:
+                writer.write_table(pyarrow.table(batch, schema=schema))
+                batch = [[] for _ in columns]
+        if batch[0] or count == 0:
+            writer.write_table(pyarrow.table(batch, schema=schema))
+    return count
+
+
+def write_values(value_rows, filename, columns, fmt, fixed_widths=None, width_sample=None, split=None):
+    """按格式写入值元组形式的行数据，返回行数
+
+    split 为 splitting.SplitLimit 时按行数或大小分割：xlsx默认分割为多个工作表，
+    其他格式或 split.mode 为 'files' 时分割为 filename、name_2.ext ... 多个文件；
+    xlsx即使不指定 split，超过Excel的行数上限时也会分割为多个工作表
+    """
+    check_format(fmt)
+    if fmt == 'xlsx':
+        return _write_xlsx(value_rows, filename, columns, fixed_widths, width_sample, split)
+    writer = {'csv': write_csv, 'jsonl': write_jsonl, 'parquet': write_parquet}[fmt]
+    if split is None:
+        with atomic_output(filename) as tmp_path:
+            return writer(value_rows, tmp_path, columns)
+
+    splitter = split.split(value_rows)
+    count = 0
+    part = 1
+    while True:
+        with atomic_output(part_path(filename, part)) as tmp_path:
+            count += writer(None, tmp_path, columns, splitter)
+        if not splitter.has_more():
+            return count
+        part += 1
+
+
+def _write_xlsx(value_rows, filename, columns, fixed_widths=None, width_sample=None, split=None, tracker=None):
+    if split is not None and split.mode == 'files':
+        return excel_writer.write_files(value_rows, lambda part: atomic_output(part_path(filename, part)),
+                                        columns, fixed_widths, width_sample=width_sample, tracker=tracker,
+                                        limit=split)
+    with atomic_output(filename) as tmp_path:
+        return excel_writer.write_values(value_rows, tmp_path, columns, fixed_widths, width_sample=width_sample,
+                                         tracker=tracker, limit=split)
+
+
+def write_rows(rows, filename, columns, fmt='xlsx', fixed_widths=None, width_sample=None, split=None):
+    """按格式写入行数据，返回行数
+
+    rows 可以是行字典的可迭代对象或列式数据表（ColumnarTable）；split 见 write_values
+    """
+    if isinstance(rows, ColumnarTable):
+        if fmt == 'xlsx':
+            # 数据已在内存中，列宽直接按列测量，不需要暂存
+            tracker = excel_writer.measure_table(rows, columns, width_sample)
+            return _write_xlsx(rows.iter_tuples(columns), filename, columns, fixed_widths, split=split,
+                               tracker=tracker)
+        value_rows = rows.iter_tuples(columns)
+    else:
+        value_rows = (tuple(row.get(col) for col in columns) for row in rows)
+    return write_values(value_rows, filename, columns, fmt, fixed_widths, width_sample, split)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批处理流水线
+串行处理多个文件时，读取线程按顺序提前读取后面的文件，当前线程解析、提取并写出当前文件，
+两个阶段通过有界队列连接：预读的文件达到上限时读取线程等待，内存占用有上限。
+网络文件系统上读取文件与转换耗时相当，重叠后总耗时接近减半
+"""
+
+import queue
+import threading
+
+import input_files
+import json_backend
+
+
+# 默认最多提前读取的文件数
+DEFAULT_PREFETCH = 2
+
+# 流式解析时按块读取，只预热系统缓存，不保存内容
+WARM_CHUNK_SIZE = 1 << 20
+
+# 放入队列时检查停止请求的间隔（秒）
+_PUT_TIMEOUT = 0.1
+
+_END = object()
+
+
+def _read(json_file, stream):
+    """读取文件内容；流式解析时只读取一遍（使之进入系统缓存）并返回None，归档成员不预读"""
+    if stream:
+        if input_files.split_member(json_file)[1] is not None:
+            return None
+        with open(json_file, 'rb') as f:
+            while f.read(WARM_CHUNK_SIZE):
+                pass
+        return None
+    return json_backend.read_bytes(json_file)
+
+
+def _put(items, item, stop):
+    """放入队列，队列已满时等待；停止后返回False"""
+    while not stop.is_set():
+        try:
+            items.put(item, timeout=_PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _reader(json_files, stream, items, stop):
+    # 只读取文件，转换阶段解析时仍可暂停垃圾回收（见 json_backend._gc_paused）
+    with json_backend.io_thread():
+        try:
+            for json_file in json_files:
+                if stop.is_set():
+                    return
+                try:
+                    data = _read(json_file, stream)
+                except Exception:
+                    # 读取或解压错误（如不完整的.gz文件抛出EOFError）只影响该文件：
+                    # 不预读其内容，由转换阶段重新读取时报告，后面的文件照常处理
+                    data = None
+                if not _put(items, (json_file, data), stop):
+                    return
+        finally:
+            _put(items, _END, stop)
+
+
+def iter_prefetched(json_files, prefetch=DEFAULT_PREFETCH, stream=False):
+    """按顺序产出 (文件, 已读取的内容)，后台线程最多提前读取 prefetch 个文件
+
+    内容在流式解析、读取出错或 prefetch 为0时为None；调用方停止迭代后读取线程在读完当前文件后退出
+    """
+    if prefetch <= 0:
+        for json_file in json_files:
+            yield json_file, None
+        return
+
+    items = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    thread = threading.Thread(target=_reader, args=(json_files, stream, items, stop), daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END:
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def iter_pipelined(json_files, convert, prefetch=DEFAULT_PREFETCH, stream=False):
+    """流水线处理多个文件，按顺序产出 (文件, convert(文件) 的返回值)
+
+    convert 中读取该文件时直接使用预读的内容（见 json_backend.preloaded）
+    """
+    for json_file, data in iter_prefetched(json_files, prefetch, stream):
+        with json_backend.preloaded(json_file, data):
+            result = convert(json_file)
+        del data
+        yield json_file, result
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提取时的筛选条件
+按院区、科室名称、hospital_id和URL参数筛选，在提取的院区/科室循环中直接跳过不符合条件的
+院区和科室，不为其创建行；hospital_id按文件名判断，不符合条件的文件不需要打开
+"""
+
+import re
+
+from extraction import extract_hospital_id
+from extraction_plan import compile_plan
+
+
+def split_values(values):
+    """合并多次指定、逗号分隔的取值，如 ['1,2', '3'] → ['1', '2', '3']（也可以是单个字符串）"""
+    if isinstance(values, str):
+        values = [values]
+    result = []
+    for value in values or []:
+        result.extend(part.strip() for part in str(value).split(',') if part.strip())
+    return result
+
+
+class RowFilter:
+    """筛选条件，各条件之间为"且"的关系，未指定的条件不筛选
+
+    campuses: 院区ID列表；title_regex: 科室名称的正则表达式（部分匹配）；
+    hospitals: hospital_id列表；has_params: 科室必须提供非空值的URL参数名列表
+    （取值方式与 url_params_json 相同，如 departId 对应63格式的 department_id）
+    """
+
+    def __init__(self, campuses=None, title_regex=None, hospitals=None, has_params=None):
+        self.campuses = frozenset(split_values(campuses)) or None
+        self.hospitals = frozenset(split_values(hospitals)) or None
+        self.has_params = tuple(dict.fromkeys(split_values(has_params)))
+        self.title_regex = title_regex or None
+        try:
+            self._title_re = re.compile(title_regex) if title_regex else None
+        except re.error as e:
+            raise ValueError(f"科室名称的正则表达式无效: {title_regex} ({e})") from None
+        self._param_plan = compile_plan(self.has_params) if self.has_params else None
+
+    def __bool__(self):
+        return bool(self.campuses or self.hospitals or self._title_re or self._param_plan)
+
+    @property
+    def filters_departments(self):
+        """是否需要逐个检查科室（按名称或参数筛选）"""
+        return self._title_re is not None or self._param_plan is not None
+
+    def accepts_hospital(self, hospital_id):
+        return self.hospitals is None or str(hospital_id or '') in self.hospitals
+
+    def accepts_file(self, json_file):
+        """按文件名中的hospital_id判断，不需要打开文件"""
+        if self.hospitals is None:
+            return True
+        return self.accepts_hospital(extract_hospital_id(json_file))
+
+    def select_files(self, json_files):
+        """保留hospital_id符合条件的文件"""
+        return [json_file for json_file in json_files if self.accepts_file(json_file)]
+
+    def accepts_campus(self, campus_id):
+        return self.campuses is None or str(campus_id) in self.campuses
+
+    def accepts_department(self, dept_item):
+        if self._title_re is not None and not self._title_re.search(str(dept_item.get('title', ''))):
+            return False
+        return self._param_plan is None or self._param_plan.resolves(dept_item)
+
+    def options(self):
+        """影响提取结果的条件（用于缓存键、任务标识和增量清单）"""
+        return {'campuses': sorted(self.campuses or ()), 'title_regex': self.title_regex,
+                'hospitals': sorted(self.hospitals or ()), 'has_params': list(self.has_params)}
+
+    def describe(self):
+        """简短的说明，如 院区=1,2 科室名称~内科"""
+        parts = []
+        if self.campuses:
+            parts.append('院区=' + ','.join(sorted(self.campuses)))
+        if self.title_regex:
+            parts.append('科室名称~' + self.title_regex)
+        if self.hospitals:
+            parts.append('hospital_id=' + ','.join(sorted(self.hospitals)))
+        if self.has_params:
+            parts.append('参数=' + ','.join(self.has_params))
+        return ' '.join(parts)
+
+    def __repr__(self):
+        return f'RowFilter({self.describe()})'
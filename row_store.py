@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+磁盘行存储
+将提取的行写入SQLite临时数据库（连接关闭时自动删除），按需分页读取，
+排序和筛选以查询方式执行，不在内存中保留全部行
+"""
+
+import itertools
+import os
+import sqlite3
+
+from columnar import ColumnarTable
+
+
+# 每批插入的行数
+INSERT_BATCH_SIZE = 10000
+
+
+def _quote(name):
+    """SQL标识符"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _like_pattern(text):
+    """包含匹配的LIKE模式，转义 % _ 和 \\"""
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+class RowStore:
+    """基于SQLite临时数据库的行存储，也可作为 engine.convert 的输出目标
+
+    Args:
+        columns: 列顺序
+        path: 数据库文件；默认为空字符串，即SQLite私有临时数据库（数据量大时写入磁盘，关闭时删除）
+    """
+
+    def __init__(self, columns, path=''):
+        self.columns = list(columns)
+        # GUI在后台线程写入或导出、主线程翻页读取；后台线程读取时调用方不能同时修改视图（set_view）
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=OFF')
+        self.conn.execute('PRAGMA synchronous=OFF')
+        column_defs = ', '.join(_quote(col) for col in self.columns)
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS rows (id INTEGER PRIMARY KEY, {column_defs})')
+        self._count = self.conn.execute('SELECT COUNT(*) FROM rows').fetchone()[0]
+        self._materialized = False
+        self._view_count = self._count
+        self._owned_path = None
+
+    @classmethod
+    def open(cls, columns, path):
+        """打开其他进程写入的数据库文件，关闭时删除该文件"""
+        store = cls(columns, path)
+        store._owned_path = path
+        return store
+
+    def __len__(self):
+        return self._count
+
+    def write(self, rows, columns=None):
+        """追加行（行字典的可迭代对象或列式数据表），返回总行数"""
+        if isinstance(rows, ColumnarTable):
+            value_rows = rows.iter_tuples(self.columns)
+        else:
+            value_rows = (tuple(row.get(col) for col in self.columns) for row in rows)
+        placeholders = ', '.join('?' * len(self.columns))
+        column_list = ', '.join(_quote(col) for col in self.columns)
+        sql = f'INSERT INTO rows ({column_list}) VALUES ({placeholders})'
+        with self.conn:
+            while True:
+                batch = list(itertools.islice(value_rows, INSERT_BATCH_SIZE))
+                if not batch:
+                    break
+                self.conn.executemany(sql, batch)
+                self._count += len(batch)
+        self.set_view()
+        return self._count
+
+    def set_view(self, sort_column=None, descending=False, filter_column=None, filter_text=''):
+        """设置排序和筛选条件，返回符合条件的行数
+
+        filter_column 为空时在所有列中查找 filter_text（包含匹配，ASCII字母不区分大小写）；
+        有排序或筛选条件时，将符合条件的行号按顺序写入临时表，之后每次翻页只按位置读取
+        """
+        if sort_column is not None and sort_column not in self.columns:
+            raise ValueError(f"未知的列: {sort_column}")
+        if filter_column is not None and filter_column not in self.columns:
+            raise ValueError(f"未知的列: {filter_column}")
+
+        self.conn.execute('DROP TABLE IF EXISTS temp.view')
+        if not sort_column and not filter_text:
+            self._materialized = False
+            self._view_count = self._count
+            return self._view_count
+
+        where = ''
+        params = []
+        if filter_text:
+            targets = [filter_column] if filter_column else self.columns
+            where = 'WHERE ' + ' OR '.join(f"{_quote(col)} LIKE ? ESCAPE '\\'" for col in targets)
+            params = [_like_pattern(filter_text)] * len(targets)
+        order = 'ORDER BY id'
+        if sort_column:
+            order = f'ORDER BY {_quote(sort_column)} {"DESC" if descending else "ASC"}, id'
+
+        with self.conn:
+            self.conn.execute('CREATE TEMP TABLE view (pos INTEGER PRIMARY KEY, row_id INTEGER)')
+            self.conn.execute(f'INSERT INTO view (row_id) SELECT id FROM rows {where} {order}', params)
+        self._materialized = True
+        self._view_count = self.conn.execute('SELECT COUNT(*) FROM view').fetchone()[0]
+        return self._view_count
+
+    def count(self):
+        """当前筛选条件下的行数"""
+        return self._view_count
+
+    def fetch(self, offset, limit):
+        """按当前排序和筛选条件读取从 offset 开始的 limit 行，返回值元组列表"""
+        column_list = ', '.join('rows.' + _quote(col) for col in self.columns)
+        offset = max(offset, 0)
+        if self._materialized:
+            sql = (f'SELECT {column_list} FROM view JOIN rows ON rows.id = view.row_id '
+                   f'WHERE view.pos > ? ORDER BY view.pos LIMIT ?')
+        else:
+            # 行号从1开始连续分配
+            sql = f'SELECT {column_list} FROM rows WHERE id > ? ORDER BY id LIMIT ?'
+        return self.conn.execute(sql, (offset, limit)).fetchall()
+
+    def iter_dicts(self, columns=None):
+        """按插入顺序逐行产出全部行字典（不受排序和筛选条件影响）"""
+        columns = columns or self.columns
+        column_list = ', '.join(_quote(col) for col in columns)
+        for values in self.conn.execute(f'SELECT {column_list} FROM rows ORDER BY id'):
+            yield dict(zip(columns, values))
+
+    def close(self):
+        self.conn.close()
+        if self._owned_path:
+            os.remove(self._owned_path)
+            self._owned_path = None
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输出分割
+写入过程中达到行数或大小阈值时切换到下一个工作表（科室数据_2、科室数据_3 ...）或下一个文件，
+每个部分都重复表头、使用相同的列，超大的导出一次写完，不会在最后才因超出Excel行数上限而失败
+"""
+
+import os
+import re
+
+
+# Excel工作表的最大行数（含表头）
+EXCEL_MAX_ROWS = 1048576
+# 每个工作表最多的数据行数
+EXCEL_MAX_DATA_ROWS = EXCEL_MAX_ROWS - 1
+
+# 工作表名称最长31个字符
+MAX_SHEET_NAME = 31
+
+# 分割方式: sheets=同一文件中的多个工作表（仅xlsx）, files=多个文件
+SPLIT_MODES = ('sheets', 'files')
+
+# 每写入多少行检查一次大小
+SIZE_CHECK_ROWS = 1000
+
+_SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+
+_END = object()
+
+
+def parse_size(text):
+    """解析大小，如 '500000'、'200M'、'1.5G'（单位为1024进制）"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*', str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"无效的大小: {text}")
+    size = int(float(match.group(1)) * _SIZE_UNITS[match.group(2).lower()])
+    if size <= 0:
+        raise ValueError(f"无效的大小: {text}")
+    return size
+
+
+class SplitLimit:
+    """分割阈值：每个部分最多 max_rows 行数据、大约 max_bytes 字节
+
+    mode 为 'files' 时分割为多个文件，'sheets' 时分割为同一xlsx文件中的多个工作表
+    （其他格式总是分割为文件）；大小每 SIZE_CHECK_ROWS 行检查一次，实际大小可能略超过阈值
+    """
+
+    def __init__(self, max_rows=None, max_bytes=None, mode='sheets'):
+        if mode not in SPLIT_MODES:
+            raise ValueError(f"不支持的分割方式: {mode}")
+        if max_rows is not None and max_rows <= 0:
+            raise ValueError("分割行数必须大于0")
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.mode = mode
+
+    def describe(self):
+        """阈值的文字描述（记录在增量清单的转换器版本中）"""
+        return f"split rows={self.max_rows} bytes={self.max_bytes} to={self.mode}"
+
+    def for_sheet(self):
+        """单个工作表的阈值：不超过Excel的行数上限"""
+        max_rows = EXCEL_MAX_DATA_ROWS if self.max_rows is None else min(self.max_rows, EXCEL_MAX_DATA_ROWS)
+        return SplitLimit(max_rows, self.max_bytes, self.mode)
+
+    def split(self, value_rows):
+        """按该阈值分割行迭代器"""
+        return RowSplitter(value_rows, self)
+
+
+class RowSplitter:
+    """把一个行迭代器依次分成多个部分，每个部分用 part() 取出"""
+
+    def __init__(self, value_rows, limit):
+        self.rows = iter(value_rows)
+        self.limit = limit
+        self._peeked = _END
+
+    def has_more(self):
+        """是否还有未写入的行"""
+        if self._peeked is _END:
+            self._peeked = next(self.rows, _END)
+        return self._peeked is not _END
+
+    def part(self, size=None):
+        """产出一个部分的行，达到阈值后停止，之后的行留给下一个部分
+
+        size 为返回当前部分已写入字节数的函数，为空时只按行数分割
+        """
+        max_rows = self.limit.max_rows
+        max_bytes = self.limit.max_bytes
+        check_size = max_bytes is not None and size is not None
+        count = 0
+        while max_rows is None or count < max_rows:
+            if check_size and count and count % SIZE_CHECK_ROWS == 0 and size() >= max_bytes:
+                return
+            if self._peeked is not _END:
+                values, self._peeked = self._peeked, _END
+            else:
+                values = next(self.rows, _END)
+                if values is _END:
+                    return
+            yield values
+            count += 1
+
+
+def sheet_name(base, part, used_names=()):
+    """第 part 个工作表的名称：第1个为 base，之后为 base_2、base_3 ...，不与 used_names 重复"""
+    if part == 1:
+        return base
+    used = {name.lower() for name in used_names}
+    while True:
+        tail = f'_{part}'
+        name = base[:MAX_SHEET_NAME - len(tail)] + tail
+        if name.lower() not in used:
+            return name
+        part += 1
+
+
+def part_path(filename, part):
+    """第 part 个文件的路径：第1个为 filename，之后为 name_2.ext、name_3.ext ..."""
+    if part == 1:
+        return filename
+    base, ext = os.path.splitext(filename)
+    return f'{base}_{part}{ext}'
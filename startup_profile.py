@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时分析
+命令行的 --profile-startup 报告解释器启动、模块导入、准备和转换各占多少时间，
+以及加载了哪些导入较慢的依赖；本模块需要在其他模块之前导入，以便记录导入开始的时间
+"""
+
+import sys
+import time
+
+
+# 导入本模块时进程已消耗的CPU时间（近似为解释器启动的耗时）
+INTERPRETER_SECONDS = time.process_time()
+IMPORT_STARTED = time.perf_counter()
+
+# 导入较慢或可选的依赖
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl', 'pyarrow', 'tkinter', 'orjson', 'simdjson', 'zstandard')
+
+
+def loaded_modules():
+    """已导入的 HEAVY_MODULES"""
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+class StartupProfile:
+    """记录各阶段的耗时；创建时记录模块导入完成（在主函数开头创建）"""
+
+    def __init__(self):
+        self._last = time.perf_counter()
+        self.stages = [('解释器启动(CPU)', INTERPRETER_SECONDS), ('模块导入', self._last - IMPORT_STARTED)]
+        self.imported_at_startup = loaded_modules()
+
+    def mark(self, stage):
+        """记录从上一个阶段结束到现在的耗时"""
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    def report_lines(self):
+        lines = [f"  {stage}: {seconds * 1000:.0f}ms" for stage, seconds in self.stages]
+        lines.append(f"  启动时已导入: {', '.join(self.imported_at_startup) or '无'}")
+        lazy = [name for name in loaded_modules() if name not in self.imported_at_startup]
+        lines.append(f"  运行时按需导入: {', '.join(lazy) or '无'}")
+        lines.append("  每个模块的导入耗时: python -X importtime batch_converter.py ...")
+        return lines
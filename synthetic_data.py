@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生成模拟的科室分诊JSON数据
+支持63格式（空字符串key，科室对象中直接包含 department_id/position）和
+193格式（'data' key，参数在 params 对象中），用于基准测试和大文件测试
+"""
+
+import argparse
+import json
+import random
+
+
+STYLES = ('63', '193')
+
+_SYMPTOMS = ['呼吸困难', '胸痛', '发热', '咳嗽咳痰', '头晕头痛', '腹痛腹泻', '关节疼痛', '皮疹瘙痒',
+             '心悸', '视力模糊', '耳鸣', '失眠多梦']
+_DIAGNOSES = ['慢性阻塞性肺疾病', '冠心病', '上呼吸道感染', '支气管炎', '高血压', '胃肠炎', '类风湿关节炎',
+              '湿疹', '心律失常', '白内障', '神经性耳鸣', '焦虑症']
+_DEPARTMENTS = ['呼吸内科', '心内科', '感染科', '消化内科', '风湿免疫科', '皮肤科', '眼科', '耳鼻喉科',
+                '神经内科', '慢阻肺门诊', 'PICC门诊', '全科医学科']
+_AREAS = ['北城院区', '南城院区', '东院区', '西院区', '本部']
+
+
+def extra_param_names(params_width):
+    """附加的URL参数名"""
+    return [f'p{i}' for i in range(1, params_width + 1)]
+
+
+def build_baseurl(style, params_width=0):
+    """生成baseurl条目，参数个数随 params_width 增加"""
+    extras = ''.join(f'&{name}={{{name}}}' for name in extra_param_names(params_width))
+    if style == '63':
+        url = 'https://hospital.example.com/register?departId={departId}&departName={title}' + extras
+        return [{'url_pattern': url}]
+    url = 'https://hospital.example.com/h5/dept?areaId={areaId}&areaName={areaName}&departId={departId}' + extras
+    return [{'url': url}]
+
+
+def generate(style='63', departments=100, campuses=2, items_per_campus=5, params_width=0, seed=0):
+    """生成一个分诊JSON对象
+
+    Args:
+        style: '63' 或 '193'
+        departments: 症状分组（departments数组）数量
+        campuses: 每个分组的院区数量
+        items_per_campus: 每个院区的科室数量
+        params_width: baseurl中附加的URL参数个数
+        seed: 随机种子，相同参数生成的数据相同
+
+    行数为 departments * campuses * items_per_campus
+    """
+    if style not in STYLES:
+        raise ValueError(f"不支持的格式: {style}")
+    rng = random.Random(seed)
+    extras = extra_param_names(params_width)
+    list_key = '' if style == '63' else 'data'
+
+    result = []
+    for i in range(departments):
+        symptom = '，'.join(rng.sample(_SYMPTOMS, rng.randint(1, 4)))
+        diagnosis = '、'.join(rng.sample(_DIAGNOSES, rng.randint(1, 3)))
+        campus_list = []
+        for campus_id in range(1, campuses + 1):
+            department_list = []
+            for j in range(items_per_campus):
+                title = rng.choice(_DEPARTMENTS)
+                depart_id = str(1000 + (i * items_per_campus + j) % 9000)
+                extra_values = {name: f'{name}_{rng.randint(0, 999)}' for name in extras}
+                if style == '63':
+                    item = {'title': title, 'department_id': depart_id,
+                            'position': f'门诊楼{rng.randint(1, 9)}楼{rng.randint(1, 30)}诊室'}
+                    item.update(extra_values)
+                else:
+                    params = {'areaId': str(campus_id), 'areaName': _AREAS[(campus_id - 1) % len(_AREAS)],
+                              'departId': depart_id}
+                    params.update(extra_values)
+                    item = {'title': title, 'params': params}
+                department_list.append(item)
+            campus_list.append({'campus_id': campus_id, 'department_list': department_list})
+        result.append({'title': rng.choice(_DEPARTMENTS), 'symptom_text': symptom,
+                       'diagnosis_text': diagnosis, list_key: campus_list})
+
+    return {'baseurl': build_baseurl(style, params_width), 'departments': result}
+
+
+def write_file(filename, style='63', departments=100, campuses=2, items_per_campus=5, params_width=0,
+               seed=0):
+    """生成数据并保存为JSON文件，返回行数"""
+    data = generate(style, departments, campuses, items_per_campus, params_width, seed)
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    return departments * campuses * items_per_campus
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成模拟的科室分诊JSON文件')
+    parser.add_argument('output', help='输出文件，如 63_triage.json')
+    parser.add_argument('--style', choices=STYLES, default='63', help='JSON格式 (默认: 63)')
+    parser.add_argument('--departments', type=int, default=1000, help='症状分组数量 (默认: 1000)')
+    parser.add_argument('--campuses', type=int, default=2, help='每个分组的院区数量 (默认: 2)')
+    parser.add_argument('--items', type=int, default=5, help='每个院区的科室数量 (默认: 5)')
+    parser.add_argument('--params-width', type=int, default=0, help='附加的URL参数个数 (默认: 0)')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子 (默认: 0)')
+    args = parser.parse_args()
+
+    rows = write_file(args.output, args.style, args.departments, args.campuses, args.items,
+                      args.params_width, args.seed)
+    print(f"✅ 已生成: {args.output} ({rows}条记录)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试合并重复科室
+"""
+
+import json
+
+import batch_converter
+import engine
+import extraction
+from extract_cache import ExtractCache
+from extraction import AGGREGATE_SEPARATOR, department_key
+from row_filter import RowFilter
+from synthetic_data import generate
+
+
+def write_file(filename, style, **options):
+    """生成测试数据，科室ID由科室名称决定（同一院区内同名科室在不同症状下重复出现）"""
+    data = generate(style, **options)
+    for dept in data['departments']:
+        for campus in dept['' if style == '63' else 'data']:
+            for item in campus['department_list']:
+                department_id = str(sum(map(ord, item['title'])))
+                if style == '63':
+                    item['department_id'] = department_id
+                else:
+                    item['params']['departId'] = department_id
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def _reference(rows):
+    """全部提取后按 (院区, 科室ID) 分组合并的结果"""
+    groups = {}
+    for row in rows:
+        key = (str(row['campus_id']), str(row['department_id']))
+        if key not in groups:
+            groups[key] = (dict(row), [], [])
+        _, symptoms, diagnoses = groups[key]
+        for texts, text in ((symptoms, row['symptom_text']), (diagnoses, row['diagnosis_text'])):
+            if text not in texts:
+                texts.append(text)
+    result = []
+    for row, symptoms, diagnoses in groups.values():
+        row['symptom_text'] = AGGREGATE_SEPARATOR.join(symptoms)
+        row['diagnosis_text'] = AGGREGATE_SEPARATOR.join(diagnoses)
+        result.append(row)
+    return result
+
+
+def test_same_as_grouping_afterwards(tmp_path):
+    """逐行、列式、流式提取的合并结果与提取后再分组一致"""
+    json_file = str(tmp_path / '5_triage.json')
+    write_file(json_file, '193', departments=200, campuses=2, items_per_campus=4, seed=1)
+    everything = list(engine.iter_rows(json_file, engine.CLI_COLUMNS))
+    expected = _reference(everything)
+    assert len(expected) < len(everything) / 10
+    for stream in (False, True):
+        assert list(engine.iter_rows(json_file, engine.CLI_COLUMNS, stream, aggregate=True)) == expected
+        table = engine.extract_table(json_file, engine.CLI_COLUMNS, stream, aggregate=True)
+        assert list(table.iter_dicts(engine.CLI_COLUMNS)) == expected
+
+
+def test_key_and_unique_rows_unchanged():
+    data = {'departments': [
+        {'symptom_text': '发热', 'diagnosis_text': '感冒', '': [{'campus_id': 1, 'department_list': [
+            {'title': '内科', 'department_id': 7}, {'title': '外科'}, {'title': '儿科', 'department_id': ''}]}]},
+        {'symptom_text': '咳嗽', 'diagnosis_text': '感冒', '': [{'campus_id': 1, 'department_list': [
+            {'title': '内科', 'department_id': '7'}, {'title': '外科'}]}]},
+        {'symptom_text': '咳嗽', 'diagnosis_text': None, '': [{'campus_id': 2, 'department_list': [
+            {'title': '内科', 'department_id': 7}]}]},
+    ]}
+    rows = list(engine.iter_rows(data, engine.CLI_COLUMNS, hospital_id='1', aggregate=True))
+    assert [(row['campus_id'], row['department_title'], row['symptom_text'], row['diagnosis_text'])
+            for row in rows] == [(1, '内科', '发热；咳嗽', '感冒'), (1, '外科', '发热；咳嗽', '感冒'),
+                                 (1, '儿科', '发热', '感冒'), (2, '内科', '咳嗽', None)]
+    assert department_key(1, {'department_id': 7}) == department_key('1', {'params': {'departId': '7'}})
+    assert department_key(1, {'title': '7'}) != department_key(1, {'department_id': '7'})
+
+
+def test_bounded_index_and_texts(tmp_path, monkeypatch):
+    json_file = str(tmp_path / '5_triage.json')
+    write_file(json_file, '63', departments=100, campuses=1, items_per_campus=3, seed=2)
+    full = list(engine.iter_rows(json_file, engine.CLI_COLUMNS, aggregate=True))
+    # aggregate 为整数时指定索引上限（--aggregate-max-keys）
+    limited = list(engine.iter_rows(json_file, engine.CLI_COLUMNS, aggregate=10))
+    assert list(engine.extract_table(json_file, engine.CLI_COLUMNS, aggregate=10).iter_dicts(engine.CLI_COLUMNS)) == limited
+
+    # 索引已满时先输出，全部科室仍然都有输出
+    monkeypatch.setattr(extraction, 'AGGREGATE_MAX_KEYS', 10)
+    partial = list(engine.iter_rows(json_file, engine.CLI_COLUMNS, aggregate=True))
+    assert len(partial) > len(full)
+    assert {row['department_id'] for row in partial} == {row['department_id'] for row in full}
+    assert partial == limited
+    # 上限不同时输出不同，增量清单中分别记录
+    assert len({batch_converter.manifest_version(aggregate=aggregate) for aggregate in (False, True, 10)}) == 3
+
+    monkeypatch.setattr(extraction, 'AGGREGATE_MAX_TEXTS', 2)
+    rows = list(engine.iter_rows(json_file, engine.CLI_COLUMNS, aggregate=True))
+    assert max(row['symptom_text'].count(AGGREGATE_SEPARATOR) for row in rows) == 1
+
+    # 合并后的文本超过单元格长度上限时在完整的文本处截断
+    monkeypatch.setattr(extraction, 'AGGREGATE_MAX_CHARS', 12)
+    assert extraction._join_texts(['发热咳嗽', '头痛', '腹痛腹泻', '乏力']) == '发热咳嗽；头痛；腹痛腹泻'
+    assert extraction._join_texts(['发热咳嗽' * 5, '头痛']) == ('发热咳嗽' * 5)[:12]
+    assert extraction._join_texts(['发热咳嗽' * 5]) == '发热咳嗽' * 5
+
+
+def test_cached_separately_and_combined_with_filter(tmp_path):
+    json_file = str(tmp_path / '5_triage.json')
+    write_file(json_file, '193', departments=50, campuses=2, seed=4)
+    cache = ExtractCache(str(tmp_path / 'cache'), version='1')
+    plain = list(engine.iter_rows(json_file, engine.CLI_COLUMNS, cache=cache))
+    for _ in range(2):
+        rows = list(engine.iter_rows(json_file, engine.CLI_COLUMNS, cache=cache, aggregate=True))
+        assert rows == _reference(plain)
+    assert len(cache.entries()) == 2
+
+    rows = engine.iter_rows(json_file, engine.CLI_COLUMNS, aggregate=True, row_filter=RowFilter(campuses=['2']))
+    assert list(rows) == [row for row in _reference(plain) if row['campus_id'] == 2]
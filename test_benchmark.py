@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试模拟数据生成和基准比较
+"""
+
+import benchmark
+import engine
+import synthetic_data
+
+
+def test_generated_styles():
+    """两种格式的模拟数据行数正确，URL参数全部可以解析"""
+    for style in synthetic_data.STYLES:
+        data = synthetic_data.generate(style, departments=4, campuses=3, items_per_campus=2, params_width=3)
+        rows = list(engine.iter_rows(data, engine.CLI_COLUMNS + ['url_params_json'], hospital_id=style))
+        assert len(rows) == 24
+        assert all(row['department_id'] for row in rows)
+        assert '"p3": "p3_' in rows[0]['url_params_json']
+        assert '""' not in rows[0]['url_params_json']
+    assert synthetic_data.generate('63', seed=1) == synthetic_data.generate('63', seed=1)
+
+
+def test_run_and_compare(monkeypatch):
+    """运行缩小规模的基准测试，并检测比基准慢的阶段"""
+    monkeypatch.setattr(benchmark, 'MIN_COMPARE_SECONDS', 0)
+    current = benchmark.run(scale=0.01, repeat=1, memory=False, scenarios=['193'])
+    stages = current['scenarios']['193']['stages']
+    assert set(stages) == {f'{path}.{stage}' for path in benchmark.PATHS for stage in benchmark.stage_names()}
+    assert {'load.stdlib', 'stream'} <= set(benchmark.stage_names())
+
+    baseline = {'scenarios': {'193': {'rows': current['scenarios']['193']['rows'],
+                                      'stages': {'cli.xlsx': {'seconds': stages['cli.xlsx']['seconds'] / 10}}}}}
+    regressions = benchmark.compare(current, baseline)
+    assert [(name, stage) for name, stage, *_ in regressions] == [('193', 'cli.xlsx')]
+    assert benchmark.compare(current, current) == []
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试列式提取与逐行提取结果一致
+"""
+
+import json
+
+import batch_converter
+import extraction
+from columnar import ColumnarTable, RunLengthColumn, StringPool
+from test_json_stream import SAMPLE
+
+
+def test_run_length_column():
+    """连续相同的值合并为一个游程，1、1.0、True 不合并"""
+    column = RunLengthColumn()
+    column.extend_repeat('呼吸困难', 3)
+    column.append('呼吸困难')
+    column.extend_repeat('胸痛', 0)
+    column.append(1)
+    column.append(1.0)
+    column.append(True)
+    assert len(column) == 7
+    assert list(column.runs()) == [('呼吸困难', 4), (1, 1), (1.0, 1), (True, 1)]
+    assert list(column) == ['呼吸困难'] * 4 + [1, 1.0, True]
+
+
+def test_cli_columnar_matches_rows():
+    """命令行版本：列式提取与行字典一致"""
+    table = batch_converter.extract_columnar(SAMPLE['departments'], '63')
+    assert list(table.iter_dicts()) == batch_converter.extract_department_data(SAMPLE, '63')
+    assert len(table['symptom_text'].values) == 2
+
+
+def test_gui_columnar_matches_rows():
+    """GUI版本：列式提取与行字典一致（包括多个baseurl条目和全部列）"""
+    data = dict(SAMPLE, baseurl=SAMPLE['baseurl'] + [{"url": "http://b/?areaId={areaId}"}])
+    for json_data in (SAMPLE, data):
+        baseurl, url_params = extraction.extract_baseurl(json_data)
+        entries = extraction.extract_baseurls(json_data)
+        for columns in (extraction.COLUMNS, extraction.ALL_COLUMNS):
+            table = extraction.extract_columnar(json_data['departments'], '63', baseurl, url_params, entries,
+                                                columns)
+            rows = extraction.extract_department_data(json_data, '63', baseurl, url_params, columns)
+            assert list(table.iter_dicts()) == rows
+
+
+def test_table_to_dataframe():
+    """由列数据直接构建DataFrame"""
+    table = ColumnarTable(['a', 'b'], run_length_columns=('a',))
+    table['a'].extend_repeat('x', 2)
+    table['b'].extend([1, 2])
+    df = table.to_dataframe(['b', 'a'])
+    assert list(df.columns) == ['b', 'a']
+    assert df['a'].tolist() == ['x', 'x']
+
+
+def test_run_length_column_to_categorical():
+    """游程编码列转换为分类列，None 保持为空值"""
+    column = RunLengthColumn()
+    for value, count in (('呼吸困难', 3), (None, 1), ('胸痛', 2), ('呼吸困难', 1), (2, 1)):
+        column.extend_repeat(value, count)
+    categorical = column.to_categorical()
+    assert list(categorical.categories) == ['呼吸困难', '胸痛', 2]
+    assert [None if value != value else value for value in categorical] == list(column)
+
+    # pandas不区分 1 和 True，保留原始值
+    mixed = RunLengthColumn()
+    mixed.append(1)
+    mixed.append(True)
+    assert mixed.to_categorical() == [1, True]
+
+
+def test_extraction_interns_strings():
+    """列式提取时不同症状下相同的科室名称共用同一个字符串对象；逐行提取和 url_params_json 不去重"""
+    pool = StringPool()
+    first = pool.intern(''.join(['呼吸', '内科']))
+    assert pool.intern(''.join(['呼吸', '内科'])) is first
+    assert pool.intern(3) == 3
+
+    departments = json.loads(json.dumps([
+        {'symptom_text': symptom, 'data': [{'campus_id': 1, 'department_list': [{'title': '呼吸科'}]}]}
+        for symptom in ('咳嗽', '发热')], ensure_ascii=False))
+    first, second = batch_converter.extract_columnar(departments, '63')['department_title']
+    assert first is second
+    first, second = (row['department_title'] for row in batch_converter.iter_department_rows(departments, '63'))
+    assert first == second and first is not second
+    first, second = extraction.extract_columnar(departments, '63', '', [])['url_params_json']
+    assert first == second and first is not second
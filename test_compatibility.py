@@ -4,20 +4,14 @@
 测试JSON转Excel转换器的兼容性
 """
 
-import json
 import pandas as pd
-from json_to_excel_converter import JSONToExcelConverter
-import tkinter as tk
 
+import engine
+from extraction import ALL_COLUMNS
 
-def test_json_formats():
-    """测试不同格式的JSON文件"""
-    
-    # 创建一个隐藏的Tk窗口（仅用于测试）
-    root = tk.Tk()
-    root.withdraw()
-    
-    converter = JSONToExcelConverter(root)
+
+def test_json_formats(tmp_path):
+    """测试不同格式的JSON文件（转换引擎不依赖tkinter）"""
     
     # 测试数据：63格式
     test_data_63 = {
@@ -68,22 +62,16 @@ def test_json_formats():
         ]
     }
     
-    # 设置hospital_id
-    converter.hospital_id = "63"
-    
     # 测试63格式
     print("测试63格式JSON...")
-    rows_63 = converter.extract_department_data(test_data_63)
+    rows_63 = list(engine.iter_rows(test_data_63, ALL_COLUMNS, hospital_id="63"))
     print(f"提取到 {len(rows_63)} 条记录")
     if rows_63:
         print("示例记录：", rows_63[0])
     
-    # 设置hospital_id
-    converter.hospital_id = "193"
-    
     # 测试193格式
     print("\n测试193格式JSON...")
-    rows_193 = converter.extract_department_data(test_data_193)
+    rows_193 = list(engine.iter_rows(test_data_193, ALL_COLUMNS, hospital_id="193"))
     print(f"提取到 {len(rows_193)} 条记录")
     if rows_193:
         print("示例记录：", rows_193[0])
@@ -116,11 +104,19 @@ def test_json_formats():
     df = df[column_order]
     
     # 保存到Excel
-    df.to_excel('test_compatibility_output.xlsx', index=False)
-    print("测试Excel文件已保存为: test_compatibility_output.xlsx")
-    
-    root.destroy()
+    output_file = tmp_path / 'test_compatibility_output.xlsx'
+    df.to_excel(output_file, index=False)
+    print(f"测试Excel文件已保存为: {output_file}")
+    
+    # GUI与命令行的列都是全部列的子集
+    assert engine.GUI_COLUMNS == [col for col in ALL_COLUMNS if col in engine.GUI_COLUMNS]
+    assert engine.CLI_COLUMNS == [col for col in ALL_COLUMNS if col in engine.CLI_COLUMNS]
+    sink = engine.ListSink()
+    assert engine.convert(test_data_63, sink, engine.GUI_COLUMNS, columnar=True, hospital_id="63") == 1
+    assert list(sink.rows[0]) == engine.GUI_COLUMNS
 
 
 if __name__ == "__main__":
-    test_json_formats() 
\ No newline at end of file
+    import pathlib
+    import tempfile
+    test_json_formats(pathlib.Path(tempfile.mkdtemp()))
\ No newline at end of file
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试流式Excel写入
+"""
+
+import os
+import zipfile
+
+import pytest
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import IllegalCharacterError
+
+import excel_writer
+import xlsx_writer
+from batch_converter import COLUMN_ORDER, extract_columnar, save_with_pandas
+from test_json_stream import SAMPLE
+
+
+ROWS = [
+    {'hospital_id': '63', 'campus_id': 1, 'department_title': '慢阻肺门诊', 'department_id': '3001',
+     'area_id': '', 'area_name': '', 'position': '门诊楼3楼', 'symptom_text': '呼吸困难' * 20,
+     'diagnosis_text': '慢性阻塞性肺疾病'},
+    {'hospital_id': '63', 'campus_id': 2, 'department_title': 'PICC门诊', 'department_id': '218',
+     'area_id': '16', 'area_name': '北城院区', 'position': '', 'symptom_text': '需要静脉输液',
+     'diagnosis_text': '长期静脉治疗'},
+]
+
+
+def _read_sheet(filename):
+    workbook = load_workbook(filename)
+    worksheet = workbook['科室数据']
+    values = [[cell.value for cell in row] for row in worksheet.iter_rows()]
+    widths = {key: dim.width for key, dim in worksheet.column_dimensions.items()}
+    return workbook.sheetnames, values, widths
+
+
+def test_write_excel_matches_pandas(tmp_path):
+    """流式写入与pandas写入的内容和列宽一致"""
+    stream_file = tmp_path / "stream.xlsx"
+    pandas_file = tmp_path / "pandas.xlsx"
+
+    count = excel_writer.write_excel(iter(ROWS), str(stream_file), columns=COLUMN_ORDER)
+    assert count == 2
+    save_with_pandas(ROWS, str(pandas_file))
+
+    sheets, values, widths = _read_sheet(stream_file)
+    assert sheets == ['科室数据']
+    assert values[0] == COLUMN_ORDER
+    assert _read_sheet(pandas_file)[1:] == (values, widths)
+    assert widths['H'] == 50  # 超长列宽度上限
+
+
+def test_write_excel_fixed_widths(tmp_path):
+    """固定列宽与默认列顺序"""
+    filename = tmp_path / "gui.xlsx"
+    rows = [{'hospital_id': '63', 'baseurl': 'http://example.com', 'url_params_json': '{}'}]
+    excel_writer.write_excel(rows, str(filename), fixed_widths={'baseurl': 80, 'url_params_json': 100})
+
+    _, values, widths = _read_sheet(filename)
+    assert values == [['hospital_id', 'baseurl', 'url_params_json'], ['63', 'http://example.com', '{}']]
+    assert (widths['A'], widths['B'], widths['C']) == (13, 80, 100)
+
+
+def test_wide_table_and_width_sample(tmp_path):
+    """超过26列时列字母正确；抽样模式只根据前N行估算列宽"""
+    columns = [f'param_{i}' for i in range(30)]
+    rows = [{col: 'x' * 12 for col in columns}, {col: 'y' * 40 for col in columns}]
+
+    filename = tmp_path / "wide.xlsx"
+    excel_writer.write_excel(rows, str(filename), columns=columns)
+    _, values, widths = _read_sheet(filename)
+    assert len(values[0]) == 30
+    assert widths['AD'] == 42
+
+    sampled = tmp_path / "sampled.xlsx"
+    assert excel_writer.write_excel(iter(rows), str(sampled), columns=columns, width_sample=1) == 2
+    _, sampled_values, sampled_widths = _read_sheet(sampled)
+    assert sampled_values == values
+    assert sampled_widths['AD'] == 14
+
+
+def test_measure_table_matches_rows():
+    """列式数据按游程测量的列宽与逐行测量一致"""
+    table = extract_columnar(SAMPLE['departments'], '63')
+    by_rows = excel_writer.ColumnWidthTracker(COLUMN_ORDER)
+    for values in table.iter_tuples(COLUMN_ORDER):
+        by_rows.update(values)
+    assert excel_writer.measure_table(table, COLUMN_ORDER).max_lengths == by_rows.max_lengths
+
+
+def test_shared_strings(tmp_path):
+    """重复列的字符串只在共享字符串表中保存一次，单元格中只写入序号；其他列写为内联字符串"""
+    rows = [dict(ROWS[0], department_title=f'科室{i % 3}', position=' A&B <1> ') for i in range(100)]
+    filename = tmp_path / "shared.xlsx"
+    assert excel_writer.write_excel(rows, str(filename), columns=COLUMN_ORDER) == 100
+
+    with zipfile.ZipFile(filename) as archive:
+        shared = archive.read('xl/sharedStrings.xml').decode('utf-8')
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+    assert shared.count('呼吸困难' * 20) == 1
+    assert shared.count('科室') == 3
+    assert 'A&amp;B' not in shared and '3001' not in shared
+    assert sheet.count('<t xml:space="preserve"> A&amp;B &lt;1&gt; </t>') == 100
+
+    # 空字符串为空单元格，首尾空白和特殊字符原样保留
+    _, values, _ = _read_sheet(filename)
+    assert values[1:] == [[row[col] if row[col] != '' else None for col in COLUMN_ORDER] for row in rows]
+
+
+def test_shared_strings_bounded(tmp_path, monkeypatch):
+    """每行不同的字符串不进入共享字符串表；表满后新的字符串写为内联字符串"""
+    columns = ['symptom_text', 'url_params_json']
+    rows = [(f'症状{i % 5}', f'{{"id": {i}}}') for i in range(3000)]
+    with xlsx_writer.XlsxWorkbook() as workbook:
+        excel_writer.append_sheet(workbook, 'a', iter(rows), columns)
+        assert len(workbook.shared_strings) == 6
+
+    monkeypatch.setattr(xlsx_writer, 'SHARED_STRINGS_MAX', 3)
+    filename = tmp_path / "bounded.xlsx"
+    with xlsx_writer.XlsxWorkbook() as workbook:
+        excel_writer.append_sheet(workbook, 'a', iter(rows), columns)
+        assert len(workbook.shared_strings) == 3
+        workbook.save(str(filename))
+    worksheet = load_workbook(filename)['a']
+    assert [[cell.value for cell in row] for row in worksheet.iter_rows()] == [columns] + [list(row) for row in rows]
+
+
+def test_illegal_characters(tmp_path):
+    """与openpyxl一致，控制字符不能写入工作表"""
+    with pytest.raises(IllegalCharacterError):
+        excel_writer.write_excel([{'title': 'a\x01b'}], str(tmp_path / "bad.xlsx"))
+
+
+def test_non_finite_floats(tmp_path):
+    """NaN为空单元格，无穷大写为文本（XLSX的数值不能是NaN或无穷大）"""
+    filename = tmp_path / "floats.xlsx"
+    excel_writer.write_excel([{'a': float('nan'), 'b': float('inf'), 'c': float('-inf'), 'd': 1.5}],
+                             str(filename), columns=['a', 'b', 'c', 'd'])
+    with zipfile.ZipFile(filename) as archive:
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+    assert '<v>nan</v>' not in sheet and '<v>inf</v>' not in sheet
+    worksheet = load_workbook(filename)['科室数据']
+    assert [cell.value for cell in worksheet[2]] == [None, 'inf', '-inf', 1.5]
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason="需要 /proc/self/fd")
+def test_many_sheets_keep_no_files_open(tmp_path):
+    """写完的工作表不占用文件描述符（合并输出时每个医院一个工作表）"""
+    open_before = len(os.listdir('/proc/self/fd'))
+    filename = tmp_path / "many.xlsx"
+    with xlsx_writer.XlsxWorkbook() as workbook:
+        for i in range(300):
+            excel_writer.append_sheet(workbook, f'医院{i}', iter([(str(i), '症状')] * 1500), ['a', 'b'])
+        assert len(os.listdir('/proc/self/fd')) <= open_before + 2
+        workbook.save(str(filename))
+    assert len(load_workbook(filename, read_only=True).sheetnames) == 300
+    assert len(os.listdir('/proc/self/fd')) <= open_before + 2
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试提取结果缓存
+"""
+
+import json
+import os
+import threading
+
+import pytest
+
+import engine
+import metrics
+from columnar import ColumnarTable
+from extract_cache import ExtractCache, _dump_table, _load_table
+from test_json_stream import SAMPLE
+
+
+@pytest.fixture
+def json_file(tmp_path):
+    path = tmp_path / '63_triage.json'
+    path.write_text(json.dumps(SAMPLE, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+def test_hit_matches_extraction(tmp_path, json_file):
+    """命中缓存时的行与重新提取一致，且不再解析JSON"""
+    cache = ExtractCache(str(tmp_path / 'cache'), version='1')
+    expected = list(engine.iter_rows(json_file, engine.GUI_COLUMNS))
+
+    first = metrics.FileMetrics(json_file)
+    assert list(engine.iter_rows(json_file, engine.GUI_COLUMNS, metrics=first, cache=cache)) == expected
+    assert first.cache_hit is False
+    assert len(cache.entries()) == 1
+
+    second = metrics.FileMetrics(json_file)
+    assert list(engine.iter_rows(json_file, engine.GUI_COLUMNS, metrics=second, cache=cache)) == expected
+    assert second.cache_hit is True
+    assert second.rows == len(expected)
+    assert second.bytes_read == os.path.getsize(json_file)
+    assert second.stages['parse'] == 0
+
+    # 列式提取与行提取共用缓存
+    table = engine.extract_table(json_file, engine.GUI_COLUMNS, cache=cache)
+    assert list(table.iter_dicts()) == expected
+    assert len(cache.entries()) == 1
+
+
+def test_key_depends_on_content_and_options(tmp_path, json_file):
+    cache = ExtractCache(str(tmp_path / 'cache'), version='1')
+    key = cache.key(json_file, columns=['a'], hospital_id='63')
+    assert key == cache.key(json_file, columns=['a'], hospital_id='63')
+    assert key != cache.key(json_file, columns=['a'], hospital_id='64')
+    assert key != cache.key(json_file, columns=['b'], hospital_id='63')
+    assert key != ExtractCache(str(tmp_path / 'cache'), version='2').key(json_file, columns=['a'], hospital_id='63')
+
+    with open(json_file, 'a', encoding='utf-8') as f:
+        f.write('\n')
+    assert key != cache.key(json_file, columns=['a'], hospital_id='63')
+
+
+def test_corrupt_entry_is_miss(tmp_path, json_file):
+    cache = ExtractCache(str(tmp_path / 'cache'))
+    table = engine.extract_table(json_file, engine.CLI_COLUMNS, cache=cache)
+    (path,) = [path for _, _, path in cache.entries()]
+    with open(path, 'r+b') as f:
+        f.truncate(10)
+
+    assert cache.get(os.path.basename(path)[:-len('.cache')]) is None
+    assert not os.path.exists(path)
+    assert list(engine.extract_table(json_file, engine.CLI_COLUMNS, cache=cache).iter_tuples()) == \
+        list(table.iter_tuples())
+
+
+def test_round_trip_keeps_types():
+    """字典编码保留值的类型（1、1.0、True、'1' 不合并）"""
+    table = ColumnarTable(['a', 'b'], run_length_columns=('a',))
+    for a, b in [('x', 1), ('x', 1.0), ('x', True), ('y', '1'), ('y', None), ('', 1)]:
+        table['a'].append(a)
+        table['b'].append(b)
+    loaded = _load_table(_dump_table(table))
+    assert [tuple(map(type, row)) for row in loaded.iter_tuples()] == \
+        [tuple(map(type, row)) for row in table.iter_tuples()]
+    assert list(loaded.iter_tuples()) == list(table.iter_tuples())
+
+
+def test_evicts_least_recently_used(tmp_path):
+    table = ColumnarTable(['a'])
+    table['a'].extend(f'值{i}' for i in range(1000))
+    cache = ExtractCache(str(tmp_path))
+    for key in ('a', 'b', 'c'):
+        cache.put(key, table)
+    entry_size = cache.size() // 3
+    os.utime(cache._path('a'), (1, 1))
+    os.utime(cache._path('b'), (2, 2))
+    os.utime(cache._path('c'), (3, 3))
+    # 读取 a 后 b 成为最久未使用的条目
+    assert cache.get('a') is not None
+
+    cache.max_size = entry_size * 3
+    cache.put('d', table)
+    assert sorted(os.path.basename(path) for _, _, path in cache.entries()) == ['a.cache', 'c.cache', 'd.cache']
+
+
+def test_cancelled_rows_not_cached(tmp_path, json_file):
+    cache = ExtractCache(str(tmp_path / 'cache'))
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(engine.Cancelled):
+        list(engine.iter_rows(json_file, engine.GUI_COLUMNS, cancel=cancel, cache=cache))
+    assert cache.entries() == []
+
+
+def test_stream_rows_skip_cache(tmp_path, json_file, monkeypatch):
+    """逐行流式解析不使用缓存：不收集行（内存占用不随文件大小增长），也不计算文件哈希查找缓存"""
+    cache = ExtractCache(str(tmp_path / 'cache'))
+    expected = list(engine.iter_rows(json_file, engine.GUI_COLUMNS))
+    list(engine.iter_rows(json_file, engine.GUI_COLUMNS, cache=cache))
+    entries = cache.entries()
+    assert len(entries) == 1
+
+    monkeypatch.setattr(engine, '_collect_into_cache', None)
+    monkeypatch.setattr(engine, '_cache_lookup', None)
+    recorder = metrics.FileMetrics(json_file)
+    assert list(engine.iter_rows(json_file, engine.GUI_COLUMNS, stream=True, metrics=recorder,
+                                 cache=cache)) == expected
+    assert recorder.cache_hit is None
+    assert cache.entries() == entries
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试编译后的参数提取计划与逐行动态查找结果一致
+"""
+
+import json
+
+from extraction_plan import BaseurlSelector, compile_plan, get_plan
+
+
+URL_PARAMS = ['areaId', 'areaName', 'departId', 'title', 'position', 'Floor']
+
+ITEMS = [
+    {"title": "慢阻肺门诊", "department_id": "3001", "position": "门诊楼3楼"},
+    {"title": "呼吸科", "department_id": 3002, "floor": 4},
+    {"title": "PICC门诊", "params": {"areaId": "16", "AREANAME": "北城院区", "departId": 218,
+                                     "floor": None}},
+    {"title": "", "params": {}},
+    {"title": "\"引号\"\n换行", "department_id": None, "areaid": ["a", {"b": 1.5}]},
+]
+
+
+def reference_params_json(dept_item, url_params):
+    """原先逐行查找参数并调用 json.dumps 的实现"""
+    url_params_dict = {}
+    if 'params' in dept_item:
+        params = dept_item.get('params', {})
+        for param in url_params:
+            value = params.get(param) or params.get(param.lower()) or params.get(param.upper())
+            url_params_dict[param] = value or ''
+    else:
+        for param in url_params:
+            if param == 'departId':
+                value = dept_item.get('department_id', '')
+            elif param == 'title' or param == 'departName':
+                value = dept_item.get('title', '')
+            else:
+                value = dept_item.get(param) or dept_item.get(param.lower()) or ''
+            url_params_dict[param] = value
+        if 'position' in dept_item:
+            url_params_dict['position'] = dept_item['position']
+    return json.dumps(url_params_dict, ensure_ascii=False)
+
+
+def test_plan_matches_reference():
+    """各种参数组合的输出与 json.dumps 完全一致"""
+    for url_params in (URL_PARAMS, ['departId', 'title'], [], ['areaId', 'areaId']):
+        plan = compile_plan(tuple(url_params))
+        for item in ITEMS:
+            assert plan.to_json(item) == reference_params_json(item, url_params)
+
+
+def test_plan_cache_by_pattern():
+    """同一URL模板复用同一个计划"""
+    pattern = "http://example.com/?areaId={areaId}&departId={departId}"
+    assert get_plan(pattern) is get_plan(pattern)
+    assert get_plan(pattern).params == ('areaId', 'departId')
+
+
+def test_baseurl_selector():
+    """多个baseurl条目按院区或参数完整性选择"""
+    by_params = BaseurlSelector([
+        ("http://a/?areaId={areaId}", {}),
+        ("http://b/?departId={departId}", {}),
+    ])
+    assert by_params.select(1, {"department_id": "3001"})[0] == "http://b/?departId={departId}"
+    assert by_params.select(1, {"params": {"areaId": "16"}})[0] == "http://a/?areaId={areaId}"
+    assert by_params.select(1, {})[0] == "http://a/?areaId={areaId}"
+
+    by_campus = BaseurlSelector([
+        ("http://a/?areaId={areaId}", {"campus_id": 1}),
+        ("http://b/?departId={departId}", {"campus_id": 2}),
+    ])
+    assert by_campus.select(2, {"params": {"areaId": "16"}})[0] == "http://b/?departId={departId}"
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试压缩文件和归档成员的读取
+"""
+
+import bz2
+import gzip
+import io
+import json
+import lzma
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+import engine
+import input_files
+import json_stream
+from extraction import extract_hospital_id
+from manifest import Manifest
+from test_json_stream import SAMPLE
+
+
+DATA = json.dumps(SAMPLE, ensure_ascii=False).encode('utf-8')
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    """目录中的普通、压缩文件和归档"""
+    (tmp_path / '63_triage.json').write_bytes(DATA)
+    (tmp_path / '64_triage.json.gz').write_bytes(gzip.compress(DATA))
+    (tmp_path / '65_triage.json.bz2').write_bytes(bz2.compress(DATA))
+    (tmp_path / '66_triage.json.xz').write_bytes(lzma.compress(DATA))
+    (tmp_path / 'other.json').write_bytes(DATA)
+    with zipfile.ZipFile(tmp_path / 'bundle.zip', 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('2024/70_triage.json', DATA)
+        archive.writestr('71_triage.json.gz', gzip.compress(DATA))
+        archive.writestr('readme.txt', 'x')
+    with tarfile.open(tmp_path / 'bundle.tar.gz', 'w:gz') as archive:
+        for name, data in (('80_triage.json', DATA), ('81_triage.json.xz', lzma.compress(DATA))):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    (tmp_path / 'broken.zip').write_bytes(b'not a zip')
+    return tmp_path
+
+
+def test_list_inputs(inputs):
+    paths = input_files.list_inputs(str(inputs / '*_triage.json'))
+    names = [os.path.relpath(path, inputs) for path in paths]
+    assert sorted(names) == sorted([
+        '63_triage.json', '64_triage.json.gz', '65_triage.json.bz2', '66_triage.json.xz',
+        'bundle.tar.gz!/80_triage.json', 'bundle.tar.gz!/81_triage.json.xz',
+        'bundle.zip!/2024/70_triage.json', 'bundle.zip!/71_triage.json.gz'])
+
+    # 直接指定归档时包含其中全部JSON文件
+    assert [os.path.relpath(path, inputs) for path in input_files.list_inputs(str(inputs / 'bundle.zip'))] == \
+        ['bundle.zip!/2024/70_triage.json', 'bundle.zip!/71_triage.json.gz']
+
+
+def test_read_all_inputs(inputs):
+    """一次性读取、流式读取和提取结果与未压缩的文件一致"""
+    expected = list(engine.iter_rows(str(inputs / '63_triage.json'), engine.CLI_COLUMNS, hospital_id='1'))
+    for path in input_files.list_inputs(str(inputs / '*_triage.json')):
+        assert input_files.read_bytes(path) == DATA
+        assert list(json_stream.iter_departments(path)) == SAMPLE['departments']
+        for stream in (False, True):
+            assert list(engine.iter_rows(path, engine.CLI_COLUMNS, stream, hospital_id='1')) == expected
+
+
+def test_member_names(inputs):
+    member = input_files.member_path(str(inputs / 'bundle.zip'), '2024/70_triage.json')
+    assert input_files.split_member(member) == (str(inputs / 'bundle.zip'), '2024/70_triage.json')
+    assert input_files.split_member(str(inputs / 'a.json')) == (str(inputs / 'a.json'), None)
+    assert input_files.base_name(member + '.gz') == '70_triage'
+    assert extract_hospital_id(member) == '70'
+    assert extract_hospital_id(str(inputs / '64_triage.json.gz')) == '64'
+    assert input_files.stored_size(member) < input_files.file_stat(member)[0] == len(DATA)
+
+    with pytest.raises(FileNotFoundError):
+        input_files.open_binary(input_files.member_path(str(inputs / 'bundle.zip'), 'missing.json'))
+
+
+def test_output_names_unique(inputs, tmp_path):
+    """同名的普通文件、压缩文件和不同目录下的归档成员使用不同的输出文件名"""
+    paths = [str(tmp_path / '63_triage.json'), str(tmp_path / '63_triage.json.gz'),
+             input_files.member_path(str(tmp_path / 'b.zip'), '2024/63_triage.json'),
+             input_files.member_path(str(tmp_path / 'b.zip'), '2025/63_triage.json'),
+             input_files.member_path(str(tmp_path / 'c.tar.gz'), '2024/63_triage.json')]
+    assert [input_files.output_name(path) for path in paths] == \
+        ['63_triage', '63_triage_gz', 'b_2024_63_triage', 'b_2025_63_triage', 'c_2024_63_triage']
+    assert input_files.duplicate_output_names(paths) == {}
+    assert input_files.duplicate_output_names(input_files.list_inputs(str(inputs / '*'))) == {}
+
+    clash = input_files.member_path(str(tmp_path / 'b.zip'), '2024_63_triage.json')
+    assert input_files.duplicate_output_names(paths + [clash]) == \
+        {'b_2024_63_triage': [paths[2], clash]}
+
+
+def test_manifest_skips_unchanged_member(inputs, tmp_path):
+    member = input_files.member_path(str(inputs / 'bundle.zip'), '71_triage.json.gz')
+    output = tmp_path / 'out.xlsx'
+    output.write_bytes(b'x')
+    manifest = Manifest(str(tmp_path), '1')
+    unchanged, fingerprint = manifest.check(member)
+    assert not unchanged
+    manifest.record(member, fingerprint, str(output))
+    assert manifest.check(member)[0]
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试批处理任务日志
+"""
+
+from job_journal import DONE, FAILED, JobJournal, job_id
+
+
+def test_resume_skips_done_files(tmp_path):
+    inputs = [str(tmp_path / f'{i}_triage.json') for i in range(3)]
+    output = tmp_path / 'a.xlsx'
+    output.write_bytes(b'x')
+    job = job_id(inputs, fmt='xlsx')
+    assert job == job_id(list(reversed(inputs)), fmt='xlsx')
+    assert job != job_id(inputs, fmt='csv')
+
+    journal = JobJournal(str(tmp_path), job)
+    journal.start()
+    journal.record(inputs[0], DONE, str(output))
+    journal.record(inputs[1], FAILED, error='错误')
+    # 模拟进程在写入一行时被终止
+    journal._file.write('{"key": "trunc')
+    journal.close()
+
+    resumed = JobJournal(str(tmp_path), job)
+    resumed.start(resume=True)
+    assert resumed.is_done(inputs[0])
+    assert not resumed.is_done(inputs[1])
+    resumed.record(inputs[2], DONE, str(output))
+    resumed.close()
+    assert JobJournal(str(tmp_path), job).load() == 2
+
+    # 输出文件被删除后需要重新处理
+    output.unlink()
+    assert JobJournal(str(tmp_path), job).load() == 0
+
+
+def test_other_job_and_finish(tmp_path):
+    journal = JobJournal(str(tmp_path), 'a')
+    journal.start()
+    journal.record('1_triage.json', DONE)
+    journal.close()
+    assert JobJournal(str(tmp_path), 'b').load() == 0
+
+    # 不继续时重新开始
+    journal = JobJournal(str(tmp_path), 'a')
+    journal.start()
+    assert not journal.is_done('1_triage.json')
+    journal.record('1_triage.json', FAILED)
+    assert not journal.finish()
+    assert (tmp_path / '.batch_journal.jsonl').exists()
+
+    journal = JobJournal(str(tmp_path), 'a')
+    journal.start(resume=True)
+    journal.record('1_triage.json', DONE)
+    assert journal.finish()
+    assert not (tmp_path / '.batch_journal.jsonl').exists()
+
+
+def test_finish_keeps_journal_for_unrecorded_files(tmp_path):
+    """处理中途停止、部分文件没有记录时保留日志"""
+    journal = JobJournal(str(tmp_path), 'a')
+    journal.start()
+    journal.record('1_triage.json', DONE)
+    assert not journal.finish(['1_triage.json', '2_triage.json'])
+    assert (tmp_path / '.batch_journal.jsonl').exists()
+
+    journal = JobJournal(str(tmp_path), 'a')
+    journal.start(resume=True)
+    journal.record('2_triage.json', DONE)
+    assert journal.finish(['1_triage.json', '2_triage.json'])
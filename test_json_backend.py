@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试JSON解析后端
+"""
+
+import gc
+import json
+import threading
+
+import pytest
+
+import json_backend
+import pipeline
+from test_json_stream import SAMPLE
+
+
+def test_backends_match_stdlib(tmp_path):
+    """各已安装后端（包括mmap读取）的解析结果与 json.load 一致"""
+    json_file = tmp_path / "63_triage.json"
+    json_file.write_text(json.dumps(SAMPLE, ensure_ascii=False), encoding='utf-8')
+    for backend in json_backend.available_backends():
+        assert json_backend.load_file(str(json_file), backend) == SAMPLE
+    assert json_backend.loads(b'[NaN]', 'auto')[0] != 0
+
+    empty_file = tmp_path / "empty.json"
+    empty_file.write_bytes(b'')
+    with pytest.raises(ValueError):
+        json_backend.load_file(str(empty_file))
+
+
+def test_resolve_backend():
+    """auto选择已安装的最快后端，未知后端报错"""
+    assert json_backend.resolve_backend('auto') == json_backend.available_backends()[0]
+    assert json_backend.resolve_backend('stdlib') == 'stdlib'
+    with pytest.raises(ValueError):
+        json_backend.resolve_backend('ujson')
+
+
+def test_gc_paused_only_without_other_threads():
+    """只有一个线程时解析期间暂停垃圾回收，有其他（非读取文件的）线程时不暂停"""
+    assert gc.isenabled()
+    with json_backend._gc_paused():
+        assert not gc.isenabled()
+    assert gc.isenabled()
+
+    stop = threading.Event()
+    other = threading.Thread(target=stop.wait)
+    other.start()
+    try:
+        with json_backend._gc_paused():
+            assert gc.isenabled()
+    finally:
+        stop.set()
+        other.join()
+
+
+def test_gc_paused_with_prefetch_thread(tmp_path):
+    """串行流水线中预读线程只读取文件，转换阶段解析时仍暂停垃圾回收"""
+    json_files = []
+    for i in range(3):
+        json_file = tmp_path / f"{i}_triage.json"
+        json_file.write_text(json.dumps(SAMPLE, ensure_ascii=False), encoding='utf-8')
+        json_files.append(str(json_file))
+    paused = []
+
+    def convert(json_file):
+        with json_backend._gc_paused():
+            paused.append(not gc.isenabled())
+        return json_backend.load_file(json_file)
+
+    results = list(pipeline.iter_pipelined(json_files, convert, prefetch=1))
+    assert [result for _, result in results] == [SAMPLE] * 3
+    assert paused == [True] * 3
+    assert gc.isenabled()
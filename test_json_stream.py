@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试流式JSON解析与 json.load 结果一致
+"""
+
+import io
+import json
+import tracemalloc
+
+import pytest
+
+import engine
+import json_stream
+from batch_converter import extract_department_data, iter_department_rows
+
+
+SAMPLE = {
+    "baseurl": [{"url_pattern": "http://example.com/?departId={departId}&departName={title}"}],
+    "departments": [
+        {
+            "title": "慢阻肺门诊",
+            "symptom_text": "呼吸困难",
+            "diagnosis_text": "慢性阻塞性肺疾病",
+            "": [{"campus_id": 1, "department_list": [
+                {"title": "慢阻肺门诊", "department_id": "3001", "position": "门诊楼3楼"},
+                {"title": "呼吸科", "department_id": 3002, "position": "门诊楼4楼"},
+            ]}],
+        },
+        {
+            "title": "PICC门诊",
+            "symptom_text": "需要静脉输液",
+            "diagnosis_text": "长期静脉治疗",
+            "data": [{"campus_id": 22, "department_list": [
+                {"title": "PICC门诊", "params": {"areaId": "16", "areaName": "北城院区", "departId": "218"}},
+            ]}],
+        },
+    ],
+    "total": 12345,
+}
+
+
+def test_iter_top_level_small_chunks():
+    """极小的读取块也能正确拼接被截断的元素"""
+    text = json.dumps(SAMPLE, ensure_ascii=False, indent=2)
+    for chunk_size in (1, 3, 7, 64):
+        result = {}
+        for key, value in json_stream.iter_top_level(io.StringIO(text), chunk_size=chunk_size):
+            result[key] = list(value) if key == 'departments' else value
+        assert result == SAMPLE
+
+
+def test_stream_rows_match_json_load(tmp_path):
+    """流式解析得到的行与 json.load 完全一致"""
+    json_file = tmp_path / "63_triage.json"
+    json_file.write_text(json.dumps(SAMPLE, ensure_ascii=False), encoding='utf-8')
+
+    expected = extract_department_data(SAMPLE, "63")
+    streamed = list(iter_department_rows(json_stream.iter_departments(str(json_file)), "63"))
+    assert streamed == expected
+    assert len(streamed) == 3
+
+
+def test_read_metadata_after_departments(tmp_path):
+    """baseurl 位于 departments 之后时也能读取"""
+    data = {"departments": SAMPLE["departments"], "baseurl": SAMPLE["baseurl"]}
+    json_file = tmp_path / "193_triage.json"
+    json_file.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+
+    metadata = json_stream.read_metadata(str(json_file))
+    assert metadata == {"baseurl": SAMPLE["baseurl"]}
+
+
+@pytest.mark.parametrize('chunk_size', [1, 16, 1 << 20])
+def test_lazy_departments_match_json_load(tmp_path, monkeypatch, chunk_size):
+    """逐个科室解析（小缓冲区）、字段顺序不同（整体解析）时结果都与 json.load 一致"""
+    monkeypatch.setattr(json_stream, 'CHUNK_SIZE', chunk_size)
+    reordered = dict(SAMPLE, departments=[
+        {'data': dept.get('data', dept.get('')), 'symptom_text': dept['symptom_text'],
+         'diagnosis_text': dept['diagnosis_text']} for dept in SAMPLE['departments']])
+    for campus in reordered['departments'][0]['data']:
+        campus['campus_id'] = campus.pop('campus_id')
+    for data in (SAMPLE, reordered):
+        json_file = tmp_path / "63_triage.json"
+        json_file.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding='utf-8')
+        expected = list(engine.iter_rows(data, engine.CLI_COLUMNS, hospital_id='63'))
+        for aggregate in (False, True):
+            assert list(engine.iter_rows(str(json_file), engine.CLI_COLUMNS, stream=True,
+                                         aggregate=aggregate)) == \
+                list(engine.iter_rows(data, engine.CLI_COLUMNS, hospital_id='63', aggregate=aggregate))
+        table = engine.extract_table(str(json_file), engine.CLI_COLUMNS, stream=True)
+        assert list(table.iter_dicts()) == expected
+
+
+def test_large_campus_memory_flat(tmp_path, monkeypatch):
+    """一个症状下只有一个很大的院区时，内存占用也与科室数量无关"""
+    monkeypatch.setattr(json_stream, 'CHUNK_SIZE', 4096)
+    items = [{'title': f'科室{i}', 'department_id': str(i), 'position': '门诊楼'} for i in range(20000)]
+    json_file = tmp_path / "63_triage.json"
+    json_file.write_text(json.dumps(dict(SAMPLE, departments=[
+        {'symptom_text': '发热', 'diagnosis_text': '感冒', 'data': [{'campus_id': 1, 'department_list': items}]}
+    ]), ensure_ascii=False), encoding='utf-8')
+
+    tracemalloc.start()
+    try:
+        count = 0
+        for _ in engine.iter_rows(str(json_file), engine.CLI_COLUMNS, stream=True):
+            count += 1
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert count == len(items)
+    assert peak < json_file.stat().st_size / 4
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试增量转换清单：未变化的文件跳过，内容或影响输出的选项变化后重新转换
+"""
+
+import os
+import sys
+
+import batch_converter
+import synthetic_data
+from manifest import Manifest
+
+
+def _run(monkeypatch, capsys, tmp_path, *options):
+    """以增量模式运行命令行，返回跳过的文件数"""
+    argv = ['batch_converter.py', str(tmp_path / '*_triage.json'), '-o', str(tmp_path / 'out'), '--incremental',
+            '--no-cache'] + list(options)
+    monkeypatch.setattr(sys, 'argv', argv)
+    batch_converter.main()
+    output = capsys.readouterr().out
+    line = next(line for line in output.splitlines() if line.startswith('增量模式'))
+    return int(line.split(':')[1].split()[0])
+
+
+def test_incremental_skip_and_reconvert(tmp_path, monkeypatch, capsys):
+    json_file = tmp_path / '63_triage.json'
+    synthetic_data.write_file(str(json_file), departments=20)
+    synthetic_data.write_file(str(tmp_path / '64_triage.json'), departments=20, seed=1)
+
+    assert _run(monkeypatch, capsys, tmp_path) == 0
+    assert _run(monkeypatch, capsys, tmp_path) == 2
+
+    # 分割阈值改变后输出不同，重新转换；阈值不变时再次跳过
+    for options in (['--split-rows', '50'], ['--split-rows', '50', '--split-to', 'files'],
+                    ['--split-bytes', '1M'], ['--aggregate'], ['--campus', '1']):
+        assert _run(monkeypatch, capsys, tmp_path, *options) == 0, options
+        assert _run(monkeypatch, capsys, tmp_path, *options) == 2, options
+    assert _run(monkeypatch, capsys, tmp_path) == 0
+
+    # 内容改变的文件重新转换，只改变修改时间的文件跳过
+    synthetic_data.write_file(str(json_file), departments=21)
+    stat = os.stat(tmp_path / '64_triage.json')
+    os.utime(tmp_path / '64_triage.json', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert _run(monkeypatch, capsys, tmp_path) == 1
+
+
+def test_manifest_check(tmp_path):
+    json_file = tmp_path / '63_triage.json'
+    json_file.write_text('{}', encoding='utf-8')
+    output = tmp_path / '63_triage_converted.xlsx'
+    output.write_bytes(b'')
+
+    manifest = Manifest(str(tmp_path), '1')
+    unchanged, fingerprint = manifest.check(str(json_file))
+    assert not unchanged
+    manifest.record(str(json_file), fingerprint, str(output))
+    manifest.save()
+
+    manifest = Manifest(str(tmp_path), '1')
+    assert manifest.check(str(json_file), str(output))[0]
+    # 输出路径不同（如输出格式改变）、转换器版本不同、输出文件被删除时重新转换
+    assert not manifest.check(str(json_file), str(tmp_path / '63_triage_converted.csv'))[0]
+    assert not Manifest(str(tmp_path), '2').check(str(json_file))[0]
+    output.unlink()
+    assert not manifest.check(str(json_file))[0]
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试性能指标记录
+"""
+
+import csv
+import json
+import time
+
+import metrics
+from batch_converter import iter_process_results
+from test_json_stream import SAMPLE
+
+
+def test_nested_stages_are_exclusive():
+    """嵌套阶段的耗时不计入外层阶段"""
+    recorder = metrics.FileMetrics('a.json')
+    recorder.start()
+
+    def slow_rows():
+        for i in range(3):
+            time.sleep(0.01)
+            yield i
+
+    with recorder.stage('write'):
+        assert list(recorder.timed_iter(slow_rows(), 'extract', count_rows=True)) == [0, 1, 2]
+    recorder.finish()
+    assert recorder.rows == 3
+    assert recorder.stages['extract'] >= 0.03
+    assert recorder.stages['write'] < 0.01
+
+
+def test_batch_metrics_report(tmp_path):
+    """批量处理时收集每个文件的指标，并保存为JSON和CSV报告"""
+    json_file = tmp_path / "63_triage.json"
+    json_file.write_text(json.dumps(SAMPLE, ensure_ascii=False), encoding='utf-8')
+    empty_file = tmp_path / "64_triage.json"
+    empty_file.write_text('{"departments": []}', encoding='utf-8')
+
+    results = list(iter_process_results([str(json_file), str(empty_file)], str(tmp_path), collect_metrics=True,
+                                        stream=True))
+    records = [record for _, _, record in results]
+    assert [success for _, success, _ in results] == [True, False]
+    assert records[0]['rows'] == 3
+    assert records[0]['bytes_read'] == json_file.stat().st_size
+    assert records[0]['write_seconds'] > 0
+    assert metrics.slowest(records, 1)[0]['file'] == str(json_file)
+
+    metrics.write_report(records, str(tmp_path / "m.json"))
+    report = json.loads((tmp_path / "m.json").read_text(encoding='utf-8'))
+    assert report['totals']['rows'] == 3
+    metrics.write_report(records, str(tmp_path / "m.csv"))
+    with open(tmp_path / "m.csv", encoding='utf-8-sig', newline='') as f:
+        assert [row['rows'] for row in csv.DictReader(f)] == ['3', '0']
+
+
+def test_gui_batch_metrics_only_when_requested(tmp_path, monkeypatch):
+    """GUI批处理只在保存性能报告时记录指标，否则只计数显示进度"""
+    import json_to_excel_converter
+
+    json_file = tmp_path / "63_triage.json"
+    json_file.write_text(json.dumps(SAMPLE, ensure_ascii=False), encoding='utf-8')
+    progress = []
+    monkeypatch.setattr(metrics, 'PROGRESS_INTERVAL', 2)
+
+    results = list(json_to_excel_converter.iter_batch_results([str(json_file)], str(tmp_path), collect_metrics=True,
+                                                              on_rows=lambda *p: progress.append(p)))
+    (_, output_file, error, rows, record), = results
+    assert output_file and error is None
+    assert rows == record['rows'] == 3
+    assert [count for count, _ in progress] == [2]
+
+    progress.clear()
+    monkeypatch.setattr(metrics, 'run_with_metrics', None)
+    results = list(json_to_excel_converter.iter_batch_results([str(json_file)], str(tmp_path),
+                                                              on_rows=lambda *p: progress.append(p)))
+    (_, output_file, error, rows, record), = results
+    assert output_file and error is None
+    assert rows == 3 and record is None
+    assert [count for count, _ in progress] == [2]
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试CSV、JSONL输出格式
+"""
+
+import csv
+import gzip
+import json
+
+import pytest
+from openpyxl import load_workbook
+
+import consolidate
+import output_formats
+from batch_converter import COLUMN_ORDER, extract_columnar, process_json_file
+from test_excel_writer import ROWS
+from test_json_stream import SAMPLE
+
+
+def test_csv_and_jsonl_rows(tmp_path):
+    """行字典与列式数据输出的内容一致，列顺序与Excel相同"""
+    csv_file = tmp_path / "rows.csv"
+    assert output_formats.write_rows(ROWS, str(csv_file), COLUMN_ORDER, 'csv') == 2
+    with open(csv_file, encoding='utf-8-sig', newline='') as f:
+        records = list(csv.reader(f))
+    assert records[0] == COLUMN_ORDER
+    assert records[2] == ['63', '2', 'PICC门诊', '218', '16', '北城院区', '', '需要静脉输液', '长期静脉治疗']
+
+    table = extract_columnar(SAMPLE['departments'], '63')
+    jsonl_file = tmp_path / "table.jsonl"
+    assert output_formats.write_rows(table, str(jsonl_file), COLUMN_ORDER, 'jsonl') == len(table)
+    with open(jsonl_file, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert lines == list(table.iter_dicts())
+    assert list(lines[0]) == COLUMN_ORDER
+
+
+def test_format_selection(tmp_path):
+    """命令行处理按格式生成扩展名；不支持的组合报错"""
+    json_file = tmp_path / "63_triage.json"
+    json_file.write_text(json.dumps(SAMPLE, ensure_ascii=False), encoding='utf-8')
+    output_file = tmp_path / "out.jsonl"
+    assert process_json_file(str(json_file), str(tmp_path), output_file=str(output_file), fmt='jsonl')
+    assert output_file.read_text(encoding='utf-8').count('\n') == len(extract_columnar(SAMPLE['departments'], '63'))
+
+    assert output_formats.format_from_filename('a/B.CSV') == 'csv'
+    with pytest.raises(ValueError):
+        output_formats.check_format('xls')
+    with pytest.raises(ValueError):
+        consolidate.write_consolidated([str(json_file)], str(tmp_path / "c.csv"), 'hospital', fmt='csv')
+
+
+@pytest.mark.parametrize('fmt', ['xlsx', 'csv'])
+def test_failed_write_leaves_no_partial_file(tmp_path, fmt):
+    """写入出错时不留下临时文件，已有的目标文件保持原样"""
+    output_file = tmp_path / f"out.{fmt}"
+    output_file.write_bytes(b'old')
+
+    def failing_rows():
+        yield from ROWS
+        raise RuntimeError('中断')
+
+    with pytest.raises(RuntimeError):
+        output_formats.write_rows(failing_rows(), str(output_file), COLUMN_ORDER, fmt)
+    assert output_file.read_bytes() == b'old'
+    assert sorted(p.name for p in tmp_path.iterdir()) == [output_file.name]
+
+    assert output_formats.write_rows(ROWS, str(output_file), COLUMN_ORDER, fmt) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == [output_file.name]
+
+
+@pytest.mark.parametrize('mode', ['sheet', 'hospital'])
+def test_combined_skips_file_failing_midway(tmp_path, mode):
+    """合并输出时中途出错的文件不留下部分行，其他文件照常写入"""
+    text = json.dumps(SAMPLE, ensure_ascii=False)
+    for hospital_id in ('63', '65'):
+        (tmp_path / f"{hospital_id}_triage.json").write_text(text, encoding='utf-8')
+    # 第一个科室元素完整，之后截断，流式解析时先产出部分行再出错
+    first = json.dumps(SAMPLE['departments'][0], ensure_ascii=False)
+    (tmp_path / "64_triage.json").write_text(
+        json.dumps({'baseurl': SAMPLE['baseurl']}, ensure_ascii=False)[:-1] + ', "departments": [' + first + ', {"sym',
+        encoding='utf-8')
+    json_files = [str(tmp_path / f"{hospital_id}_triage.json") for hospital_id in ('63', '64', '65')]
+
+    results = []
+    output_file = tmp_path / ("out.csv" if mode == 'sheet' else "out.xlsx")
+    total = consolidate.write_consolidated(json_files, str(output_file), mode, stream=True,
+                                          fmt=output_file.suffix[1:],
+                                          on_file_done=lambda f, rows, error: results.append((rows, bool(error))))
+    per_file = len(extract_columnar(SAMPLE['departments'], '63'))
+    assert results == [(per_file, False), (0, True), (per_file, False)]
+    assert total == 2 * per_file
+    if mode == 'sheet':
+        with open(output_file, encoding='utf-8-sig', newline='') as f:
+            assert sorted({record[0] for record in list(csv.reader(f))[1:]}) == ['63', '65']
+    else:
+        assert load_workbook(output_file, read_only=True).sheetnames == ['63', '65']
+
+
+def test_combined_skips_truncated_compressed_file(tmp_path):
+    """预扫描时无法解压的文件跳过，由正式处理时报告错误，不中断合并"""
+    text = json.dumps(SAMPLE, ensure_ascii=False).encode('utf-8')
+    (tmp_path / "63_triage.json").write_bytes(text)
+    (tmp_path / "64_triage.json.gz").write_bytes(gzip.compress(text)[:40])
+    json_files = [str(tmp_path / "63_triage.json"), str(tmp_path / "64_triage.json.gz")]
+    results = []
+    total = consolidate.write_consolidated(json_files, str(tmp_path / "out.csv"), fmt='csv',
+                                          on_file_done=lambda f, rows, error: results.append((rows, bool(error))))
+    per_file = len(extract_columnar(SAMPLE['departments'], '63'))
+    assert total == per_file
+    assert results == [(per_file, False), (0, True)]
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试并行处理（jobs > 1，进程池）：参数序列化、错误传递和取消
+"""
+
+import os
+
+import batch_converter
+import json_to_excel_converter
+import synthetic_data
+from extract_cache import ExtractCache
+from row_filter import RowFilter
+
+
+def _write_files(tmp_path, count, departments=20):
+    for name in ('out', 'serial', 'parallel'):
+        (tmp_path / name).mkdir()
+    json_files = []
+    for i in range(count):
+        json_file = str(tmp_path / f"{i + 1}_triage.json")
+        synthetic_data.write_file(json_file, departments=departments, seed=i)
+        json_files.append(json_file)
+    return json_files
+
+
+def test_cli_jobs_match_serial(tmp_path):
+    """并行结果与串行一致，筛选条件、缓存和指标在进程间传递"""
+    json_files = _write_files(tmp_path, 3)
+    bad_file = tmp_path / "9_triage.json"
+    bad_file.write_text('{"departments": [', encoding='utf-8')
+    options = dict(row_filter=RowFilter(campuses=['1']), cache=ExtractCache(str(tmp_path / 'cache')),
+                   aggregate=True)
+    serial = {f: (ok, record['rows'] if record else None)
+              for f, ok, record in batch_converter.iter_process_results(
+                  json_files + [str(bad_file)], str(tmp_path / 'serial'), collect_metrics=True, **options)}
+    parallel = {f: (ok, record['rows'] if record else None)
+                for f, ok, record in batch_converter.iter_process_results(
+                    json_files + [str(bad_file)], str(tmp_path / 'parallel'), jobs=2, collect_metrics=True,
+                    **options)}
+    assert parallel == serial
+    assert parallel[str(bad_file)][0] is False
+    assert all(parallel[f][0] for f in json_files)
+    assert len(os.listdir(tmp_path / 'parallel')) == len(json_files)
+
+
+def test_cli_jobs_unpicklable_option(tmp_path):
+    """参数无法传给子进程时每个文件都报告失败，不中断整个批处理"""
+    json_files = _write_files(tmp_path, 2)
+    results = list(batch_converter.iter_process_results(json_files, str(tmp_path / 'out'), jobs=2,
+                                                        backend=lambda data: data))
+    assert sorted(results) == [(f, False, None) for f in json_files]
+
+
+def test_cli_jobs_stop_cancels_pending(tmp_path):
+    """调用方提前停止时取消尚未开始的文件"""
+    json_files = _write_files(tmp_path, 12, departments=400)
+    output_dir = tmp_path / 'out'
+    results = batch_converter.iter_process_results(json_files, str(output_dir), jobs=2)
+    assert next(results)[1] is True
+    results.close()
+    assert 1 <= len(os.listdir(output_dir)) < len(json_files)
+
+
+def test_gui_jobs(tmp_path):
+    """GUI批处理并行时的结果、错误信息和指标"""
+    json_files = _write_files(tmp_path, 3)
+    bad_file = tmp_path / "9_triage.json"
+    bad_file.write_text('{"departments": [', encoding='utf-8')
+    results = {f: (output_file, error, rows, record)
+               for f, output_file, error, rows, record in json_to_excel_converter.iter_batch_results(
+                   json_files + [str(bad_file)], str(tmp_path / 'out'), jobs=2, collect_metrics=True,
+                   row_filter=RowFilter(campuses=['1']))}
+    output_file, error, rows, record = results[str(bad_file)]
+    assert output_file is None and error and rows == 0 and record is None
+    for json_file in json_files:
+        output_file, error, rows, record = results[json_file]
+        assert os.path.exists(output_file) and error is None
+        assert rows == record['rows'] > 0
+
+
+def test_gui_jobs_cancel(tmp_path):
+    """取消后不再提交新的文件，已开始的文件完成后停止产出"""
+    json_files = _write_files(tmp_path, 8)
+    control = json_to_excel_converter.BatchControl()
+    results = []
+    for result in json_to_excel_converter.iter_batch_results(json_files, str(tmp_path / 'out'), jobs=2,
+                                                             control=control):
+        results.append(result)
+        control.cancel()
+    assert 1 <= len(results) <= 2
+    assert all(output_file and error is None for _, output_file, error, _, _ in results)
+    assert len(os.listdir(tmp_path / 'out')) == len(results)
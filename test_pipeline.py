@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试批处理流水线（预读文件）
+"""
+
+import gzip
+import json
+import threading
+import time
+
+import engine
+import json_backend
+import pipeline
+from batch_converter import iter_process_results
+from manifest import file_sha256
+from test_json_stream import SAMPLE
+
+
+def _write_files(tmp_path, count):
+    files = []
+    for i in range(count):
+        path = tmp_path / f'{i}_triage.json'
+        path.write_text(json.dumps(SAMPLE, ensure_ascii=False), encoding='utf-8')
+        files.append(str(path))
+    return files
+
+
+def test_prefetched_in_order_and_bounded(tmp_path, monkeypatch):
+    """按原顺序产出；队列满时读取线程等待，最多提前读取 prefetch 个文件"""
+    files = _write_files(tmp_path, 6)
+    reads = []
+    original = pipeline._read
+
+    def tracked_read(json_file, stream):
+        reads.append(json_file)
+        return original(json_file, stream)
+
+    monkeypatch.setattr(pipeline, '_read', tracked_read)
+    items = pipeline.iter_prefetched(files, prefetch=2)
+    first, data = next(items)
+    assert first == files[0]
+    assert data == (tmp_path / '0_triage.json').read_bytes()
+    time.sleep(0.3)
+    # 已取出1个、队列中2个、读取线程手中1个
+    assert len(reads) <= 4
+    assert [json_file for json_file, _ in items] == files[1:]
+
+
+def test_stream_and_disabled_prefetch_keep_no_content(tmp_path):
+    files = _write_files(tmp_path, 2)
+    assert list(pipeline.iter_prefetched(files, prefetch=2, stream=True)) == [(f, None) for f in files]
+    assert list(pipeline.iter_prefetched(files, prefetch=0)) == [(f, None) for f in files]
+
+
+def test_read_errors_left_to_conversion(tmp_path):
+    files = [str(tmp_path / 'missing_triage.json')] + _write_files(tmp_path, 1)
+    assert [data is None for _, data in pipeline.iter_prefetched(files)] == [True, False]
+
+
+def test_conversion_uses_preloaded_content(tmp_path):
+    (json_file,) = _write_files(tmp_path, 1)
+    expected = file_sha256(json_file)
+    data = json_backend.read_bytes(json_file)
+    with open(json_file, 'w', encoding='utf-8') as f:
+        f.write('{}')
+    with json_backend.preloaded(json_file, data):
+        assert file_sha256(json_file) == expected
+        assert len(list(engine.iter_rows(json_file, engine.CLI_COLUMNS))) == 3
+    assert json_backend.preloaded_bytes(json_file) is None
+    assert list(engine.iter_rows(json_file, engine.CLI_COLUMNS)) == []
+
+
+def test_stopping_early_stops_reader(tmp_path):
+    files = _write_files(tmp_path, 20)
+    before = threading.active_count()
+    items = pipeline.iter_prefetched(files, prefetch=1)
+    next(items)
+    items.close()
+    deadline = time.monotonic() + 5
+    while threading.active_count() > before and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert threading.active_count() == before
+
+
+def test_serial_batch_results_match(tmp_path):
+    files = _write_files(tmp_path, 3)
+    for prefetch in (0, 2):
+        output_dir = tmp_path / f'out{prefetch}'
+        output_dir.mkdir()
+        results = list(iter_process_results(files, str(output_dir), prefetch=prefetch, fmt='csv'))
+        assert [(json_file, success) for json_file, success, _ in results] == [(f, True) for f in files]
+        assert len(list(output_dir.iterdir())) == 3
+
+
+def test_corrupt_file_in_middle_does_not_stop_batch(tmp_path):
+    """解压出错（不完整的.gz文件抛出EOFError）的文件报告为失败，后面的文件照常处理"""
+    files = _write_files(tmp_path, 5)
+    broken = tmp_path / '9_triage.json.gz'
+    broken.write_bytes(gzip.compress(json.dumps(SAMPLE).encode('utf-8'))[:-20])
+    files.insert(2, str(broken))
+    assert [json_file for json_file, _ in pipeline.iter_prefetched(files)] == files
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+    results = list(iter_process_results(files, str(output_dir), prefetch=2, fmt='csv'))
+    assert [(json_file, success) for json_file, success, _ in results] == \
+        [(f, f != str(broken)) for f in files]
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试提取时的筛选条件
+"""
+
+import json
+import re
+
+import pytest
+
+import engine
+from batch_converter import process_json_file
+from extract_cache import ExtractCache
+from row_filter import RowFilter, split_values
+from synthetic_data import write_file
+from test_json_stream import SAMPLE
+
+
+def _matches(row, row_filter, title_regex=None):
+    return ((row_filter.campuses is None or str(row['campus_id']) in row_filter.campuses)
+            and (title_regex is None or re.search(title_regex, row['department_title'])))
+
+
+@pytest.mark.parametrize('campuses, title_regex', [(['1'], None), (None, '内科$'), (['2'], '^心'),
+                                                    (['1,3'], '门诊'), (['99'], None)])
+def test_same_as_filtering_afterwards(tmp_path, campuses, title_regex):
+    """提取时筛选与全部提取后再筛选结果一致（逐行、列式、流式）"""
+    json_file = tmp_path / '5_triage.json'
+    write_file(str(json_file), '193', departments=50, campuses=3, seed=3)
+    row_filter = RowFilter(campuses, title_regex)
+    everything = list(engine.iter_rows(str(json_file), engine.CLI_COLUMNS))
+    expected = [row for row in everything if _matches(row, row_filter, title_regex)]
+    assert len(expected) < len(everything)
+    for stream in (False, True):
+        assert list(engine.iter_rows(str(json_file), engine.CLI_COLUMNS, stream, row_filter=row_filter)) == expected
+        table = engine.extract_table(str(json_file), engine.CLI_COLUMNS, stream, row_filter=row_filter)
+        assert list(table.iter_dicts(engine.CLI_COLUMNS)) == expected
+
+
+def test_has_param():
+    """必需参数按 url_params_json 的取值方式判断（departId 对应63格式的 department_id）"""
+    rows = list(engine.iter_rows(SAMPLE, hospital_id='1', row_filter=RowFilter(has_params=['departId'])))
+    assert len(rows) == 3
+    rows = list(engine.iter_rows(SAMPLE, hospital_id='1', row_filter=RowFilter(has_params=['areaId'])))
+    assert [row['department_title'] for row in rows] == ['PICC门诊']
+    rows = list(engine.iter_rows(SAMPLE, hospital_id='1', row_filter=RowFilter(has_params='areaId,position')))
+    assert rows == []
+
+
+def test_hospital_filter_skips_file_without_opening(tmp_path):
+    missing = str(tmp_path / '7_triage.json')
+    row_filter = RowFilter(hospitals=['5', '6'])
+    assert list(engine.iter_rows(missing, row_filter=row_filter)) == []
+    assert len(engine.extract_table(missing, row_filter=row_filter)) == 0
+    assert row_filter.select_files([missing, str(tmp_path / '5_triage.json.gz'), 'other.json']) == \
+        [str(tmp_path / '5_triage.json.gz')]
+
+
+def test_options_and_errors():
+    assert split_values(['1, 2', '3', '']) == ['1', '2', '3']
+    assert not RowFilter()
+    assert not RowFilter('', '', [], None)
+    assert RowFilter(campuses=[1]).accepts_campus(1)
+    assert RowFilter(campuses=['1'], title_regex='科').describe() == '院区=1 科室名称~科'
+    with pytest.raises(ValueError):
+        RowFilter(title_regex='(')
+
+
+def test_cached_separately_and_cli_output(tmp_path):
+    json_file = tmp_path / '63_triage.json'
+    json_file.write_text(json.dumps(SAMPLE, ensure_ascii=False), encoding='utf-8')
+    cache = ExtractCache(str(tmp_path / 'cache'), version='1')
+    row_filter = RowFilter(campuses=['22'])
+    assert len(list(engine.iter_rows(str(json_file), engine.CLI_COLUMNS, cache=cache))) == 3
+    for _ in range(2):
+        rows = list(engine.iter_rows(str(json_file), engine.CLI_COLUMNS, cache=cache, row_filter=row_filter))
+        assert [row['campus_id'] for row in rows] == [22]
+    assert len(cache.entries()) == 2
+
+    output = tmp_path / 'out.csv'
+    assert process_json_file(str(json_file), str(tmp_path), output_file=str(output), fmt='csv',
+                             row_filter=RowFilter(title_regex='^呼吸'))
+    assert output.read_text(encoding='utf-8-sig').count('\n') == 2
+    assert not process_json_file(str(json_file), str(tmp_path), fmt='csv', row_filter=RowFilter(campuses=['9']))
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试磁盘行存储的分页、排序和筛选
+"""
+
+import json
+import os
+import threading
+
+import pytest
+
+import engine
+import synthetic_data
+from extraction import extract_columnar
+from row_store import RowStore
+from test_json_stream import SAMPLE
+
+
+def _store(rows, columns=('name', 'value')):
+    store = RowStore(columns)
+    store.write(rows)
+    return store
+
+
+def test_convert_into_store(tmp_path):
+    """作为 engine.convert 的输出目标，行和列表输出一致"""
+    json_file = tmp_path / '63_triage.json'
+    json_file.write_text(json.dumps(SAMPLE, ensure_ascii=False), encoding='utf-8')
+    expected = engine.ListSink()
+    engine.convert(str(json_file), expected)
+
+    store = RowStore(engine.GUI_COLUMNS)
+    assert engine.convert(str(json_file), store) == len(expected.rows)
+    assert list(store.iter_dicts()) == expected.rows
+    assert store.fetch(0, 1)[0] == tuple(expected.rows[0][col] for col in engine.GUI_COLUMNS)
+
+
+def test_cancel_convert(tmp_path):
+    """取消后 convert 抛出 Cancelled，最多多处理一批行"""
+    json_file = tmp_path / '63_triage.json'
+    synthetic_data.write_file(str(json_file), departments=500)
+    cancel = threading.Event()
+    seen = []
+
+    def rows():
+        for row in engine.iter_rows(str(json_file), cancel=cancel):
+            seen.append(row)
+            if len(seen) == 10:
+                cancel.set()
+            yield row
+
+    store = RowStore(engine.GUI_COLUMNS)
+    try:
+        store.write(rows())
+    except engine.Cancelled:
+        pass
+    else:
+        raise AssertionError('应抛出Cancelled')
+    assert len(seen) == engine.CANCEL_CHECK_ROWS
+
+    cancel = threading.Event()
+    cancel.set()
+    try:
+        engine.convert(str(json_file), RowStore(engine.GUI_COLUMNS), columnar=True, cancel=cancel)
+    except engine.Cancelled:
+        pass
+    else:
+        raise AssertionError('应抛出Cancelled')
+
+
+def test_columnar_table_write():
+    """列式数据表和行字典写入结果相同"""
+    table = extract_columnar(SAMPLE['departments'], '63', 'https://a/{departId}', ['departId'],
+                             columns=engine.GUI_COLUMNS)
+    store = RowStore(engine.GUI_COLUMNS)
+    store.write(table)
+    assert list(store.iter_dicts()) == list(table.iter_dicts())
+
+
+def test_paging():
+    store = _store({'name': f'n{i}', 'value': i} for i in range(25000))
+    assert len(store) == store.count() == 25000
+    assert store.fetch(0, 3) == [('n0', 0), ('n1', 1), ('n2', 2)]
+    assert store.fetch(24998, 10) == [('n24998', 24998), ('n24999', 24999)]
+    assert store.fetch(30000, 10) == []
+
+
+def test_sort_and_filter():
+    store = _store([{'name': 'b', 'value': 2}, {'name': 'a', 'value': 3},
+                    {'name': 'c', 'value': 1}, {'name': 'ab', 'value': 2}])
+    assert store.set_view('value') == 4
+    assert [row[0] for row in store.fetch(0, 10)] == ['c', 'b', 'ab', 'a']
+    store.set_view('name', descending=True)
+    assert [row[0] for row in store.fetch(1, 10)] == ['b', 'ab', 'a']
+
+    assert store.set_view('name', filter_column='name', filter_text='A') == 2
+    assert store.fetch(0, 10) == [('a', 3), ('ab', 2)]
+    # 不指定列时在所有列中查找
+    assert store.set_view(filter_text='3') == 1
+
+    # 清除条件后恢复插入顺序，导出不受影响
+    assert store.set_view() == 4
+    assert store.fetch(0, 1) == [('b', 2)]
+    assert [row['name'] for row in store.iter_dicts()] == ['b', 'a', 'c', 'ab']
+
+
+def test_filter_escapes_wildcards():
+    """% _ \\ 按字面匹配"""
+    store = _store([{'name': '50%_off', 'value': 1}, {'name': '50xyoff', 'value': 2},
+                    {'name': 'a\\b', 'value': 3}])
+    assert store.set_view(filter_column='name', filter_text='%_') == 1
+    assert store.set_view(filter_column='name', filter_text='\\') == 1
+    assert store.fetch(0, 10) == [('a\\b', 3)]
+
+
+def test_unknown_column():
+    store = _store([])
+    try:
+        store.set_view('missing')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('未知的列应抛出ValueError')
+
+
+def test_parse_in_process(tmp_path):
+    """GUI单文件解析在子进程中进行，结果、错误和取消"""
+    import json_to_excel_converter
+
+    json_file = tmp_path / '63_triage.json'
+    synthetic_data.write_file(str(json_file), departments=50)
+    expected = engine.ListSink()
+    engine.convert(str(json_file), expected)
+    progress = []
+    for stream in (False, True):
+        store = json_to_excel_converter.parse_in_process(str(json_file), on_rows=lambda *p: progress.append(p),
+                                                         stream=stream, backend='stdlib')
+        assert len(store) == store.count() == len(expected.rows)
+        assert list(store.iter_dicts()) == expected.rows
+        db_path = store._owned_path
+        store.close()
+        assert not os.path.exists(db_path)
+
+    bad_file = tmp_path / 'bad.json'
+    bad_file.write_text('{"departments": [', encoding='utf-8')
+    with pytest.raises(RuntimeError):
+        json_to_excel_converter.parse_in_process(str(bad_file))
+
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(engine.Cancelled):
+        json_to_excel_converter.parse_in_process(str(json_file), cancel)
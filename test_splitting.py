@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试按行数或大小分割输出
+"""
+
+import csv
+import json
+
+import pytest
+from openpyxl import load_workbook
+
+import consolidate
+import output_formats
+import splitting
+from splitting import SplitLimit
+from test_json_stream import SAMPLE
+
+
+COLUMNS = ['name', 'value']
+ROWS = [(f'科室{i}', i) for i in range(25)]
+
+
+def _read_sheets(filename):
+    workbook = load_workbook(filename)
+    return {ws.title: [[cell.value for cell in row] for row in ws.iter_rows()] for ws in workbook.worksheets}
+
+
+def test_split_xlsx_sheets(tmp_path):
+    """超过行数时继续写入 科室数据_2 ...，每个工作表都有表头"""
+    filename = tmp_path / 'out.xlsx'
+    count = output_formats.write_values(iter(ROWS), str(filename), COLUMNS, 'xlsx', split=SplitLimit(10))
+    assert count == 25
+
+    sheets = _read_sheets(filename)
+    assert list(sheets) == ['科室数据', '科室数据_2', '科室数据_3']
+    assert all(values[0] == COLUMNS for values in sheets.values())
+    assert [row for values in sheets.values() for row in values[1:]] == [list(row) for row in ROWS]
+    assert len(sheets['科室数据_3']) == 6
+
+    # 刚好写满时不产生空的工作表
+    output_formats.write_values(iter(ROWS[:20]), str(filename), COLUMNS, 'xlsx', split=SplitLimit(10))
+    assert list(_read_sheets(filename)) == ['科室数据', '科室数据_2']
+
+
+def test_split_xlsx_files(tmp_path):
+    """分割为多个文件时列宽按全部行统计，各文件相同"""
+    rows = ROWS[:-1] + [('很长的科室名称' * 3, 24)]
+    filename = tmp_path / 'out.xlsx'
+    count = output_formats.write_values(iter(rows), str(filename), COLUMNS, 'xlsx',
+                                        split=SplitLimit(10, mode='files'))
+    assert count == 25
+    parts = [tmp_path / 'out.xlsx', tmp_path / 'out_2.xlsx', tmp_path / 'out_3.xlsx']
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(p.name for p in parts)
+
+    widths = set()
+    values = []
+    for part in parts:
+        worksheet = load_workbook(part)['科室数据']
+        widths.add(worksheet.column_dimensions['A'].width)
+        sheet_values = [[cell.value for cell in row] for row in worksheet.iter_rows()]
+        assert sheet_values[0] == COLUMNS
+        values.extend(sheet_values[1:])
+    assert widths == {23}
+    assert values == [list(row) for row in rows]
+
+
+def test_split_by_size(tmp_path):
+    """按大小分割：每个部分达到阈值后切换（每 SIZE_CHECK_ROWS 行检查一次）"""
+    rows = [(f'{i:06d}' + 'x' * 94, i) for i in range(splitting.SIZE_CHECK_ROWS * 5)]
+    filename = tmp_path / 'out.csv'
+    count = output_formats.write_values(iter(rows), str(filename), COLUMNS, 'csv',
+                                        split=SplitLimit(max_bytes=200000))
+    assert count == len(rows)
+
+    values = []
+    for part in (tmp_path / 'out.csv', tmp_path / 'out_2.csv', tmp_path / 'out_3.csv'):
+        assert part.stat().st_size < 200000 + 110 * splitting.SIZE_CHECK_ROWS
+        with open(part, encoding='utf-8-sig', newline='') as f:
+            part_rows = list(csv.reader(f))
+        assert part_rows[0] == COLUMNS
+        values.extend(part_rows[1:])
+    assert not (tmp_path / 'out_4.csv').exists()
+    assert values == [[name, str(value)] for name, value in rows]
+
+    # xlsx按未压缩的XML大小估算
+    xlsx = tmp_path / 'out.xlsx'
+    output_formats.write_values(iter(rows), str(xlsx), COLUMNS, 'xlsx', split=SplitLimit(max_bytes=400000))
+    sheets = _read_sheets(xlsx)
+    assert len(sheets) > 1
+    assert sum(len(values) - 1 for values in sheets.values()) == len(rows)
+
+
+def test_split_text_formats_always_files(tmp_path):
+    filename = tmp_path / 'out.jsonl'
+    assert output_formats.write_values(iter(ROWS), str(filename), COLUMNS, 'jsonl', split=SplitLimit(20)) == 25
+    lines = (tmp_path / 'out_2.jsonl').read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == [{'name': name, 'value': value} for name, value in ROWS[20:]]
+
+
+def test_hospital_sheets_split(tmp_path):
+    """每个医院一个工作表时，超过阈值的医院继续写入 {名称}_2"""
+    json_file = tmp_path / '63_triage.json'
+    json_file.write_text(json.dumps(SAMPLE, ensure_ascii=False), encoding='utf-8')
+    output_file = tmp_path / 'combined.xlsx'
+    total = consolidate.write_consolidated([str(json_file)], str(output_file), 'hospital', split=SplitLimit(2))
+    sheets = _read_sheets(output_file)
+    assert list(sheets) == ['63', '63_2']
+    assert sum(len(values) - 1 for values in sheets.values()) == total == 3
+
+    with pytest.raises(ValueError):
+        consolidate.write_consolidated([str(json_file)], str(output_file), 'hospital',
+                                       split=SplitLimit(2, mode='files'))
+
+
+def test_limits_and_names():
+    assert SplitLimit().for_sheet().max_rows == splitting.EXCEL_MAX_DATA_ROWS
+    assert SplitLimit(5 * 10 ** 6).for_sheet().max_rows == splitting.EXCEL_MAX_DATA_ROWS
+    assert SplitLimit(100).for_sheet().max_rows == 100
+    with pytest.raises(ValueError):
+        SplitLimit(0)
+
+    assert splitting.parse_size('200M') == 200 * 1024 ** 2
+    assert splitting.parse_size('1.5g') == int(1.5 * 1024 ** 3)
+    assert splitting.parse_size('4096') == 4096
+    with pytest.raises(ValueError):
+        splitting.parse_size('lots')
+
+    assert splitting.sheet_name('科室数据', 1) == '科室数据'
+    assert splitting.sheet_name('x' * 31, 2) == 'x' * 29 + '_2'
+    assert splitting.sheet_name('63', 2, ['63', '63_2']) == '63_3'
+    assert splitting.part_path('out/a.xlsx', 3) == 'out/a_3.xlsx'
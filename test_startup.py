@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试命令行的启动路径（按需导入）
+"""
+
+import json
+import os
+import subprocess
+import sys
+from xml.sax.saxutils import escape, quoteattr
+
+from openpyxl.utils import get_column_letter
+
+import xlsx_writer
+from test_json_stream import SAMPLE
+
+
+def test_import_skips_heavy_modules():
+    """导入命令行模块时不加载pandas、openpyxl、numpy和tkinter"""
+    code = ("import sys, batch_converter; "
+            "print([m for m in ('pandas', 'numpy', 'openpyxl', 'tkinter', 'concurrent.futures') if m in sys.modules])")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
+
+
+def test_gui_import_skips_tkinter_and_process_pool():
+    """导入GUI模块时不加载tkinter和进程池（批处理子进程导入该模块）"""
+    code = ("import sys, json_to_excel_converter; "
+            "print([m for m in ('tkinter', 'concurrent.futures', 'multiprocessing') if m in sys.modules])")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
+
+
+def test_writer_helpers_match_libraries():
+    for idx in (1, 26, 27, 52, 53, 702, 703, 16384):
+        assert xlsx_writer.column_letter(idx) == get_column_letter(idx)
+    for value in ('a<b>&c', '"引号"\n\t\r', "it's"):
+        assert xlsx_writer.escape(value) == escape(value)
+        assert xlsx_writer.quoteattr(value)[1:-1] == quoteattr(value, {'"': '&quot;'})[1:-1]
+
+
+def test_profile_startup(tmp_path):
+    (tmp_path / '63_triage.json').write_text(json.dumps(SAMPLE, ensure_ascii=False), encoding='utf-8')
+    result = subprocess.run(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'batch_converter.py'), str(tmp_path / '*_triage.json'), '-o', str(tmp_path / 'out'),
+         '--no-cache', '--profile-startup'],
+        capture_output=True, text=True, encoding='utf-8', check=True)
+    assert '启动耗时分析' in result.stdout
+    assert '模块导入' in result.stdout
+    assert '启动时已导入: ' in result.stdout
+    assert len(list((tmp_path / 'out').glob('63_triage*.xlsx'))) == 1
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试目录监视（inotify和定时扫描）
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+import pytest
+
+import batch_converter
+import watcher
+
+
+def _collect(source, debounce, stop, batches):
+    for ready in watcher.iter_ready_files(source, debounce, stop):
+        batches.append(ready)
+
+
+@pytest.mark.parametrize('backend', ['poll', 'inotify'])
+def test_detects_written_files_after_debounce(tmp_path, backend):
+    if backend == 'inotify' and not watcher.inotify_available():
+        pytest.skip('当前平台不支持inotify')
+    (tmp_path / 'old_triage.json').write_text('{}')
+    source = watcher.open_source(str(tmp_path), '*_triage.json', backend, interval=0.05)
+    stop = threading.Event()
+    batches = []
+    thread = threading.Thread(target=_collect, args=(source, 0.3, stop, batches))
+    thread.start()
+    try:
+        # 分几次写入的文件在写完之前不会产出
+        with open(tmp_path / '1_triage.json', 'w') as f:
+            for _ in range(4):
+                f.write('{"departments": []}')
+                f.flush()
+                time.sleep(0.1)
+            assert batches == []
+        (tmp_path / 'ignored.txt').write_text('x')
+        deadline = time.monotonic() + 5
+        while not batches and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        thread.join()
+        source.close()
+
+    # 启动前已存在且未修改的文件和不匹配的文件不产出
+    assert batches == [[str(tmp_path / '1_triage.json')]]
+
+
+def test_unknown_backend(tmp_path):
+    with pytest.raises(ValueError):
+        watcher.open_source(str(tmp_path), '*.json', 'fsevents')
+
+
+@pytest.mark.parametrize('backend', ['poll', 'inotify'])
+def test_watch_converts_files_added_during_initial_conversion(tmp_path, monkeypatch, backend):
+    """转换已有文件期间新增的文件在监视开始后转换"""
+    if backend == 'inotify' and not watcher.inotify_available():
+        pytest.skip('当前平台不支持inotify')
+    (tmp_path / '1_triage.json').write_text('{}')
+    batches = []
+
+    def convert_files(json_files, args, executor=None):
+        batches.append(sorted(json_files))
+        if len(batches) == 1:
+            # 转换已有文件的过程中写入新文件
+            (tmp_path / '2_triage.json').write_text('{}')
+            return []
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(batch_converter, 'convert_files', convert_files)
+    argv = ['batch_converter.py', str(tmp_path / '*_triage.json'), '-o', str(tmp_path / 'out'), '--watch',
+            '--debounce', '0.1', '--poll-interval', '0.05'] + (['--poll'] if backend == 'poll' else [])
+    monkeypatch.setattr(sys, 'argv', argv)
+    # 新文件一直没有被检测到时，超时后中止监视
+    timer = threading.Timer(10, lambda: (tmp_path / '3_triage.json').write_text('{}'))
+    timer.start()
+    try:
+        batch_converter.main()
+    finally:
+        timer.cancel()
+    assert batches == [[str(tmp_path / '1_triage.json')], [str(tmp_path / '2_triage.json')]]
+
+
+class _ListSource:
+    """依次产出给定文件的事件来源"""
+
+    name = 'test'
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+
+    def wait(self, timeout):
+        return [self.paths.pop(0)] if self.paths else []
+
+    def close(self):
+        pass
+
+
+def test_watch_keeps_recent_metrics_only(tmp_path, monkeypatch):
+    """长时间监视时指标记录只保留最近的若干个"""
+    paths = []
+    for idx in range(5):
+        paths.append(str(tmp_path / f'{idx}_triage.json'))
+        (tmp_path / f'{idx}_triage.json').write_text('{}')
+    reports = []
+
+    def convert_files(json_files, args, executor=None):
+        if json_files == paths[-1:]:
+            raise KeyboardInterrupt
+        return [{'file': json_file} for json_file in json_files]
+
+    monkeypatch.setattr(batch_converter, 'convert_files', convert_files)
+    monkeypatch.setattr(batch_converter, 'report_metrics', lambda records, args: reports.append(records))
+    monkeypatch.setattr(batch_converter, 'WATCH_METRICS_RECORDS', 2)
+    args = argparse.Namespace(input_pattern=str(tmp_path / '*_triage.json'), debounce=0, jobs=1, row_filter=None,
+                              metrics='m.json', resume=False)
+    batch_converter.watch_directory(args, [{'file': 'initial'}], _ListSource(paths))
+    assert [[record['file'] for record in records] for records in reports] == \
+        [['initial', paths[0]], paths[:2], paths[1:3], paths[2:4]]
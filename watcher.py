@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录监视
+检测目录中新增或修改的JSON文件：Linux上使用inotify，其他平台定时扫描目录；
+文件在一段时间内不再变化后才认为已写完（避免转换写了一半的文件）
+"""
+
+import ctypes
+import fnmatch
+import os
+import select
+import struct
+import sys
+import time
+
+
+# 文件最后一次变化后等待的秒数
+DEFAULT_DEBOUNCE = 2.0
+# 定时扫描的间隔秒数
+DEFAULT_INTERVAL = 1.0
+
+WATCH_BACKENDS = ('auto', 'inotify', 'poll')
+
+# inotify事件（见 <sys/inotify.h>）
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+
+def _libc():
+    """支持inotify的C库，不支持时返回None"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def inotify_available():
+    return _libc() is not None
+
+
+def _scan(directory, pattern):
+    """目录中匹配的文件: {路径: (大小, 修改时间)}"""
+    snapshot = {}
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return snapshot
+    for entry in entries:
+        if not fnmatch.fnmatch(entry.name, pattern):
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        if entry.is_file():
+            snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+class PollingSource:
+    """定时扫描目录，比较文件大小和修改时间"""
+
+    name = 'poll'
+
+    def __init__(self, directory, pattern, interval=DEFAULT_INTERVAL):
+        self.directory = directory
+        self.pattern = pattern
+        self.interval = interval
+        # 启动时已存在的文件不算变化
+        self.snapshot = _scan(directory, pattern)
+
+    def wait(self, timeout):
+        """等待最多 timeout 秒，返回期间变化的文件"""
+        time.sleep(min(timeout, self.interval))
+        current = _scan(self.directory, self.pattern)
+        changed = [path for path, signature in current.items() if self.snapshot.get(path) != signature]
+        self.snapshot = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifySource:
+    """通过inotify接收目录中的文件事件（仅Linux，不需要第三方库）"""
+
+    name = 'inotify'
+
+    def __init__(self, directory, pattern):
+        libc = _libc()
+        if libc is None:
+            raise OSError("当前平台不支持inotify")
+        self.directory = directory
+        self.pattern = pattern
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"无法监视目录: {directory}")
+
+    def wait(self, timeout):
+        """等待最多 timeout 秒，返回期间有写入、创建或移入事件的文件"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, _READ_SIZE)
+        except BlockingIOError:
+            return []
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                # 事件队列溢出，丢失的事件无法确定，视为所有文件都有变化
+                changed.update(_scan(self.directory, self.pattern))
+                continue
+            name = os.fsdecode(name)
+            if name and fnmatch.fnmatch(name, self.pattern):
+                changed.add(os.path.join(self.directory, name))
+        return list(changed)
+
+    def close(self):
+        os.close(self.fd)
+
+
+def open_source(directory, pattern, backend='auto', interval=DEFAULT_INTERVAL):
+    """创建事件来源；backend 为 'auto' 时优先使用inotify"""
+    if backend not in WATCH_BACKENDS:
+        raise ValueError(f"不支持的监视方式: {backend}")
+    if backend == 'inotify' or (backend == 'auto' and inotify_available()):
+        return InotifySource(directory, pattern)
+    return PollingSource(directory, pattern, interval)
+
+
+def iter_ready_files(source, debounce=DEFAULT_DEBOUNCE, stop=None):
+    """持续产出已写完的文件列表（debounce 秒内没有新的变化）
+
+    stop 为 threading.Event 时，设置后结束；文件在等待期间被删除则忽略
+    """
+    pending = {}
+    while stop is None or not stop.is_set():
+        now = time.monotonic()
+        timeout = min([changed_at + debounce - now for changed_at in pending.values()] + [DEFAULT_INTERVAL])
+        for path in source.wait(max(timeout, 0.05)):
+            pending[path] = time.monotonic()
+
+        now = time.monotonic()
+        ready = sorted(path for path, changed_at in pending.items() if now - changed_at >= debounce)
+        for path in ready:
+            del pending[path]
+        ready = [path for path in ready if os.path.isfile(path)]
+        if ready:
+            yield ready
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+XLSX文件写入（共享字符串表）
+openpyxl只写模式把每个字符串单元格都写成内联字符串，同一症状、诊断文本重复写入成千上万次；
+这里直接生成工作表XML，重复的列（由调用方指定）中每个不同的字符串只在共享字符串表(sharedStrings.xml)
+中保存一次，单元格只写入其序号；其他列（如每行不同的 url_params_json）写为内联字符串。
+共享字符串表保存在内存中，最多 SHARED_STRINGS_MAX 个，表满后新的字符串也写为内联字符串，内存占用有上限。
+工作表行数据先流式写入临时目录中的文件，保存时再打包；临时文件只在写入一批行时打开，
+工作表再多也不会占用过多的文件描述符。
+只使用标准库，导入时不加载openpyxl（及其导入的numpy）
+"""
+
+import math
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+
+
+# 单元格样式序号（见 _STYLES）
+DEFAULT_STYLE = 0
+# 与pandas导出一致的表头样式（加粗、细边框、居中）
+HEADER_STYLE = 1
+
+# 每累积多少行写入一次临时文件
+_FLUSH_ROWS = 1000
+
+# 共享字符串表最多保存的不同字符串数（所有工作表共用）
+SHARED_STRINGS_MAX = 100_000
+
+_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_CT_PREFIX = 'application/vnd.openxmlformats-officedocument.spreadsheetml'
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+# 工作表中不允许的控制字符（与 openpyxl.cell.cell.ILLEGAL_CHARACTERS_RE 相同）
+ILLEGAL_CHARACTERS_RE = re.compile(r'[\000-\010]|[\013-\014]|[\016-\037]')
+
+_STYLES = (
+    _XML_HEADER
+    + f'<styleSheet xmlns="{_MAIN_NS}">'
+    '<fonts count="2">'
+    '<font><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+    '</fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="2"><border><left/><right/><top/><bottom/><diagonal/></border>'
+    '<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/></border>'
+    '</borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="center" vertical="top"/></xf></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def column_letter(idx):
+    """列序号（从1开始）对应的列字母，如 1 → A、27 → AA"""
+    letters = ''
+    while idx > 0:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def escape(value):
+    """转义XML文本中的 &、<、>（与 xml.sax.saxutils.escape 相同，该模块会导入urllib，启动较慢）"""
+    return value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def quoteattr(value):
+    """转义并加上引号的XML属性值"""
+    value = escape(value).replace('"', '&quot;')
+    return '"' + value.replace('\n', '&#10;').replace('\r', '&#13;').replace('\t', '&#9;') + '"'
+
+
+def check_characters(value):
+    """字符串中有工作表不允许的控制字符时抛出与openpyxl相同的异常"""
+    if ILLEGAL_CHARACTERS_RE.search(value):
+        # 只在出错时导入
+        from openpyxl.utils.exceptions import IllegalCharacterError
+        raise IllegalCharacterError(f"{value} cannot be used in worksheets.")
+
+
+def _text_element(value):
+    """<t> 元素，首尾有空白时保留空白"""
+    if value != value.strip():
+        return f'<t xml:space="preserve">{escape(value)}</t>'
+    return f'<t>{escape(value)}</t>'
+
+
+class SharedStrings:
+    """共享字符串表：每个不同的字符串分配一个序号，最多 max_strings 个"""
+
+    def __init__(self, max_strings=None):
+        self.max_strings = SHARED_STRINGS_MAX if max_strings is None else max_strings
+        self.index = {}
+        self.strings = []
+        # 引用次数（字符串单元格总数）
+        self.count = 0
+        # 表中字符串的总字节数（UTF-8）
+        self.size = 0
+
+    def add(self, value):
+        """返回字符串的序号，新字符串追加到表中；表已满时返回None（由调用方写为内联字符串）"""
+        index = self.index.get(value)
+        if index is None:
+            if len(self.strings) >= self.max_strings:
+                return None
+            check_characters(value)
+            index = self.index[value] = len(self.strings)
+            self.strings.append(value)
+            self.size += len(value.encode('utf-8'))
+        self.count += 1
+        return index
+
+    def __len__(self):
+        return len(self.strings)
+
+    def write(self, f):
+        f.write((_XML_HEADER + f'<sst xmlns="{_MAIN_NS}" count="{self.count}" '
+                 f'uniqueCount="{len(self.strings)}">').encode('utf-8'))
+        batch = []
+        for value in self.strings:
+            batch.append(f'<si>{_text_element(value)}</si>')
+            if len(batch) >= _FLUSH_ROWS:
+                f.write(''.join(batch).encode('utf-8'))
+                batch = []
+        batch.append('</sst>')
+        f.write(''.join(batch).encode('utf-8'))
+
+
+def _inline_cell(ref, style_attr, value):
+    """内联字符串单元格（不进入共享字符串表）"""
+    check_characters(value)
+    return f'<c r="{ref}"{style_attr} t="inlineStr"><is>{_text_element(value)}</is></c>'
+
+
+class XlsxWorksheet:
+    """只能依次追加行的工作表，行数据写入临时文件
+
+    shared_columns 为使用共享字符串表的列序号（从0开始）集合，其他列的字符串写为内联字符串；
+    为None时所有列都使用共享字符串表
+    """
+
+    def __init__(self, workbook, title, widths=None, shared_columns=None):
+        self.workbook = workbook
+        self.title = title
+        # 列宽: {列序号(从1开始): 宽度}
+        self.widths = dict(widths or {})
+        self.shared_columns = None if shared_columns is None else frozenset(shared_columns)
+        self.rows = 0
+        self.max_column = 0
+        # 已写入的行数据XML字节数（UTF-8）
+        self._size = 0
+        self._shared_size = workbook.shared_strings.size
+        self._letters = []
+        self._pending = []
+        # 行数据的临时文件（在工作簿的临时目录中），每次写入时才打开
+        self._spool_path = os.path.join(workbook.temp_dir(), f'sheet{len(workbook.sheets) + 1}.xml')
+
+    def _column_letters(self, count):
+        while len(self._letters) < count:
+            self._letters.append(column_letter(len(self._letters) + 1))
+        return self._letters
+
+    def append(self, values, style=DEFAULT_STYLE):
+        """追加一行（按列顺序的值），None 和空字符串为空单元格"""
+        values = tuple(values)
+        self.rows += 1
+        row = str(self.rows)
+        letters = self._column_letters(len(values))
+        if len(values) > self.max_column:
+            self.max_column = len(values)
+        style_attr = f' s="{style}"' if style else ''
+        add_string = self.workbook.shared_strings.add
+        shared_columns = self.shared_columns
+        cells = [f'<row r="{row}">']
+        for idx, (letter, value) in enumerate(zip(letters, values)):
+            kind = type(value)
+            if kind is str:
+                if not value:
+                    continue
+                index = add_string(value) if shared_columns is None or idx in shared_columns else None
+                if index is None:
+                    cells.append(_inline_cell(f'{letter}{row}', style_attr, value))
+                else:
+                    cells.append(f'<c r="{letter}{row}"{style_attr} t="s"><v>{index}</v></c>')
+            elif value is None:
+                continue
+            elif kind is bool:
+                cells.append(f'<c r="{letter}{row}"{style_attr} t="b"><v>{int(value)}</v></c>')
+            elif isinstance(value, (int, float)):
+                if kind is float and not math.isfinite(value):
+                    # XLSX的数值不能是NaN或无穷大：NaN为空单元格（与pandas导出一致），无穷大写为文本
+                    if value != value:
+                        continue
+                    cells.append(_inline_cell(f'{letter}{row}', style_attr, repr(value)))
+                    continue
+                cells.append(f'<c r="{letter}{row}"{style_attr}><v>{value!r}</v></c>')
+            elif isinstance(value, str):
+                if value:
+                    cells.append(_inline_cell(f'{letter}{row}', style_attr, str(value)))
+            else:
+                raise ValueError(f"Cannot convert {value!r} to Excel")
+        cells.append('</row>')
+        row_xml = ''.join(cells).encode('utf-8')
+        self._size += len(row_xml)
+        self._pending.append(row_xml)
+        if len(self._pending) >= _FLUSH_ROWS:
+            self._flush()
+
+    def size(self):
+        """该工作表未压缩的大小估算：行数据XML加上期间新增的共享字符串"""
+        return self._size + self.workbook.shared_strings.size - self._shared_size
+
+    def _flush(self):
+        if self._pending:
+            with open(self._spool_path, 'ab') as spool:
+                spool.write(b''.join(self._pending))
+            self._pending = []
+
+    def close(self):
+        """写完该工作表（之后不能再追加行）"""
+        self._flush()
+
+    def _write(self, f):
+        self._flush()
+        last_cell = f'{column_letter(max(self.max_column, 1))}{max(self.rows, 1)}'
+        head = [_XML_HEADER, f'<worksheet xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">',
+                f'<dimension ref="A1:{last_cell}"/>']
+        if self.widths:
+            head.append('<cols>')
+            for idx in sorted(self.widths):
+                head.append(f'<col min="{idx}" max="{idx}" width="{self.widths[idx]}" customWidth="1"/>')
+            head.append('</cols>')
+        head.append('<sheetData>')
+        f.write(''.join(head).encode('utf-8'))
+        if os.path.exists(self._spool_path):
+            with open(self._spool_path, 'rb') as spool:
+                shutil.copyfileobj(spool, f)
+        f.write(b'</sheetData></worksheet>')
+
+
+class XlsxWorkbook:
+    """按顺序写入若干工作表的工作簿，所有工作表共用一个共享字符串表"""
+
+    def __init__(self):
+        self.sheets = []
+        self.shared_strings = SharedStrings()
+        self._temp_dir = None
+
+    def temp_dir(self):
+        """存放工作表临时文件的目录（第一次使用时创建）"""
+        if self._temp_dir is None:
+            self._temp_dir = tempfile.mkdtemp(prefix='xlsx_')
+        return self._temp_dir
+
+    def create_sheet(self, title, widths=None, shared_columns=None):
+        sheet = XlsxWorksheet(self, title, widths, shared_columns)
+        self.sheets.append(sheet)
+        return sheet
+
+    @property
+    def sheetnames(self):
+        return [sheet.title for sheet in self.sheets]
+
+    def save(self, filename):
+        """打包写入XLSX文件；保存后临时文件即被删除，不能再次保存"""
+        try:
+            with zipfile.ZipFile(filename, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+                archive.writestr('[Content_Types].xml', self._content_types())
+                archive.writestr('_rels/.rels', _XML_HEADER + f'<Relationships xmlns="{_PKG_REL_NS}">'
+                                 f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" '
+                                 'Target="xl/workbook.xml"/></Relationships>')
+                archive.writestr('xl/workbook.xml', self._workbook_xml())
+                archive.writestr('xl/_rels/workbook.xml.rels', self._workbook_rels())
+                archive.writestr('xl/styles.xml', _STYLES)
+                for idx, sheet in enumerate(self.sheets, 1):
+                    with archive.open(f'xl/worksheets/sheet{idx}.xml', 'w', force_zip64=True) as f:
+                        sheet._write(f)
+                with archive.open('xl/sharedStrings.xml', 'w', force_zip64=True) as f:
+                    self.shared_strings.write(f)
+        finally:
+            self.close()
+
+    def close(self):
+        """删除工作表的临时文件"""
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _content_types(self):
+        overrides = [f'<Override PartName="/xl/worksheets/sheet{idx}.xml" '
+                     f'ContentType="{_CT_PREFIX}.worksheet+xml"/>' for idx in range(1, len(self.sheets) + 1)]
+        return (_XML_HEADER
+                + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                '<Default Extension="xml" ContentType="application/xml"/>'
+                f'<Override PartName="/xl/workbook.xml" ContentType="{_CT_PREFIX}.sheet.main+xml"/>'
+                f'<Override PartName="/xl/styles.xml" ContentType="{_CT_PREFIX}.styles+xml"/>'
+                f'<Override PartName="/xl/sharedStrings.xml" ContentType="{_CT_PREFIX}.sharedStrings+xml"/>'
+                + ''.join(overrides) + '</Types>')
+
+    def _workbook_xml(self):
+        sheets = [f'<sheet name={quoteattr(sheet.title)} sheetId="{idx}" r:id="rId{idx}"/>'
+                  for idx, sheet in enumerate(self.sheets, 1)]
+        return (_XML_HEADER + f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">'
+                '<bookViews><workbookView activeTab="0"/></bookViews>'
+                '<sheets>' + ''.join(sheets) + '</sheets></workbook>')
+
+    def _workbook_rels(self):
+        count = len(self.sheets)
+        rels = [f'<Relationship Id="rId{idx}" Type="{_REL_NS}/worksheet" Target="worksheets/sheet{idx}.xml"/>'
+                for idx in range(1, count + 1)]
+        rels.append(f'<Relationship Id="rId{count + 1}" Type="{_REL_NS}/styles" Target="styles.xml"/>')
+        rels.append(f'<Relationship Id="rId{count + 2}" Type="{_REL_NS}/sharedStrings" '
+                    'Target="sharedStrings.xml"/>')
+        return _XML_HEADER + f'<Relationships xmlns="{_PKG_REL_NS}">' + ''.join(rels) + '</Relationships>'